@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import queue
+import atexit
+import datetime
+import threading
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+# Minimum level written to the log file and printed to the console.
+FILE_LEVEL = LEVELS.get(os.getenv("SUPERGIT_LOG_LEVEL", "info").lower(), 20)
+CONSOLE_LEVEL = LEVELS.get(os.getenv("SUPERGIT_CONSOLE_LEVEL", "info").lower(), 20)
+# Longer messages are truncated before they are queued.
+MAX_MESSAGE_CHARS = int(os.getenv("SUPERGIT_LOG_MAX_CHARS", "2000"))
+MAX_LOG_BYTES = int(os.getenv("SUPERGIT_LOG_MAX_MB", "10")) * 1024 * 1024
+LOG_BACKUPS = 5
+QUEUE_SIZE = 10000
+FLUSH_INTERVAL = 0.5
+
+
+def truncate(text: str, limit: int = MAX_MESSAGE_CHARS) -> str:
+    """
+    Shortens ``text`` to ``limit`` characters, noting how much was cut.
+    """
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… [{len(text) - limit} more chars]"
+
+
+class LogWriter:
+    """
+    Background thread that writes queued records to a rotating JSONL file;
+    records are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, file_path: str, max_bytes: int = MAX_LOG_BYTES, backups: int = LOG_BACKUPS):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{os.path.basename(file_path)}", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        return open(self.file_path, "a", encoding="utf-8", buffering=64 * 1024)
+
+    def _rotate(self, f):
+        f.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.file_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{index + 1}")
+        os.replace(self.file_path, f"{self.file_path}.1")
+        return self._open()
+
+    def _run(self):
+        f = self._open()
+        try:
+            while not (self._stop.is_set() and self.queue.empty()):
+                try:
+                    batch = [self.queue.get(timeout=FLUSH_INTERVAL)]
+                except queue.Empty:
+                    continue
+                while len(batch) < 1000:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # None is the wake-up sent by close().
+                batch = [record for record in batch if record is not None]
+                if not batch:
+                    continue
+                if self.dropped:
+                    dropped, self.dropped = self.dropped, 0
+                    batch.append({"ts": batch[-1]["ts"], "level": "warning", "logger": "agent_log",
+                                  "message": f"dropped {dropped} log records (queue full)"})
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+                f.flush()
+                if f.tell() >= self.max_bytes:
+                    f = self._rotate(f)
+        finally:
+            f.close()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Flushes pending records and stops the writer thread.
+        """
+        self._stop.set()
+        try:
+            # Wake the thread now instead of after its next FLUSH_INTERVAL poll.
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+class Logger:
+    """
+    Leveled logger that prints to the console and hands records to a shared
+    ``LogWriter``.
+    """
+
+    def __init__(self, name: str, writer: LogWriter, file_name: str = None):
+        self.name = name
+        self.writer = writer
+        self.file_name = file_name or f"{name}.jsonl"
+
+    def log(self, level: str, message, **fields) -> None:
+        value = LEVELS[level]
+        if value < FILE_LEVEL and value < CONSOLE_LEVEL:
+            return
+        message = truncate(str(message))
+        now = time.time()
+        if value >= CONSOLE_LEVEL:
+            timestamp = datetime.datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] {message}")
+        if value >= FILE_LEVEL:
+            record = {"ts": round(now, 3), "level": level, "logger": self.name, "message": message}
+            for key, field in fields.items():
+                record[key] = truncate(field) if isinstance(field, str) else field
+            self.writer.submit(record)
+
+    def debug(self, message, **fields):
+        self.log("debug", message, **fields)
+
+    def info(self, message, **fields):
+        self.log("info", message, **fields)
+
+    def warning(self, message, **fields):
+        self.log("warning", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("error", message, **fields)
+
+
+_writers = {}
+_loggers = {}
+_lock = threading.Lock()
+
+
+def get_logger(name: str, file_name: str = None) -> Logger:
+    """
+    Returns the logger called ``name``, writing to ``logs/<file_name>``
+    (default ``<name>.jsonl``) below the current directory. Loggers that
+    share a file share one writer thread.
+    """
+    with _lock:
+        logger = _loggers.get(name)
+        if logger is None:
+            file_name = file_name or f"{name}.jsonl"
+            logger = _loggers[name] = Logger(name, _writer_for(file_name), file_name)
+        return logger
+
+
+def _writer_for(file_name: str) -> LogWriter:
+    file_path = os.path.join(os.getcwd(), "logs", file_name)
+    writer = _writers.get(file_path)
+    if writer is None:
+        writer = _writers[file_path] = LogWriter(file_path)
+    return writer
+
+
+def rebind() -> None:
+    """
+    Points every logger at ``logs/`` below the current directory, as if it
+    had been created there; used by ``supergitd`` after changing into the
+    directory of a client.
+    """
+    with _lock:
+        for logger in _loggers.values():
+            logger.writer = _writer_for(logger.file_name)
+
+
+@atexit.register
+def shutdown() -> None:
+    """
+    Flushes and stops every writer; runs automatically at interpreter exit.
+    """
+    with _lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,242 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+
+DEFAULT_INDEX_PATH = os.getenv("SUPERGIT_ARTIFACT_INDEX", os.path.join(".supergit_cache", "artifacts.sqlite3"))
+DEFAULT_LIMIT = 50
+
+Artifact = namedtuple("Artifact", "id kind source_path source_hash model prompt_version path created text")
+
+
+def source_hash(content: str) -> str:
+    """
+    Returns the hex SHA-256 digest of a source file's content.
+    """
+    return hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def fts_available(db) -> bool:
+    """
+    Tells whether the SQLite library was built with the FTS5 extension.
+    """
+    try:
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts_probe USING fts5(text)")
+        db.execute("DROP TABLE temp.fts_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def phrase_query(query: str) -> str:
+    """
+    Quotes every word of ``query`` so punctuation such as ``try/except`` is
+    searched for literally instead of being read as FTS5 syntax.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class ArtifactIndex:
+    """
+    SQLite index of the reports and optimized code the agents produced, keyed by
+    source content hash, model and prompt version.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                blob TEXT NOT NULL REFERENCES blobs (hash),
+                path TEXT,
+                created REAL NOT NULL,
+                UNIQUE (kind, source_hash, model, prompt_version, source_path)
+            );
+            CREATE INDEX IF NOT EXISTS artifacts_lookup ON artifacts (kind, source_hash, model, prompt_version);
+            CREATE INDEX IF NOT EXISTS artifacts_source ON artifacts (source_path);
+            """
+        )
+        self.fts = fts_available(self.db)
+        if self.fts:
+            self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS blob_text USING fts5(hash UNINDEXED, text)")
+        self.db.commit()
+
+    def lookup(self, kind: str, source_hash: str, model: str, prompt_version: str):
+        """
+        Returns the latest artifact of ``kind`` made from the same content with
+        the same model and prompt version (even if its file was deleted), or
+        None.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT a.id, a.kind, a.source_path, a.source_hash, a.model, a.prompt_version, a.path, a.created, b.text "
+                "FROM artifacts a JOIN blobs b ON b.hash = a.blob "
+                "WHERE a.kind = ? AND a.source_hash = ? AND a.model = ? AND a.prompt_version = ? "
+                "ORDER BY a.created DESC LIMIT 1",
+                (kind, source_hash, model, prompt_version),
+            ).fetchone()
+        return Artifact(*row) if row is not None else None
+
+    def record(self, kind: str, source_path: str, source_hash: str, model: str, prompt_version: str,
+               text: str, path: str = None) -> None:
+        """
+        Stores an artifact; recording the same source again replaces its
+        entry, and an identical text is only stored once.
+        """
+        blob = hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+        with self.lock:
+            inserted = self.db.execute(
+                "INSERT OR IGNORE INTO blobs (hash, text, size) VALUES (?, ?, ?)",
+                (blob, text, len(text.encode("utf-8", errors="surrogatepass"))),
+            ).rowcount
+            if inserted and self.fts:
+                self.db.execute("INSERT INTO blob_text (hash, text) VALUES (?, ?)", (blob, text))
+            self.db.execute(
+                "INSERT INTO artifacts (kind, source_path, source_hash, model, prompt_version, blob, path, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, source_hash, model, prompt_version, source_path) "
+                "DO UPDATE SET blob = excluded.blob, path = excluded.path, created = excluded.created",
+                (kind, os.path.abspath(source_path), source_hash, model, prompt_version, blob, path, time.time()),
+            )
+            self.db.commit()
+
+    def search(self, query: str = "", kind: str = None, source: str = None, limit: int = DEFAULT_LIMIT) -> list:
+        """
+        Finds artifacts whose text matches ``query`` (FTS5 syntax, e.g.
+        ``try NEAR except``; text that is not valid syntax is searched as
+        words), newest first. An empty query lists artifacts.
+
+        Parameters:
+            query (str): Full-text query.
+            kind (str): Only artifacts of this kind ("review", "optimization", "chunk", "perf").
+            source (str): Only artifacts of source paths containing this text.
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: ``Artifact`` tuples.
+        """
+        where, params = [], []
+        if kind:
+            where.append("a.kind = ?")
+            params.append(kind)
+        if source:
+            where.append("a.source_path LIKE ?")
+            params.append(f"%{source}%")
+        select = ("SELECT a.id, a.kind, a.source_path, a.source_hash, a.model, a.prompt_version, a.path, a.created, "
+                  "b.text FROM artifacts a JOIN blobs b ON b.hash = a.blob")
+        with self.lock:
+            if not query:
+                sql = select
+            elif self.fts:
+                sql = select + " WHERE a.blob IN (SELECT hash FROM blob_text WHERE blob_text MATCH ?)"
+            else:
+                sql = select + " WHERE b.text LIKE ?"
+            if where:
+                sql += (" AND " if query else " WHERE ") + " AND ".join(where)
+            sql += " ORDER BY a.created DESC LIMIT ?"
+            if not query:
+                return [Artifact(*row) for row in self.db.execute(sql, params + [limit])]
+            if not self.fts:
+                return [Artifact(*row) for row in self.db.execute(sql, [f"%{query}%"] + params + [limit])]
+            try:
+                rows = self.db.execute(sql, [query] + params + [limit]).fetchall()
+            except sqlite3.OperationalError:
+                rows = self.db.execute(sql, [phrase_query(query)] + params + [limit]).fetchall()
+        return [Artifact(*row) for row in rows]
+
+    def stats(self) -> dict:
+        """
+        Returns the number of artifacts per kind and the stored text size.
+        """
+        with self.lock:
+            kinds = dict(self.db.execute("SELECT kind, COUNT(*) FROM artifacts GROUP BY kind").fetchall())
+            blobs, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return dict({f"{kind}s": count for kind, count in sorted(kinds.items())},
+                    texts=blobs, bytes=size, full_text="fts5" if self.fts else "like")
+
+    def prune(self) -> int:
+        """
+        Drops the artifacts whose file no longer exists and the texts no
+        artifact refers to.
+
+        Returns:
+            int: The number of artifacts dropped.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT id, path FROM artifacts WHERE path IS NOT NULL").fetchall()
+            gone = [(artifact_id,) for artifact_id, path in rows if not os.path.exists(path)]
+            self.db.executemany("DELETE FROM artifacts WHERE id = ?", gone)
+            if self.fts:
+                self.db.execute("DELETE FROM blob_text WHERE hash NOT IN (SELECT blob FROM artifacts)")
+            self.db.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT blob FROM artifacts)")
+            self.db.commit()
+        return len(gone)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_index() -> ArtifactIndex:
+    """
+    Returns the process-wide artifact index of the current project, opening
+    it on first use.
+    """
+    path = os.path.abspath(DEFAULT_INDEX_PATH)
+    with _shared_lock:
+        index = _shared.get(path)
+        if index is None:
+            index = _shared[path] = ArtifactIndex(path)
+        return index
+
+
+def main():
+    import argparse
+    import datetime
+
+    parser = argparse.ArgumentParser(description="Search the index of supergit reviews and optimizations.")
+    parser.add_argument('command', choices=['search', 'stats', 'prune'], help='What to do')
+    parser.add_argument('query', nargs='?', default="", help='Full-text query for search (empty lists the latest)')
+    parser.add_argument('--kind', '-k', choices=['review', 'optimization', 'chunk', 'perf'], default=None,
+                        help='Only artifacts of this kind')
+    parser.add_argument('--source', type=str, default=None, help='Only artifacts of source paths containing this text')
+    parser.add_argument('--limit', '-n', type=int, default=DEFAULT_LIMIT, help='Maximum number of results')
+    parser.add_argument('--path', type=str, default=DEFAULT_INDEX_PATH, help='Index database file')
+    args = parser.parse_args()
+
+    index = ArtifactIndex(args.path)
+    if args.command == 'stats':
+        for name, value in index.stats().items():
+            print(f"{name:<14} {value}")
+    elif args.command == 'prune':
+        print(f"Dropped {index.prune()} artifacts whose files are gone")
+    else:
+        results = index.search(args.query, args.kind, args.source, args.limit)
+        for artifact in results:
+            created = datetime.datetime.fromtimestamp(artifact.created).strftime("%Y-%m-%d %H:%M")
+            print(f"{created}  {artifact.kind:<12} {os.path.relpath(artifact.source_path)}  ->  "
+                  f"{os.path.relpath(artifact.path) if artifact.path else '(not saved)'}")
+        print(f"{len(results)} artifacts")
+
+
+if __name__ == "__main__":
+    main()
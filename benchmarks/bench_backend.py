@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_backend
+from fake_model_server import FakeOllamaConfig, start_server
+
+
+def timed_requests(send, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label, latencies, stats):
+    print(f"{label:<22} mean {statistics.mean(latencies) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   "
+          f"connections {stats['connections']:4d} for {stats['requests']} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a pooled backend client with a new client per call.")
+    parser.add_argument('--requests', '-n', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='Fake server latency in seconds')
+    args = parser.parse_args()
+
+    import ollama
+
+    config = FakeOllamaConfig(latency=args.latency, tokens_per_sec=0)
+    for label, send_factory in (
+        ("new client per call", lambda url: lambda: ollama.Client(host=url).generate(model="m", prompt="hi")),
+        ("shared llm_backend", lambda url: lambda: llm_backend.generate("hi", host=url, model="m")),
+    ):
+        server = start_server(config=config)
+        latencies = timed_requests(send_factory(server.url), args.requests)
+        report(label, latencies, server.stats())
+        llm_backend.close_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/bench_backend.py --requests 500
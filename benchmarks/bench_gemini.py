@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+import gemini_client
+from fake_model_server import FakeOllamaConfig, start_server
+
+
+def run(client, requests, workers):
+    """
+    Sends ``requests`` prompts concurrently; returns the elapsed seconds and
+    the number of calls that still failed after their retries.
+    """
+    def call(i):
+        try:
+            client.generate(f"Summarize file number {i}. " * 20)
+            return 0
+        except Exception:
+            return 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        failed = sum(executor.map(call, range(requests)))
+    return time.perf_counter() - started, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare unpaced and paced Gemini calls against a fake quota.")
+    parser.add_argument('--requests', '-n', type=int, default=40, help='Requests per scenario')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='Concurrent requests')
+    parser.add_argument('--quota', type=int, default=10, help='Requests the fake endpoint allows per window')
+    parser.add_argument('--window', type=float, default=2.0, help='Quota window in seconds (60 for the real API)')
+    parser.add_argument('--retries', type=int, default=8, help='Retries per request')
+    args = parser.parse_args()
+
+    for label, rpm in (("unpaced, retry only", 0), ("token bucket", args.quota)):
+        server = start_server(config=FakeOllamaConfig(latency=0.05, quota_rpm=args.quota, quota_window=args.window))
+        genai.configure(api_key="fake", transport="rest", client_options={"api_endpoint": server.url})
+        client = gemini_client.GeminiClient("gemini-fake", rpm=rpm, tpm=0, retries=args.retries, backoff=0.2,
+                                            period=args.window)
+        elapsed, failed = run(client, args.requests, args.workers)
+        print(f"{label:<20} {elapsed:6.2f}s   {failed} failed   {server.stats()['quota_errors']:3d} quota errors   "
+              f"{client.stats['retries']} retries")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/bench_gemini.py --requests 40 --quota 10 --window 2
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_backend
+from fake_model_server import FakeOllamaConfig, start_server
+
+
+def run_batch(hosts, requests, workers, max_concurrency):
+    """
+    Sends ``requests`` uncached generations through a pool of ``hosts`` and
+    returns the elapsed seconds and the pool's per-host counters.
+    """
+    llm_backend.DEFAULT_HOSTS = ",".join(f"{url}={max_concurrency}" for url in hosts)
+    pool = llm_backend.get_pool()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda i: llm_backend.generate(f"request {i}", model="m", cache=False), range(requests)))
+    elapsed = time.perf_counter() - started
+    pool.stop()
+    return elapsed, pool.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch throughput over a pool of fake Ollama hosts.")
+    parser.add_argument('--requests', '-n', type=int, default=64, help='Requests per scenario')
+    parser.add_argument('--hosts', type=int, nargs='+', default=[1, 2, 4], help='Pool sizes to measure')
+    parser.add_argument('--parallel', type=int, default=1, help='Generations each fake host serves at once')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake server latency in seconds')
+    parser.add_argument('--failing', action='store_true', help='Make the last host of every pool answer HTTP 500')
+    args = parser.parse_args()
+
+    baseline = None
+    for count in args.hosts:
+        servers = [start_server(config=FakeOllamaConfig(latency=args.latency, parallel=args.parallel,
+                                                        error_rate=1.0 if args.failing and i == count - 1 and count > 1
+                                                        else 0.0))
+                   for i in range(count)]
+        elapsed, stats = run_batch([server.url for server in servers], args.requests,
+                                   workers=count * args.parallel * 2, max_concurrency=args.parallel)
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput / count
+        print(f"{count} hosts: {throughput:6.1f} req/s ({throughput / baseline / count:.0%} of linear)   "
+              + "  ".join(f"{s['requests']} req/{s['errors']} err/{s['state']}" for s in stats))
+        llm_backend.close_clients()
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/bench_pool.py --requests 64 --hosts 1 2 4
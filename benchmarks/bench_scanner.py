@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repo_scanner import iter_repo_files, walk_repo, DEFAULT_MAX_FILE_SIZE, DEFAULT_SCAN_WORKERS
+
+
+def generate_tree(base_path, n_files, seed=0):
+    """
+    Generates a synthetic repository: mostly small source files spread over
+    nested packages, plus a few large text files and binary blobs.
+    """
+    rng = random.Random(seed)
+    line = "def function_{0}(value):\n    return value * {0}  # synthetic source line\n"
+    for i in range(n_files):
+        folder = os.path.join(base_path, f"pkg{i % 50}", f"sub{i % 7}")
+        os.makedirs(folder, exist_ok=True)
+        roll = rng.random()
+        if roll < 0.01:
+            with open(os.path.join(folder, f"blob_{i}.bin"), "wb") as f:
+                f.write(os.urandom(rng.randint(1024, 64 * 1024)))
+        elif roll < 0.02:
+            with open(os.path.join(folder, f"large_{i}.py"), "w", encoding="utf-8") as f:
+                f.write(line.format(i) * rng.randint(4000, 12000))
+        else:
+            with open(os.path.join(folder, f"module_{i}.py"), "w", encoding="utf-8") as f:
+                f.write(line.format(i) * rng.randint(5, 200))
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def legacy_scan(base_path):
+    """
+    The previous behaviour: read every file into one dict on a single thread.
+    """
+    file_data = {}
+    for file_path in walk_repo(base_path):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                file_data[os.path.relpath(file_path, base_path)] = f.read()
+        except Exception:
+            pass
+    return file_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the doc-keeper repository scanner.")
+    parser.add_argument('--files', '-n', type=int, default=20000, help='Number of files in the synthetic tree')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_SCAN_WORKERS, help='Reader threads')
+    parser.add_argument('--max-file-size', type=int, default=DEFAULT_MAX_FILE_SIZE, help='Skip larger files')
+    parser.add_argument('--legacy', action='store_true', help='Benchmark the old read-everything scan instead')
+    parser.add_argument('--tree', type=str, default="", help='Existing directory to scan instead of a synthetic tree')
+    args = parser.parse_args()
+
+    base_path = args.tree or tempfile.mkdtemp(prefix="scanner_bench_")
+    try:
+        if not args.tree:
+            print(f"Generating {args.files} files in {base_path} ...")
+            generate_tree(base_path, args.files)
+
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        if args.legacy:
+            count = len(legacy_scan(base_path))
+            total_chars = None
+        else:
+            count = 0
+            total_chars = 0
+            for _, content in iter_repo_files(base_path, max_file_size=args.max_file_size, workers=args.workers):
+                count += 1
+                total_chars += len(content)
+        elapsed = time.perf_counter() - start
+
+        print(f"mode:        {'legacy' if args.legacy else 'streaming'}")
+        print(f"files read:  {count}")
+        if total_chars is not None:
+            print(f"chars read:  {total_chars}")
+        print(f"elapsed:     {elapsed:.2f} s")
+        print(f"files/sec:   {count / elapsed:.0f}")
+        print(f"peak RSS:    {peak_rss_mb():.1f} MB (before scan: {rss_before:.1f} MB)")
+    finally:
+        if not args.tree:
+            shutil.rmtree(base_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/bench_scanner.py --files 100000 --workers 16
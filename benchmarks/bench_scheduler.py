@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_backend
+import request_scheduler
+from fake_model_server import FakeOllamaConfig, start_server
+
+MODELS = ("model-a", "model-b")
+
+
+def run(slots, batch_requests, interactive_requests, interval, workers):
+    """
+    Sends batch requests alternating between two models while interactive
+    requests arrive every ``interval`` seconds; returns the scheduler.
+    """
+    llm_backend.SCHEDULER_SLOTS = slots
+    scheduler = llm_backend.get_scheduler()
+
+    def batch(i):
+        with request_scheduler.priority(request_scheduler.BATCH):
+            llm_backend.generate(f"batch {i}", model=MODELS[i % 2], cache=False)
+
+    def interactive():
+        for i in range(interactive_requests):
+            time.sleep(interval)
+            llm_backend.generate(f"interactive {i}", model=MODELS[0], cache=False)
+
+    user = threading.Thread(target=interactive)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        user.start()
+        list(executor.map(batch, range(batch_requests)))
+    user.join()
+    return scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare unscheduled and scheduled model requests on a fake server "
+                                                 "that holds one model at a time.")
+    parser.add_argument('--batch', type=int, default=40, help='Batch requests, alternating between two models')
+    parser.add_argument('--interactive', type=int, default=8, help='Interactive requests sent during the batch')
+    parser.add_argument('--interval', type=float, default=0.3, help='Seconds between interactive requests')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='Concurrent batch requests')
+    parser.add_argument('--parallel', type=int, default=2, help='Generations the fake server runs at once')
+    parser.add_argument('--load-time', type=float, default=0.3, help='Seconds the fake server takes to load a model')
+    args = parser.parse_args()
+
+    for label, slots in (("unscheduled", "0"), ("scheduled", str(args.parallel))):
+        server = start_server(config=FakeOllamaConfig(latency=0.05, parallel=args.parallel, load_time=args.load_time,
+                                                      max_loaded=1))
+        llm_backend.DEFAULT_HOST = server.url
+        started = time.perf_counter()
+        scheduler = run(slots, args.batch, args.interactive, args.interval, args.workers)
+        elapsed = time.perf_counter() - started
+        classes = scheduler.stats()["classes"]
+        interactive, batch = classes[request_scheduler.INTERACTIVE], classes[request_scheduler.BATCH]
+        print(f"{label:<12} {elapsed:5.2f}s   interactive p50 {interactive['p50']:.2f}s p95 {interactive['p95']:.2f}s   "
+              f"batch p95 {batch['p95']:.2f}s   {server.stats()['loads']} model loads")
+        llm_backend.close_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/bench_scheduler.py --batch 40 --interactive 8
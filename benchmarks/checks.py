@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_backend
+from host_pool import HostPool
+from fake_model_server import FakeOllamaConfig, start_server
+
+
+def check_retry_and_reuse():
+    """
+    A request answered with HTTP 500 is retried and succeeds, and later
+    requests reuse the pooled client's connection.
+    """
+    server = start_server(config=FakeOllamaConfig(latency=0.01, fail_first=1))
+    try:
+        response = llm_backend.generate("write add", model="m", host=server.url, retries=2, cache=False)
+        assert "def add" in response.response, response.response
+        assert server.stats()["requests"] == 2, server.stats()
+
+        connections = server.stats()["connections"]
+        for i in range(5):
+            llm_backend.generate(f"request {i}", model="m", host=server.url, cache=False)
+        stats = server.stats()
+        assert stats["requests"] == 7, stats
+        assert stats["connections"] == connections, f"{stats['connections'] - connections} new connections"
+    finally:
+        llm_backend.close_clients()
+        server.shutdown()
+
+
+def check_pool_circuit_breaker():
+    """
+    The pool routes requests away from a failing host, takes it out of
+    rotation after repeated failures and brings it back once a trial
+    request succeeds.
+    """
+    failing = start_server(config=FakeOllamaConfig(latency=0.01, error_rate=1.0))
+    healthy = start_server(config=FakeOllamaConfig(latency=0.01))
+    hosts = f"{failing.url}=1,{healthy.url}=1"
+    llm_backend.DEFAULT_HOSTS = hosts
+    pool = llm_backend._pools[hosts] = HostPool([(failing.url, 1), (healthy.url, 1)], failure_threshold=2,
+                                                open_seconds=2.0)
+    try:
+        for i in range(6):
+            response = llm_backend.generate(f"request {i}", model="m", retries=2, cache=False)
+            assert "def add" in response.response, response.response
+        states = {entry["host"]: entry for entry in pool.stats()}
+        assert states[failing.url]["state"] == "open", states
+        assert states[failing.url]["errors"] == 2, states
+        assert healthy.stats()["requests"] == 6, healthy.stats()
+
+        failing.config.error_rate = 0.0
+        time.sleep(2.1)
+        assert pool.stats()[0]["state"] == "half-open", pool.stats()
+        llm_backend.generate("trial", model="m", cache=False)
+        states = {entry["host"]: entry for entry in pool.stats()}
+        assert states[failing.url]["state"] == "closed", states
+        assert failing.stats()["requests"] == 3, failing.stats()
+    finally:
+        llm_backend.DEFAULT_HOSTS = ""
+        llm_backend.close_clients()
+        failing.shutdown()
+        healthy.shutdown()
+
+
+def gemini_client_for(server, **settings):
+    import google.generativeai as genai
+
+    import gemini_client
+
+    genai.configure(api_key="fake", transport="rest", client_options={"api_endpoint": server.url})
+    return gemini_client.GeminiClient("gemini-fake", **settings)
+
+
+def check_gemini_retries_quota_errors():
+    """
+    A Gemini request rejected with 429 is retried after the delay the error
+    asks for and succeeds.
+    """
+    server = start_server(config=FakeOllamaConfig(latency=0.01, quota_rpm=2, quota_window=1.0))
+    try:
+        client = gemini_client_for(server, rpm=0, tpm=0, retries=5, backoff=0.05, period=1.0)
+        for i in range(4):
+            assert "def add" in client.generate(f"request {i}", tokens=10)
+        assert server.stats()["quota_errors"] >= 1, server.stats()
+        assert client.stats["quota_errors"] == server.stats()["quota_errors"], (client.stats, server.stats())
+    finally:
+        server.shutdown()
+
+
+def check_gemini_pacing():
+    """
+    With the client's quota below the endpoint's, requests are spread out by
+    the token bucket and none is rejected.
+    """
+    server = start_server(config=FakeOllamaConfig(latency=0.01, quota_rpm=5, quota_window=1.0))
+    try:
+        client = gemini_client_for(server, rpm=4, tpm=0, retries=0, period=1.0)
+        started = time.monotonic()
+        for i in range(6):
+            client.generate(f"request {i}", tokens=10)
+        elapsed = time.monotonic() - started
+        assert elapsed >= 1.1, f"6 requests at 4 per second took only {elapsed:.2f}s"
+        assert client.stats["paced_seconds"] > 0, client.stats
+        assert server.stats()["quota_errors"] == 0, server.stats()
+    finally:
+        server.shutdown()
+
+
+CHECKS = [check_retry_and_reuse, check_pool_circuit_breaker, check_gemini_retries_quota_errors, check_gemini_pacing]
+
+
+def main():
+    for check in CHECKS:
+        check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/checks.py
@@ -0,0 +1,354 @@
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "```python\n"
+    "def add(a, b):\n"
+    "    \"\"\"Returns the sum of a and b.\"\"\"\n"
+    "    return a + b\n"
+    "```\n"
+    "\n"
+    "The function takes two numbers and returns their sum. It works for integers, floats and any other "
+    "objects that support the + operator.\n"
+)
+PROSE_RESPONSE = "I am a code generator only. Here is an explanation of how you could approach this task in words."
+
+
+class FakeOllamaConfig:
+    """
+    Behaviour of the stand-in server: latencies, token rate and canned output.
+    """
+
+    def __init__(self, latency: float = 0.05, tokens_per_sec: float = 200.0, load_time: float = 0.0,
+                 response: str = DEFAULT_RESPONSE, error_rate: float = 0.0, jitter: float = 0.0,
+                 prose_rate: float = 0.0, parallel: int = 0, quota_rpm: int = 0, quota_tpm: int = 0,
+                 quota_window: float = 60.0, max_loaded: int = 0, fail_first: int = 0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.load_time = load_time
+        self.response = response
+        self.error_rate = error_rate
+        # The first requests are answered with HTTP 500 regardless of error_rate, so retries can be checked.
+        self.fail_first = fail_first
+        # Mean of an exponentially distributed extra latency, which gives the latency a long tail.
+        self.jitter = jitter
+        # Fraction of answers that are prose instead of code, like a small model that misunderstood the task.
+        self.prose_rate = prose_rate
+        # Generations run at once, like OLLAMA_NUM_PARALLEL; further requests queue. 0 means unlimited.
+        self.parallel = parallel
+        # Gemini quota: requests and prompt tokens allowed per sliding window, answered with 429 beyond it.
+        self.quota_rpm = quota_rpm
+        self.quota_tpm = quota_tpm
+        self.quota_window = quota_window
+        # Models kept in memory at once, like OLLAMA_MAX_LOADED_MODELS; loading another evicts the least recently
+        # used one. 0 means unlimited.
+        self.max_loaded = max_loaded
+
+    def first_token_delay(self) -> float:
+        return self.latency + (random.expovariate(1.0 / self.jitter) if self.jitter > 0 else 0.0)
+
+    def pick_response(self) -> str:
+        return PROSE_RESPONSE if random.random() < self.prose_rate else self.response
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the Ollama HTTP API (``/api/generate``, ``/api/tags``,
+    ``/api/ps``, ``/api/version``) and the Gemini REST API
+    (``/v1beta/models/<model>:generateContent`` and ``:countTokens``) that
+    counts connections and requests so latency and connection reuse can be
+    measured without a real model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), config: FakeOllamaConfig = None):
+        super().__init__(address, FakeOllamaHandler)
+        self.config = config or FakeOllamaConfig()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.loaded_until = {}  # model -> monotonic expiry time
+        self.last_used = {}  # model -> monotonic time of its last request
+        self.slots = threading.Semaphore(self.config.parallel) if self.config.parallel > 0 else None
+        self.quota_used = deque()  # (monotonic time, prompt tokens) of accepted Gemini requests
+        self.quota_errors = 0
+        self.loads = 0
+
+    def over_quota(self, tokens: int) -> float:
+        """
+        Records a Gemini request against the quota window; returns 0 if it is
+        accepted, else the seconds until the window has room again.
+        """
+        config = self.config
+        if not config.quota_rpm and not config.quota_tpm:
+            return 0.0
+        now = time.monotonic()
+        with self.lock:
+            while self.quota_used and self.quota_used[0][0] <= now - config.quota_window:
+                self.quota_used.popleft()
+            used = sum(count for _, count in self.quota_used)
+            if ((config.quota_rpm and len(self.quota_used) >= config.quota_rpm)
+                    or (config.quota_tpm and used + tokens > config.quota_tpm)):
+                self.quota_errors += 1
+                oldest = self.quota_used[0][0] if self.quota_used else now
+                return max(0.1, oldest + config.quota_window - now)
+            self.quota_used.append((now, tokens))
+        return 0.0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"connections": self.connections, "requests": self.requests, "max_in_flight": self.max_in_flight,
+                    "quota_errors": self.quota_errors, "loads": self.loads}
+
+    def load_model(self, model: str, keep_alive) -> float:
+        """
+        Marks a model as loaded and returns the simulated load time in seconds.
+        """
+        now = time.monotonic()
+        with self.lock:
+            cold = self.loaded_until.get(model, 0) < now
+            if cold:
+                self.loads += 1
+                resident = [name for name, until in self.loaded_until.items() if until >= now and name != model]
+                if self.config.max_loaded and len(resident) >= self.config.max_loaded:
+                    del self.loaded_until[min(resident, key=lambda name: self.last_used.get(name, 0))]
+            self.loaded_until[model] = now + parse_keep_alive(keep_alive)
+            self.last_used[model] = now
+        return self.config.load_time if cold else 0.0
+
+
+def parse_keep_alive(value) -> float:
+    """
+    Converts an Ollama keep_alive value ("5m", "30s", "1h", seconds, -1) to seconds.
+    """
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    value = str(value).strip()
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for suffix in ("ms", "s", "m", "h"):
+        if value.endswith(suffix):
+            number = float(value[:-len(suffix)])
+            return float("inf") if number < 0 else number * units[suffix]
+    number = float(value)
+    return float("inf") if number < 0 else number
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            models = [{"name": name, "model": name} for name in self.server.loaded_until]
+            self._send_json({"models": models})
+        elif self.path == "/api/ps":
+            now = time.monotonic()
+            models = [{"name": name, "model": name} for name, until in self.server.loaded_until.items() if until >= now]
+            self._send_json({"models": models})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/v1beta/models/"):
+            self._gemini(path, self._read_json())
+            return
+        if path != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+        request = self._read_json()
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.requests <= server.config.fail_first or random.random() < server.config.error_rate
+        try:
+            if fail:
+                self._send_json({"error": "simulated server error"}, 500)
+                return
+            if server.slots is None:
+                self._generate(request)
+            else:
+                with server.slots:
+                    self._generate(request)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _generate(self, request):
+        config = self.server.config
+        model = request.get("model", "")
+        started = time.monotonic()
+        load_duration = self.server.load_model(model, request.get("keep_alive"))
+        time.sleep(load_duration)
+        if not request.get("prompt"):
+            # An empty prompt only loads the model, like Ollama does.
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "load",
+                             "load_duration": int(load_duration * 1e9)})
+            return
+
+        time.sleep(config.first_token_delay())
+        prompt_done = time.monotonic()
+        response = config.pick_response()
+        tokens = response.split(" ")
+        tokens = [token + " " for token in tokens[:-1]] + tokens[-1:]
+        delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        prompt_tokens = max(1, len((request.get("system") or "") + request["prompt"]) // 4)
+
+        def metrics():
+            now = time.monotonic()
+            return {
+                "model": model, "response": "", "done": True, "done_reason": "stop",
+                "total_duration": int((now - started) * 1e9),
+                "load_duration": int(load_duration * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((prompt_done - started - load_duration) * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((now - prompt_done) * 1e9),
+            }
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    time.sleep(delay)
+                    self._write_chunk({"model": model, "response": token, "done": False})
+                self._write_chunk(metrics())
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # client cancelled the generation
+        else:
+            time.sleep(delay * len(tokens))
+            payload = metrics()
+            payload["response"] = response
+            self._send_json(payload)
+
+    def _gemini(self, path, request):
+        config = self.server.config
+        contents = request.get("contents") or request.get("generateContentRequest", {}).get("contents", [])
+        prompt_tokens = max(1, sum(len(part.get("text", "")) for content in contents
+                                   for part in content.get("parts", [])) // 4)
+        if path.endswith(":countTokens"):
+            self._send_json({"totalTokens": prompt_tokens})
+            return
+        if not path.endswith(":generateContent"):
+            self._send_json({"error": {"code": 404, "message": "not found"}}, 404)
+            return
+        server = self.server
+        retry_after = server.over_quota(prompt_tokens)
+        if retry_after:
+            self._send_json({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                                       "message": f"Resource has been exhausted (e.g. check quota). "
+                                                  f"Please retry in {retry_after:.1f}s."}}, 429)
+            return
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.requests <= config.fail_first or random.random() < config.error_rate
+        try:
+            if fail:
+                self._send_json({"error": {"code": 500, "message": "simulated server error", "status": "INTERNAL"}}, 500)
+                return
+            tokens = len(config.response.split(" "))
+            time.sleep(config.first_token_delay() + (tokens / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0))
+            self._send_json({
+                "candidates": [{"content": {"parts": [{"text": config.response}], "role": "model"},
+                                "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": tokens,
+                                  "totalTokenCount": prompt_tokens + tokens},
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(port: int = 0, config: FakeOllamaConfig = None) -> FakeOllamaServer:
+    """
+    Starts a fake Ollama server on a background thread and returns it.
+    Stop it with ``server.shutdown()``.
+    """
+    server = FakeOllamaServer(("127.0.0.1", port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in Ollama and Gemini server for tests and benchmarks.")
+    parser.add_argument('--port', '-p', type=int, default=11435, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before the first token')
+    parser.add_argument('--tokens-per-sec', type=float, default=200.0, help='Token generation rate')
+    parser.add_argument('--load-time', type=float, default=0.0, help='Seconds to load a cold model')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Mean extra latency (exponential) in seconds')
+    parser.add_argument('--prose-rate', type=float, default=0.0, help='Fraction of answers that contain no code')
+    parser.add_argument('--parallel', type=int, default=0,
+                        help='Generations served at once; further requests queue (0: unlimited)')
+    parser.add_argument('--quota-rpm', type=int, default=0, help='Gemini requests per window before 429s (0: no quota)')
+    parser.add_argument('--quota-tpm', type=int, default=0, help='Gemini prompt tokens per window before 429s')
+    parser.add_argument('--quota-window', type=float, default=60.0, help='Length of the quota window in seconds')
+    parser.add_argument('--max-loaded', type=int, default=0,
+                        help='Models kept loaded at once; loading another evicts one (0: unlimited)')
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.latency, args.tokens_per_sec, args.load_time, error_rate=args.error_rate,
+                              jitter=args.jitter, prose_rate=args.prose_rate, parallel=args.parallel,
+                              quota_rpm=args.quota_rpm, quota_tpm=args.quota_tpm, quota_window=args.quota_window,
+                              max_loaded=args.max_loaded)
+    server = FakeOllamaServer(("127.0.0.1", args.port), config)
+    print(f"Fake model server listening on {server.url} "
+          f"(export OLLAMA_HOST={server.url} GEMINI_API_ENDPOINT={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_model_server import FakeOllamaConfig, start_server
+
+SCENARIOS = ("startup", "coder", "reviewer", "reviewer-batch", "optimizer", "doc-keeper")
+SCRIPTS = ("coder.py", "reviewer.py", "optimizer.py", "doc-keeper.py", "pipeline.py")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+TASKS = (
+    "reverse a string", "check whether a number is prime", "merge two sorted lists",
+    "parse a CSV line", "compute a moving average", "flatten a nested list",
+    "count word frequencies", "validate an email address", "binary search a sorted list",
+    "convert Celsius to Fahrenheit", "find duplicates in a list", "compute a factorial",
+)
+LANGUAGES = ("python", "javascript", "go")
+
+
+def make_prompts(count, seed=0):
+    """
+    Builds a synthetic prompt set from a fixed list of small coding tasks.
+    """
+    rng = random.Random(seed)
+    return [f"code to {rng.choice(TASKS)} in {rng.choice(LANGUAGES)}" for _ in range(count)]
+
+
+def make_repo(base_path, n_files, seed=0):
+    """
+    Generates a small synthetic Python package with a README, returning the
+    paths of the generated modules.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        folder = os.path.join(base_path, "src", f"pkg{i % 5}")
+        os.makedirs(folder, exist_ok=True)
+        lines = [f"import os\nfrom pkg{(i + 1) % 5} import module_{(i + 1) % n_files}\n\n"]
+        for j in range(rng.randint(3, 15)):
+            lines.append(
+                f"def function_{i}_{j}(values):\n"
+                f"    \"\"\"Returns the values scaled by {j}.\"\"\"\n"
+                f"    result = []\n"
+                f"    for value in values:\n"
+                f"        result.append(value * {j})\n"
+                f"    return result\n\n"
+            )
+        path = os.path.join(folder, f"module_{i}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(lines))
+        paths.append(path)
+    with open(os.path.join(base_path, "README.md"), "w", encoding="utf-8") as f:
+        f.write("# Synthetic benchmark repository\n")
+    return paths
+
+
+def run_script(args, cwd, env):
+    """
+    Runs one of the repo scripts in a fresh interpreter and returns its wall
+    time, peak RSS and exit code.
+    """
+    with open(os.path.join(cwd, "bench_stderr.log"), "ab") as stderr:
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + args, cwd=cwd, env=env,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    rss = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return {"seconds": elapsed, "peak_rss_mb": rss, "returncode": proc.returncode}
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of ``values`` (``q`` between 0 and 100).
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(runs, wall_time, items=None, model_requests=None):
+    """
+    Reduces a list of ``run_script`` results to latency percentiles,
+    throughput and peak memory.
+    """
+    latencies = [run["seconds"] for run in runs]
+    result = {
+        "runs": len(runs),
+        "failures": sum(1 for run in runs if run["returncode"] != 0),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "mean": sum(latencies) / len(latencies),
+        "throughput_per_sec": len(runs) / wall_time if wall_time else None,
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+    if items is not None:
+        result["items"] = items
+        result["items_per_sec"] = items * len(runs) / wall_time if wall_time else None
+    if model_requests is not None:
+        result["model_requests"] = model_requests
+    return result
+
+
+def measure(server, commands, cwd, env, items=None):
+    """
+    Runs ``commands`` one after another and summarizes them, counting the
+    model requests the fake server received meanwhile.
+    """
+    before = server.stats()["requests"]
+    started = time.perf_counter()
+    runs = [run_script(command, cwd, env) for command in commands]
+    wall_time = time.perf_counter() - started
+    return summarize(runs, wall_time, items, server.stats()["requests"] - before)
+
+
+def run_benchmarks(args, server, work_dir):
+    env = dict(os.environ)
+    env.update({
+        "OLLAMA_HOST": server.url,
+        "GEMINI_API_ENDPOINT": server.url,
+        "GEMINI_API_KEY": env.get("GEMINI_API_KEY", "fake-key"),
+        "SUPERGIT_NO_CACHE": "1",
+        "SUPERGIT_CACHE_PATH": os.path.join(work_dir, "responses.sqlite3"),
+        "PYTHONWARNINGS": "ignore",
+    })
+    if args.daemon:
+        # The scripts become thin clients of a supergitd started with the same settings.
+        env["SUPERGIT_SOCKET"] = os.path.join(work_dir, "supergitd.sock")
+        subprocess.run([sys.executable, os.path.join(ROOT, "supergitd.py"), "start", "--detach"], cwd=work_dir,
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+    else:
+        env["SUPERGIT_NO_DAEMON"] = "1"
+    try:
+        return run_scenarios(args, server, work_dir, env)
+    finally:
+        if args.daemon:
+            subprocess.run([sys.executable, os.path.join(ROOT, "supergitd.py"), "stop"], cwd=work_dir, env=env,
+                           stdout=subprocess.DEVNULL)
+
+
+def run_scenarios(args, server, work_dir, env):
+    repo = os.path.join(work_dir, "repo")
+    files = make_repo(repo, args.files)
+    prompts = make_prompts(args.runs)
+    sample = [files[i % len(files)] for i in range(args.runs)]
+    script = lambda name: os.path.join(ROOT, name)
+
+    results = {}
+    for scenario in args.scenarios:
+        print(f"Running {scenario} ...")
+        if scenario == "startup":
+            results[scenario] = {
+                name: measure(server, [[script(name), "--help"]] * args.startup_runs, work_dir, env)
+                for name in SCRIPTS
+            }
+        elif scenario == "coder":
+            commands = [[script("coder.py"), "--prompt", prompt, "--filename", f"bench_{i}"]
+                        for i, prompt in enumerate(prompts)]
+            results[scenario] = measure(server, commands, work_dir, env)
+        elif scenario == "reviewer":
+            commands = [[script("reviewer.py"), "--file", path] for path in sample]
+            results[scenario] = measure(server, commands, work_dir, env)
+        elif scenario == "reviewer-batch":
+            command = [script("reviewer.py"), "--dir", repo, "--workers", str(args.workers)]
+            results[scenario] = measure(server, [command] * args.batch_runs, work_dir, env, items=len(files))
+        elif scenario == "optimizer":
+            commands = [[script("optimizer.py"), "--file", path] for path in sample]
+            results[scenario] = measure(server, commands, work_dir, env)
+        elif scenario == "doc-keeper":
+            command = [script("doc-keeper.py"), "--map-reduce", "--repo", repo, "--workers", str(args.workers),
+                       "--output", os.path.join(work_dir, "DOCUMENTATION.md")]
+            results[scenario] = measure(server, [command] * args.batch_runs, work_dir, env, items=len(files) + 1)
+    return results
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def flatten(results, prefix=""):
+    """
+    Yields ``(name, metrics)`` for every scenario, descending into startup's
+    per-script entries.
+    """
+    for name, value in results.items():
+        if "p50" in value:
+            yield prefix + name, value
+        else:
+            yield from flatten(value, f"{prefix}{name}/")
+
+
+def print_report(results, baseline=None):
+    baseline = dict(flatten(baseline["scenarios"])) if baseline else {}
+    print(f"\n{'scenario':<28}{'p50 s':>9}{'p95 s':>9}{'per s':>9}{'peak MB':>9}{'fail':>6}")
+    for name, metrics in flatten(results):
+        rate = metrics.get("items_per_sec") or metrics["throughput_per_sec"]
+        line = (f"{name:<28}{metrics['p50']:>9.3f}{metrics['p95']:>9.3f}{rate:>9.2f}"
+                f"{metrics['peak_rss_mb']:>9.1f}{metrics['failures']:>6}")
+        previous = baseline.get(name)
+        if previous:
+            change = (metrics["p50"] - previous["p50"]) / previous["p50"] * 100 if previous["p50"] else 0.0
+            line += f"   p50 {change:+.1f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark coder, reviewer, optimizer and doc-keeper end to end against a fake model server.")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                        help='Scenarios to run (default: all)')
+    parser.add_argument('--runs', '-n', type=int, default=10, help='Runs of each per-prompt/per-file scenario')
+    parser.add_argument('--batch-runs', type=int, default=3, help='Runs of the batch scenarios')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Runs of each script for startup time')
+    parser.add_argument('--files', type=int, default=30, help='Files in the synthetic repository')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='Workers for the batch scenarios')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake server seconds before the first token')
+    parser.add_argument('--tokens-per-sec', type=float, default=500.0, help='Fake server token rate')
+    parser.add_argument('--load-time', type=float, default=0.0, help='Fake server cold model load time')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Result file (default: benchmarks/results/<timestamp>-<commit>.json)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Run the scripts as thin clients of a supergitd started for the benchmark')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier result file to compare against')
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.latency, args.tokens_per_sec, args.load_time)
+    server = start_server(config=config)
+    work_dir = tempfile.mkdtemp(prefix="supergit-bench-")
+    try:
+        results = run_benchmarks(args, server, work_dir)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit, dirty = git_commit()
+    now = datetime.datetime.now()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
+
+#python benchmarks/run_benchmarks.py --runs 20 --compare benchmarks/results/<earlier>.json
@@ -0,0 +1,107 @@
+import ast
+import textwrap
+
+
+class Chunk:
+    """
+    One top-level function or class of a module: its name, kind and the
+    1-based line range it occupies, decorators included.
+    """
+
+    def __init__(self, name: str, kind: str, start: int, end: int, source: str):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.source = source
+
+
+def split_chunks(code: str) -> list:
+    """
+    Splits Python source into its top-level functions and classes; all other
+    code stays out of the chunks.
+
+    Raises:
+        SyntaxError: If the code does not parse.
+    """
+    lines = code.splitlines(keepends=True)
+    chunks = []
+    for node in ast.parse(code).body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        kind = "class" if isinstance(node, ast.ClassDef) else "function"
+        chunks.append(Chunk(node.name, kind, start, node.end_lineno, "".join(lines[start - 1:node.end_lineno])))
+    return chunks
+
+
+def parse_replacement(chunk: Chunk, text: str):
+    """
+    Checks a rewritten chunk: it must parse, define ``chunk.name`` at top
+    level with the same kind and contain nothing else but imports.
+
+    Returns:
+        tuple: ``(body, imports)`` where ``body`` is the source of the
+        definition, decorators included, and ``imports`` are the import lines
+        the rewrite added, or ``(None, reason)`` if the rewrite is unusable.
+    """
+    text = textwrap.dedent(text).strip("\n") + "\n"
+    try:
+        tree = ast.parse(text)
+    except SyntaxError as e:
+        return None, f"does not parse (line {e.lineno}: {e.msg})"
+    defined = {node.name: node for node in tree.body
+               if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    node = defined.get(chunk.name)
+    if node is None or ("class" if isinstance(node, ast.ClassDef) else "function") != chunk.kind:
+        return None, f"does not define {chunk.kind} {chunk.name}"
+
+    lines = text.splitlines(keepends=True)
+    imports = []
+    for statement in tree.body:
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            imports.append("".join(lines[statement.lineno - 1:statement.end_lineno]))
+        elif statement is not node:
+            # Example calls and the like would run when the module is imported.
+            return None, f"adds code besides {chunk.kind} {chunk.name} (line {statement.lineno})"
+    start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+    return "".join(lines[start - 1:node.end_lineno]), imports
+
+
+def splice(code: str, chunks: list, replacements: dict, imports=()) -> str:
+    """
+    Rebuilds the module with ``replacements`` (``Chunk`` -> new source) in place
+    of the original chunks and adds the new ``imports`` after the existing ones.
+    """
+    lines = code.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    position = _import_position(code)
+    for chunk in sorted(chunks, key=lambda chunk: chunk.start, reverse=True):
+        if chunk in replacements:
+            new_lines = replacements[chunk].splitlines(keepends=True)
+            if chunk.end <= position:
+                position += len(new_lines) - (chunk.end - chunk.start + 1)
+            lines[chunk.start - 1:chunk.end] = new_lines
+
+    existing = {line.strip() for line in code.splitlines()}
+    new_imports = []
+    for statement in imports:
+        if statement.strip() not in existing and statement not in new_imports:
+            new_imports.append(statement if statement.endswith("\n") else statement + "\n")
+    if new_imports:
+        lines[position:position] = new_imports
+    return "".join(lines)
+
+
+def _import_position(code: str) -> int:
+    """
+    Returns the 0-based line index at which added imports are inserted.
+    """
+    position = 0
+    for index, node in enumerate(ast.parse(code).body):
+        is_docstring = index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+            and isinstance(node.value.value, str)
+        if is_docstring or isinstance(node, (ast.Import, ast.ImportFrom)):
+            position = node.end_lineno
+    return position
@@ -0,0 +1,174 @@
+import re
+
+FENCE = "```"
+BACKTICK_RUN = re.compile("`+")
+
+# File extension for each language tag a model may put on a code fence.
+LANGUAGE_EXTENSIONS = {
+    "python": "py", "py": "py", "python3": "py",
+    "javascript": "js", "js": "js", "node": "js", "jsx": "jsx",
+    "typescript": "ts", "ts": "ts", "tsx": "tsx",
+    "java": "java", "kotlin": "kt", "kt": "kt", "scala": "scala",
+    "c": "c", "h": "h", "cpp": "cpp", "c++": "cpp", "cxx": "cpp", "hpp": "hpp",
+    "csharp": "cs", "c#": "cs", "cs": "cs",
+    "go": "go", "golang": "go", "rust": "rs", "rs": "rs", "swift": "swift",
+    "ruby": "rb", "rb": "rb", "php": "php", "perl": "pl", "lua": "lua", "r": "r", "dart": "dart",
+    "bash": "sh", "sh": "sh", "shell": "sh", "zsh": "sh", "powershell": "ps1", "ps1": "ps1", "bat": "bat",
+    "html": "html", "css": "css", "scss": "scss", "sql": "sql",
+    "json": "json", "yaml": "yaml", "yml": "yaml", "toml": "toml", "xml": "xml", "markdown": "md", "md": "md",
+    "dockerfile": "Dockerfile", "makefile": "mk",
+}
+DEFAULT_EXTENSION = "txt"
+
+# Language tag for fencing a source file, by extension or, for files without one, by name.
+EXTENSION_LANGUAGES = {
+    ".py": "python", ".pyi": "python", ".ipynb": "python",
+    ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript", ".jsx": "jsx",
+    ".ts": "typescript", ".tsx": "tsx",
+    ".java": "java", ".kt": "kotlin", ".scala": "scala",
+    ".c": "c", ".h": "c", ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp",
+    ".cs": "csharp", ".go": "go", ".rs": "rust", ".swift": "swift",
+    ".rb": "ruby", ".php": "php", ".pl": "perl", ".lua": "lua", ".r": "r", ".dart": "dart",
+    ".sh": "bash", ".bash": "bash", ".zsh": "bash", ".ps1": "powershell", ".bat": "bat",
+    ".html": "html", ".css": "css", ".scss": "scss", ".sql": "sql",
+    ".json": "json", ".jsonl": "json", ".yaml": "yaml", ".yml": "yaml", ".toml": "toml", ".xml": "xml",
+    ".ini": "ini", ".cfg": "ini", ".csv": "csv", ".tsv": "tsv", ".md": "markdown", ".rst": "rst",
+    "dockerfile": "dockerfile", "makefile": "makefile",
+}
+
+
+def normalize_language(tag: str) -> str:
+    """
+    Reduces a fence info string ("Python", "python title=x.py", "{.cpp}") to
+    a lower-case language name.
+    """
+    tag = tag.strip().strip("{}").lstrip(".")
+    return tag.split()[0].lower() if tag else ""
+
+
+def extension_for(language: str) -> str:
+    """
+    Returns the file extension for a language tag, ``txt`` when unknown.
+    """
+    return LANGUAGE_EXTENSIONS.get(normalize_language(language), DEFAULT_EXTENSION)
+
+
+def language_for(path: str) -> str:
+    """
+    Returns the fence language tag for a file path, or "" when unknown.
+    """
+    name = path.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    extension = "." + name.rsplit(".", 1)[-1] if "." in name else name
+    return EXTENSION_LANGUAGES.get(extension, EXTENSION_LANGUAGES.get(name, ""))
+
+
+def fence_for(text: str) -> str:
+    """
+    Returns a backtick fence longer than any backtick run in ``text``, so
+    the text cannot close its own code block.
+    """
+    longest = max((len(run) for run in BACKTICK_RUN.findall(text)), default=0)
+    return "`" * max(len(FENCE), longest + 1)
+
+
+class FenceParser:
+    """
+    Incremental parser for the first fenced code block of a streamed response:
+    ``feed`` returns the code received so far and ``done`` turns true at the
+    closing fence.
+    """
+
+    def __init__(self):
+        self.state = "prose"  # prose -> info (fence line) -> code -> done
+        self.buffer = ""
+        self.language = None
+        self.at_line_start = True
+        self.code_parts = []
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    @property
+    def opened(self) -> bool:
+        return self.state in ("code", "done")
+
+    @property
+    def code(self) -> str:
+        return "".join(self.code_parts)
+
+    def feed(self, piece: str) -> str:
+        """
+        Consumes a piece of the response and returns the newly available code.
+        """
+        if self.state == "done":
+            return ""
+        self.buffer += piece
+        emitted = []
+        while True:
+            if self.state == "prose":
+                index = self.buffer.find(FENCE)
+                if index < 0:
+                    # Keep a possible partial fence at the end for the next piece.
+                    self.buffer = self.buffer[-(len(FENCE) - 1):]
+                    break
+                self.buffer = self.buffer[index + len(FENCE):]
+                self.state = "info"
+            elif self.state == "info":
+                newline = self.buffer.find("\n")
+                if newline < 0:
+                    break
+                self.language = normalize_language(self.buffer[:newline])
+                self.buffer = self.buffer[newline + 1:]
+                self.state = "code"
+            elif self.state == "code":
+                text, closed = self._take_code()
+                if text:
+                    emitted.append(text)
+                if not closed:
+                    break
+                self.state = "done"
+                break
+        code = "".join(emitted)
+        self.code_parts.append(code)
+        return code
+
+    def _take_code(self):
+        """
+        Splits the buffer at a closing fence at the start of a line. Without
+        one, the last line break and a partial line that could still become
+        a fence are held back.
+        """
+        buffer = self.buffer
+        index = buffer.find(FENCE)
+        while index >= 0:
+            if (index == 0 and self.at_line_start) or (index > 0 and buffer[index - 1] == "\n"):
+                self.buffer = ""
+                text = buffer[:index]
+                # The line break before the closing fence is not part of the code.
+                return text[:-1] if text.endswith("\n") else text, True
+            index = buffer.find(FENCE, index + 1)
+
+        last_newline = buffer.rfind("\n")
+        if last_newline >= 0 and FENCE.startswith(buffer[last_newline + 1:]):
+            keep = last_newline
+        elif last_newline < 0 and self.at_line_start and FENCE.startswith(buffer):
+            keep = 0
+        else:
+            keep = len(buffer)
+        text, self.buffer = buffer[:keep], buffer[keep:]
+        if text:
+            self.at_line_start = False
+        return text, False
+
+    def finish(self) -> str:
+        """
+        Flushes held-back code when the response ends without a closing fence.
+        """
+        if self.state != "code":
+            return ""
+        text = self.buffer.rstrip("\n")
+        self.buffer = ""
+        self.state = "done"
+        self.code_parts.append(text)
+        return text
@@ -1,70 +1,174 @@
-import ollama
+if __name__ == "__main__":
+    # Fast path: let a running supergitd (see supergitd.py) do the work, before paying for the imports below.
+    import daemon_client
+    daemon_client.forward("coder")
+
 import os
+import time
 import argparse
-import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import llm_backend
+import instrumentation
+from agent_log import get_logger
+from code_fence import FenceParser, extension_for
+from instrumentation import timed
 
-def log_message(message):
+LOG = get_logger("coder", "codegen_log.jsonl")
+log_message = LOG.info
+
+NOT_A_CODE_REQUEST = "I am a code generator only."
+SYSTEM_PROMPT = (
+    "You are an expert code generator who generates a well-commented and documented code. "
+    "You are a part of CI/CD pipeline and your outputs are sent to a code reviewer. "
+    "Please ensure to give only the code with comments, in one fenced code block tagged with its language "
+    "(for example ```python). Be concise and factual. "
+    "If the user query is not related to code generation then state that you are a code generator only."
+)
+CODE_KEYWORDS = ["code", "script", "function", "class", "program"]
+# Sampling settings cycled through by concurrent candidates, so they do not all produce the same answer.
+CANDIDATE_TEMPERATURES = (0.2, 0.5, 0.8, 1.0)
+
+@timed("coder.generate")
+def generate_code_with_ollama(prompt, model=None, host=None, on_code=None, options=None, cancel=None,
+                              on_stream=None):
     """
-    Logs a message with a timestamp to a log file.
+    Streams code for the prompt through a ``FenceParser``, passing it to
+    ``on_code(language, text)`` as it arrives and stopping at the closing fence.
+    ``on_stream`` receives the ``TokenStream``, so another thread can close it.
+
+    Returns:
+        tuple: ``(code, language)``, or ``(None, None)`` if the prompt is not
+        a code request, the response contains no code block or ``cancel``
+        was set.
     """
-    log_folder = os.path.join(os.getcwd(), "logs")
-    os.makedirs(log_folder, exist_ok=True)
-    
-    log_file = os.path.join(log_folder, "codegen_log.txt")
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    with open(log_file, "a", encoding="utf-8") as log:
-        log.write(f"[{timestamp}] {message}\n")
-    print(f"[{timestamp}] {message}")
+    log_message("Generating code with prompt: " + prompt)
+
+    if not is_code_request(prompt):
+        LOG.warning(f"Prompt is not a code generation request: {NOT_A_CODE_REQUEST}")
+        return None, None
+
+    tokens = llm_backend.stream_generate(prompt, SYSTEM_PROMPT, agent="coder", model=model, host=host,
+                                         options=options)
+    if on_stream is not None:
+        on_stream(tokens)
+    parser = FenceParser()
+    try:
+        if cancel is not None and cancel.is_set():
+            return None, None
+        for piece in tokens:
+            if cancel is not None and cancel.is_set():
+                return None, None
+            code = parser.feed(piece)
+            if code and on_code is not None:
+                on_code(parser.language, code)
+            if parser.done:
+                tokens.stop()
+                log_message(f"Closing fence received after {tokens.pieces} tokens; generation stopped.")
+                break
+    finally:
+        tokens.close()
+    if cancel is not None and cancel.is_set():
+        return None, None
+
+    code = parser.finish()
+    if code and on_code is not None:
+        on_code(parser.language, code)
+    if not parser.opened:
+        LOG.warning("The response contains no code block.")
+        return None, None
+    return parser.code, parser.language
 
-def generate_code_with_ollama(prompt):
+def is_code_request(prompt):
     """
-    Generates code using the Ollama API based on the provided prompt.
+    Tells whether the prompt asks for code at all.
     """
-    client = ollama.Client()
-    model = 'qwen2.5-coder:0.5b'
-    system_prompt = (
-        "You are an expert code generator who generates a well-commented and documented code. "
-        "You are a part of CI/CD pipeline and your outputs are sent to a code reviewer. "
-        "Please ensure to give only the code with comments. Be concise and factual. "
-        "If the user query is not related to code generation then state that you are a code generator only."
-    )
+    return any(keyword in prompt.lower() for keyword in CODE_KEYWORDS)
 
-    log_message("Generating code with prompt: " + prompt)
+def validate_candidate(code, language):
+    """
+    Checks generated code: it must be non-empty and have a language tag,
+    and Python code must compile.
 
-    if any(keyword in prompt.lower() for keyword in ["code", "script", "function", "class", "program"]):
-        response = client.generate(
-            model=model,
-            prompt=prompt,
-            system=system_prompt,
-            stream=False
-        )
-
-        generated_text = response.response
-
-        if "```" in generated_text:
-            code_blocks = generated_text.split("```")
-            if len(code_blocks) > 1:
-                return code_blocks[1].strip()
-            else:
-                return generated_text.strip()
-        else:
-            return generated_text.strip()
-    else:
-        return "I am a code generator only."
+    Returns:
+        str: Why the candidate is invalid, or None if it is valid.
+    """
+    if code is None:
+        return "no fenced code block"
+    if not code.strip():
+        return "empty code block"
+    if not language:
+        return "no language tag"
+    if extension_for(language) == "py":
+        try:
+            compile(code, "<candidate>", "exec")
+        except SyntaxError as e:
+            return f"does not parse (line {e.lineno}: {e.msg})"
+    return None
 
-def save_file(content, file_type, name=""):
+@timed("coder.candidates")
+def generate_candidates(prompt, count, model=None, host=None):
     """
-    Saves the given content into a file with the specified file type in the 'coder_folder' directory.
+    Sends ``count`` generation requests with different temperatures and seeds
+    and accepts the first valid candidate; the other streams are closed.
+
+    Returns:
+        tuple: ``(content, file_type)``, or ``(None, None)`` if no candidate
+        was valid.
     """
-    coder_folder = os.path.join(os.getcwd(), "coder_folder")
-    os.makedirs(coder_folder, exist_ok=True)
+    cancel = threading.Event()
+    streams = []
+    started = time.perf_counter()
+
+    def run(index):
+        options = {"temperature": CANDIDATE_TEMPERATURES[index % len(CANDIDATE_TEMPERATURES)], "seed": index + 1}
+        return generate_code_with_ollama(prompt, model, host, options=options, cancel=cancel,
+                                         on_stream=streams.append)
 
-    extensions = {"python": "py", "py": "py", "java": "java", "c": "c", "cpp": "cpp", "js": "js", "html": "html"}
-    file_type = extensions.get(file_type.lower(), file_type)
+    executor = ThreadPoolExecutor(max_workers=count)
+    futures = {executor.submit(run, index): index for index in range(count)}
+    rejected = 0
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                code, language = future.result()
+            except Exception as e:
+                LOG.warning(f"Candidate {index + 1} failed: {e}")
+                rejected += 1
+                continue
+            reason = validate_candidate(code, language)
+            if reason:
+                LOG.warning(f"Candidate {index + 1} rejected: {reason}")
+                rejected += 1
+                continue
+            log_message(f"Candidate {index + 1} of {count} accepted after {time.perf_counter() - started:.2f}s "
+                        f"({rejected} rejected, {count - rejected - 1} cancelled).")
+            return code, language
+        LOG.error(f"All {count} candidates were rejected.")
+        return None, None
+    finally:
+        cancel.set()
+        # Candidates that register their stream after this see ``cancel`` before sending.
+        for tokens in list(streams):
+            tokens.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def code_path(name, file_type):
+    """
+    Returns the path in 'coder_folder' for generated code of the given type.
+    """
+    coder_folder = os.path.join(os.getcwd(), "coder_folder")
+    return os.path.join(coder_folder, f"{name if name else 'generated_code'}.{extension_for(file_type or '')}")
 
-    file_name = f"{name if name else 'generated_code'}.{file_type}"
-    file_path = os.path.join(coder_folder, file_name)
+@timed("coder.save")
+def save_file(content, file_type, name=""):
+    """
+    Saves the given content into a file with the specified file type in the 'coder_folder' directory.
+    """
+    file_path = code_path(name, file_type)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
     try:
         with open(file_path, "w", encoding="utf-8") as file:
@@ -72,35 +176,115 @@ def save_file(content, file_type, name=""):
         log_message("File saved successfully at: " + file_path)
         return file_path
     except Exception as e:
-        log_message("Error saving file: " + str(e))
+        LOG.error("Error saving file: " + str(e))
         return None
 
-def create(user_prompt, name=""):
-    output_code = generate_code_with_ollama(user_prompt)
-    log_message("Generated Code:\n" + output_code)
+class StreamedFile:
+    """
+    Writes code to 'coder_folder' as ``<path>.partial`` while it is generated;
+    ``commit()`` renames it into place.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.path = None
+        self.file = None
+        self.ends_with_newline = False
+
+    def write(self, language, text):
+        if self.file is None:
+            self.path = code_path(self.name, language)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path + ".partial", "w", encoding="utf-8")
+        self.file.write(text)
+        self.file.flush()
+        self.ends_with_newline = text.endswith("\n")
+
+    def commit(self):
+        if self.file is None:
+            return None
+        if not self.ends_with_newline:
+            self.file.write("\n")
+        self.file.close()
+        os.replace(self.path + ".partial", self.path)
+        log_message("File saved successfully at: " + self.path)
+        return self.path
 
-    # Detect file type (first line should be like 'python', 'c', etc.)
-    first_line_end = output_code.find("\n")
-    file_type = output_code[:first_line_end].strip()
-    content = output_code[first_line_end + 1:].strip()
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.path + ".partial")
 
-    log_message(f"Detected file type: {file_type}")
-    log_message("Saving file...")
-    save_file(content, file_type, name)
+def generate_artifact(user_prompt, model=None, host=None, candidates=1):
+    """
+    Generates code for the prompt together with its file type, racing
+    ``candidates`` requests when there are several.
+
+    Returns:
+        tuple: ``(content, file_type)``, or ``(None, None)`` if the prompt is
+        not a code request or no code was generated.
+    """
+    if candidates > 1:
+        if not is_code_request(user_prompt):
+            LOG.warning(f"Prompt is not a code generation request: {NOT_A_CODE_REQUEST}")
+            return None, None
+        return generate_candidates(user_prompt, candidates, model, host)
+
+    content, file_type = generate_code_with_ollama(user_prompt, model, host)
+    if content is None:
+        return None, None
+    LOG.debug("Generated code", code=content)
+    log_message(f"Detected file type: {file_type or 'unknown'}")
+    return content, file_type
+
+def create(user_prompt, name="", model=None, host=None, candidates=1):
+    """
+    Generates code for the prompt and saves it in 'coder_folder'.
+
+    Returns:
+        str: Path of the saved file, or None if nothing was generated.
+    """
+    if candidates > 1:
+        content, file_type = generate_artifact(user_prompt, model, host, candidates)
+        if content is None:
+            return None
+        log_message("Saving file...")
+        return save_file(content, file_type, name)
+
+    output = StreamedFile(name)
+    try:
+        content, file_type = generate_code_with_ollama(user_prompt, model, host, on_code=output.write)
+    except BaseException:
+        output.discard()
+        raise
+    if not content:
+        output.discard()
+        return None
+    log_message(f"Detected file type: {file_type or 'unknown'}")
+    return output.commit()
 
 def main():
     parser = argparse.ArgumentParser(description="Generate and save code using supergit.")
     parser.add_argument('--prompt', '-p', type=str, required=True, help='Prompt to generate code')
     parser.add_argument('--filename', '-f', type=str, default="", help='Desired filename (without extension)')
+    parser.add_argument('--model', type=str, default=None, help='Ollama model (default: SUPERGIT_CODER_MODEL or SUPERGIT_MODEL)')
+    parser.add_argument('--host', type=str, default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache and always call the model')
+    parser.add_argument('--candidates', '-n', type=int, default=1,
+                        help='Generate this many candidates concurrently and keep the first valid one')
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args()
+    instrumentation.configure(args, "coder")
+    if args.no_cache:
+        llm_backend.CACHE_ENABLED = False
 
     log_message("Starting code generation job")
-    create(args.prompt, args.filename)
+    create(args.prompt, args.filename, args.model, args.host, args.candidates)
     log_message("Job completed.")
 
 if __name__ == "__main__":
     main()
 
 
-#python code_gen_cli.py --prompt "code to reverse a string in python" --filename "reverse_string"
\ No newline at end of file
+#python code_gen_cli.py --prompt "code to reverse a string in python" --filename "reverse_string"
@@ -1,4 +1,4 @@
-import ollama
+import llm_backend
 
 def generate_code_with_ollama(prompt):
     """
@@ -11,17 +11,10 @@ def generate_code_with_ollama(prompt):
         str: The generated code with comments, or a message indicating
              that the query is not related to code generation.
     """
-    client = ollama.Client()
-    model = 'qwen2.5-coder:0.5b'
     system_prompt = "You are an expert code generator who generates a well commented and documented code. You are a part of CI/CD pipeline and your outputs are sent to a code reviewer. Please ensure to give only the code with comments. Be concise and factual. If the user query is not related to code generation then state that you are a code generator only."
 
     if any(keyword in prompt.lower() for keyword in ["code", "script", "function", "class", "program"]):
-        response = client.generate(
-            model=model,
-            prompt=prompt,
-            system=system_prompt,
-            stream=False
-        )
+        response = llm_backend.generate(prompt, system_prompt, model=llm_backend.DEFAULT_MODEL)
         #write in log file
 
         generated_text = response.response
@@ -0,0 +1,234 @@
+import ast
+import itertools
+
+from code_fence import fence_for, language_for
+
+DEFAULT_TOKEN_BUDGET = 8000
+# Rough characters-per-token ratio used when no exact counter is available.
+CHARS_PER_TOKEN = 4
+
+# Lower rank = packed first.
+RANK_MODULE_DOC = 0
+RANK_CLASS = 1
+RANK_FUNCTION = 2
+RANK_METHOD = 3
+RANK_PRIVATE = 4
+RANK_DUNDER = 5
+RANK_OTHER_FILE = 6
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (about four characters per token).
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Snippet:
+    """
+    One piece of packable context: a docstring, a signature or a file excerpt.
+    """
+
+    def __init__(self, path: str, text: str, rank: int, order: int):
+        self.path = path
+        self.text = text
+        self.rank = rank
+        self.order = order
+        self.tokens = estimate_tokens(text)
+
+
+def _indent(text: str, prefix: str) -> str:
+    return "".join(prefix + line if line.strip() else line for line in text.splitlines(keepends=True))
+
+
+def _signature(node, prefix: str = "") -> str:
+    lines = [f"{prefix}@{ast.unparse(decorator)}\n" for decorator in node.decorator_list]
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(kw) for kw in node.keywords]
+        lines.append(f"{prefix}class {node.name}({', '.join(bases)}):\n" if bases else f"{prefix}class {node.name}:\n")
+    else:
+        keyword = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+        lines.append(f"{prefix}{keyword} {node.name}({ast.unparse(node.args)}){returns}:\n")
+    docstring = ast.get_docstring(node)
+    if docstring:
+        lines.append(_indent(f'"""\n{docstring}\n"""\n', prefix + "    "))
+    if not isinstance(node, ast.ClassDef):
+        lines.append(f"{prefix}    ...\n")
+    return "".join(lines)
+
+
+def _rank(name: str, base_rank: int) -> int:
+    if name.startswith("__") and name.endswith("__"):
+        return base_rank if name == "__init__" else RANK_DUNDER
+    if name.startswith("_"):
+        return RANK_PRIVATE
+    return base_rank
+
+
+def extract_skeleton(source: str, path: str = "") -> list:
+    """
+    Extracts a ranked skeleton of a Python module: its docstring and the
+    signatures and docstrings of its classes, functions and methods.
+
+    Parameters:
+        source (str): Python source code.
+        path (str): File path the snippets are attributed to.
+
+    Returns:
+        list: ``Snippet`` objects in source order, or an empty list if the
+        source does not parse.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+
+    snippets = []
+    docstring = ast.get_docstring(tree)
+    if docstring:
+        snippets.append(Snippet(path, f'"""\n{docstring}\n"""\n', RANK_MODULE_DOC, 0))
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            snippets.append(Snippet(path, _signature(node), _rank(node.name, RANK_FUNCTION), node.lineno))
+        elif isinstance(node, ast.ClassDef):
+            snippets.append(Snippet(path, _signature(node), _rank(node.name, RANK_CLASS), node.lineno))
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    rank = max(_rank(child.name, RANK_METHOD), _rank(node.name, RANK_METHOD))
+                    snippets.append(Snippet(path, _signature(child, "    "), rank, child.lineno))
+    return snippets
+
+
+def _file_key(file_order=None):
+    """
+    Returns a sort key placing paths in ``file_order`` first, in that order,
+    and every other path after them by name.
+    """
+    position = {path: index for index, path in enumerate(file_order or ())}
+    return lambda path: (position.get(path, len(position)), path)
+
+
+def pack_snippets(snippets: list, token_budget: int, file_order=None) -> list:
+    """
+    Greedily picks the best-ranked snippets that fit in ``token_budget``
+    estimated tokens and returns them in file and source order (files in
+    ``file_order`` first, then by path).
+    """
+    chosen = []
+    used = 0
+    for snippet in sorted(snippets, key=lambda s: (s.rank, s.order)):
+        if used + snippet.tokens <= token_budget:
+            chosen.append(snippet)
+            used += snippet.tokens
+    file_key = _file_key(file_order)
+    return sorted(chosen, key=lambda s: (file_key(s.path), s.order))
+
+
+def _extension_language(path: str, text: str) -> str:
+    return language_for(path)
+
+
+def render_snippets(snippets: list, fence_language=_extension_language) -> str:
+    """
+    Renders packed snippets as one fenced Markdown block per file, tagged
+    with ``fence_language(path, text)`` (by default the language of the
+    file extension).
+    """
+    parts = []
+    for path, group in itertools.groupby(snippets, key=lambda s: s.path):
+        text = "".join(snippet.text for snippet in group)
+        fence = fence_for(text)
+        parts.append(f"\n#### FILE: {path}\n{fence}{fence_language(path, text)}\n{text}{fence}\n")
+    return "".join(parts)
+
+
+def _fit(render, token_budget: int, count_tokens) -> str:
+    """
+    Renders within the estimated budget, then shrinks the budget until an
+    exact counter (if given) agrees the result fits.
+    """
+    budget = token_budget
+    text = render(budget)
+    if count_tokens is None:
+        return text
+    for _ in range(4):
+        exact = count_tokens(text)
+        if exact <= token_budget:
+            break
+        budget = int(budget * token_budget / exact * 0.95)
+        text = render(budget)
+    return text
+
+
+def build_repo_context(repo_files: dict, token_budget: int = DEFAULT_TOKEN_BUDGET, count_tokens=None,
+                       fence_language=_extension_language, file_order=None) -> str:
+    """
+    Builds a prompt section describing a repository within a token budget: whole
+    files when they fit, ranked skeletons otherwise.
+
+    Parameters:
+        repo_files (dict): A mapping of file paths to file content.
+        token_budget (int): Maximum number of tokens for the returned text.
+        count_tokens (callable): Optional exact token counter, e.g. the model API's.
+        fence_language (callable): Returns the language of ``(path, content)``;
+            Python files are reduced to skeletons, and every block is tagged with it.
+        file_order (list): Paths to render first, in this order (e.g. by
+            dependency); the other files follow sorted by path.
+
+    Returns:
+        str: Markdown with one fenced block per included file.
+    """
+    whole = [Snippet(path, content if content.endswith("\n") else content + "\n", RANK_OTHER_FILE, 0)
+             for path, content in repo_files.items() if content.strip()]
+    if sum(snippet.tokens for snippet in whole) <= token_budget:
+        file_key = _file_key(file_order)
+        text = render_snippets(sorted(whole, key=lambda s: file_key(s.path)), fence_language)
+        if count_tokens is None or count_tokens(text) <= token_budget:
+            return text
+
+    snippets = []
+    for path, content in repo_files.items():
+        if fence_language(path, content) == "python":
+            skeleton = extract_skeleton(content, path)
+            if skeleton:
+                snippets.extend(skeleton)
+                continue
+        excerpt = "".join(content.splitlines(keepends=True)[:40])
+        if excerpt.strip():
+            snippets.append(Snippet(path, excerpt if excerpt.endswith("\n") else excerpt + "\n", RANK_OTHER_FILE, 0))
+
+    return _fit(lambda budget: render_snippets(pack_snippets(snippets, budget, file_order), fence_language),
+                token_budget, count_tokens)
+
+
+def fit_code_to_budget(code: str, token_budget: int = DEFAULT_TOKEN_BUDGET, count_tokens=None, path: str = ""):
+    """
+    Returns the code unchanged if it fits in ``token_budget`` tokens,
+    otherwise a ranked skeleton of it that does.
+
+    Returns:
+        tuple: ``(text, reduced)`` where ``reduced`` tells whether the code was
+        replaced by a skeleton.
+    """
+    tokens = count_tokens(code) if count_tokens else estimate_tokens(code)
+    if tokens <= token_budget:
+        return code, False
+
+    snippets = extract_skeleton(code, path)
+
+    def render(budget):
+        if snippets:
+            return "".join(snippet.text for snippet in pack_snippets(snippets, budget))
+        # Not Python (or not parseable): keep whole lines from the top.
+        kept = []
+        used = 0
+        for line in code.splitlines(keepends=True):
+            used += estimate_tokens(line)
+            if used > budget:
+                break
+            kept.append(line)
+        return "".join(kept)
+
+    return _fit(render, token_budget, count_tokens), True
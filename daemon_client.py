@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import socket
+
+# Environment variables that change what a run does; a daemon started with different values is not used.
+FORWARDED_PREFIXES = ("SUPERGIT_", "OLLAMA_", "GEMINI_")
+CLIENT_ONLY_VARS = ("SUPERGIT_SOCKET", "SUPERGIT_NO_DAEMON")
+
+
+def socket_path() -> str:
+    """
+    Returns the daemon's Unix socket: ``SUPERGIT_SOCKET``, or
+    ``supergitd-<uid>.sock`` in ``XDG_RUNTIME_DIR`` (or the temp directory).
+    """
+    if os.getenv("SUPERGIT_SOCKET"):
+        return os.getenv("SUPERGIT_SOCKET")
+    folder = os.getenv("XDG_RUNTIME_DIR") or os.getenv("TMPDIR") or "/tmp"
+    user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+    return os.path.join(folder, f"supergitd-{user}.sock")
+
+
+def environment() -> dict:
+    """
+    Returns the supergit, Ollama and Gemini settings of this process.
+    """
+    return {key: value for key, value in os.environ.items()
+            if key.startswith(FORWARDED_PREFIXES) and key not in CLIENT_ONLY_VARS}
+
+
+def connect(timeout: float = None):
+    """
+    Connects to the daemon, returning None if it is not running.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path()):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(socket_path())
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def request(message: dict, timeout: float = 5.0):
+    """
+    Sends a control message (``status``, ``stop``) and returns the reply, or
+    None if the daemon is not running.
+    """
+    connection = connect(timeout)
+    if connection is None:
+        return None
+    with connection:
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        line = connection.makefile("rb").readline()
+    return json.loads(line) if line else None
+
+
+def forward(tool: str) -> None:
+    """
+    Runs ``tool`` with this process's arguments in a running supergitd and exits
+    with its exit code. Returns if there is no daemon, ``SUPERGIT_NO_DAEMON`` is
+    set or the daemon declines the run.
+    """
+    if os.getenv("SUPERGIT_NO_DAEMON", "") not in ("", "0"):
+        return
+    connection = connect()
+    if connection is None:
+        return
+    message = {"tool": tool, "argv": sys.argv[1:], "cwd": os.getcwd(), "env": environment()}
+    try:
+        with connection:
+            connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            for line in connection.makefile("rb"):
+                reply = json.loads(line)
+                if "out" in reply:
+                    sys.stdout.write(reply["out"])
+                    sys.stdout.flush()
+                elif "err" in reply:
+                    sys.stderr.write(reply["err"])
+                    sys.stderr.flush()
+                elif "fallback" in reply:
+                    return
+                elif "exit" in reply:
+                    sys.exit(reply["exit"])
+    except KeyboardInterrupt:
+        # Closing the connection makes the daemon abandon the run at its next output.
+        sys.exit(130)
+    except OSError as e:
+        sys.stderr.write(f"Lost connection to supergitd: {e}\n")
+        sys.exit(1)
+    sys.stderr.write("supergitd closed the connection before the run finished\n")
+    sys.exit(1)
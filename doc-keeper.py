@@ -1,51 +1,155 @@
+if __name__ == "__main__":
+    # Fast path: let a running supergitd (see supergitd.py) do the work, before paying for the imports below.
+    import daemon_client
+    daemon_client.forward("doc-keeper")
+
 import os
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 
+import extractors
+import gemini_client
+import instrumentation
+from code_fence import fence_for
+from context_builder import build_repo_context, estimate_tokens
+from git_changes import last_commit_touching, changed_files_since
+from gitignore import IgnoreMatcher
+from import_graph import ImportGraph, GRAPH_FILE, git_stamps
+from repo_scanner import iter_repo_files, read_text_file, walk_repo, DEFAULT_MAX_FILE_SIZE
+from summary_cache import SummaryCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_ENTRIES
+from instrumentation import timed
+
 # 🔑 Load your Gemini API key (recommended to use environment variable)
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# GEMINI_API_ENDPOINT points the client at another server, e.g. the fake one in benchmarks/.
+if os.getenv("GEMINI_API_ENDPOINT"):
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport="rest",
+                    client_options={"api_endpoint": os.getenv("GEMINI_API_ENDPOINT")})
+else:
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+# ⛔ Files and folders to skip during documentation generation (gitignore syntax).
+# The repository's own .gitignore files are applied on top of these and can re-include paths with "!".
+IGNORE_PATTERNS = (
+    '*.pyc', '*.log', '*.lock', '.env', '*.sqlite3', '*.db', 'secrets.json', '*.partial',
+    '__pycache__/', 'venv/', '.venv/', 'node_modules/', 'dist/', 'build/', '.idea/', '.vscode/', '.pytest_cache/',
+    f'{DEFAULT_CACHE_DIR}/', '.supergit_cache/',
+    # Artifacts written by the supergit agents.
+    '/reviews/', '/optim/', '/coder_folder/', '/logs/', '/metrics/', '/benchmarks/results/',
+)
+
+MODEL_NAME = 'gemini-1.5-pro'
+# Requests and tokens per minute allowed by the API key's quota (--rpm / --tpm).
+GEMINI_RPM = gemini_client.DEFAULT_RPM
+GEMINI_TPM = gemini_client.DEFAULT_TPM
+# Bump whenever SUMMARY_PROMPT, BATCH_PROMPT or COMPOSE_PROMPT change so cached summaries are rebuilt.
+PROMPT_VERSION = '1'
+# Character budgets for a single map (summary) call and for the final reduce (compose) call.
+MAX_CHUNK_CHARS = 60000
+MAX_REDUCE_CHARS = 400000
+DEFAULT_WORKERS = 8
+# Token budget for the codebase section of the single-prompt mode.
+DEFAULT_PROMPT_TOKENS = 200000
+# Pseudo-path under which the composed document is cached.
+COMPOSED_DOC_KEY = '<composed documentation>'
+# Separator of the member paths in the label of a batch of related Python files.
+BATCH_JOINER = ' + '
+
+SUMMARY_PROMPT = (
+    "You are an expert software architect and technical writer.\n"
+    "Summarize the following file for a developer documentation page. Describe its purpose, "
+    "its key modules, classes and functions (with parameters and return types), any CLI usage "
+    "and how it relates to the rest of the project. Answer in Markdown without a top-level heading.\n\n"
+)
+
+BATCH_PROMPT = (
+    "You are an expert software architect and technical writer.\n"
+    "Summarize the following related Python files (they import each other) for a developer documentation page. "
+    "Each file starts with a '# ---- <path> ----' line and files come after the modules they import. "
+    "Write one section per file, named by its path, describing its purpose, its key classes and functions "
+    "(with parameters and return types) and any CLI usage, then explain how the files work together. "
+    "Answer in Markdown without a top-level heading.\n\n"
+)
+
+CONDENSE_PROMPT = (
+    "You are an expert software architect and technical writer.\n"
+    "Merge the following file summaries into one shorter Markdown summary. Keep every file path, "
+    "module, class, function and CLI usage that is mentioned; drop repetition.\n\n"
+)
 
-# ⛔ Files and folders to skip during documentation generation
-IGNORE_EXTENSIONS = ('.pyc', '.log', '.lock', '.env', '.sqlite3', '.db')
-IGNORE_FILES = ('requirements.lock', '.env', 'secrets.json')
-IGNORE_DIRS = ('.git', '__pycache__', 'venv', 'node_modules', 'dist', 'build', '.idea', '.vscode', '.pytest_cache')
+COMPOSE_PROMPT = (
+    "You are an expert software architect and technical writer.\n"
+    "Below are per-file summaries of a codebase. Using only them, write a **complete and detailed** "
+    "documentation in Markdown format. Be exhaustive and helpful for developers.\n\n"
+    "Include the following sections:\n"
+    "- 🧾 Project Overview\n"
+    "- ⚙️ Setup & Installation Instructions\n"
+    "- 🧩 Explanation of Key Modules, Classes, and Functions\n"
+    "- 🗂 Folder & File Structure with Descriptions\n"
+    "- 🔧 How to Use (with CLI or API examples if present)\n"
+    "- 🤝 Contribution Guidelines (if applicable)\n"
+    "- 🧪 Testing & Debugging Instructions (if test files exist)\n\n"
+    "### File Summaries:\n"
+)
 
-def read_repo_files(base_path: str) -> dict:
+def read_repo_files(base_path: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE) -> dict:
     """
     Recursively reads all readable files in the repository directory, excluding
     ignored directories and extensions.
 
     Parameters:
         base_path (str): The root directory of the repository.
+        max_file_size (int): Files larger than this many bytes are skipped.
 
     Returns:
-        dict: A dictionary mapping relative file paths to their content.
+        dict: A mapping of relative file paths to their content.
     """
-    file_data = {}
+    return dict(scan_repo(base_path, max_file_size))
 
-    for root, dirs, files in os.walk(base_path):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+def ignore_matcher(base_path: str) -> IgnoreMatcher:
+    """
+    Returns the matcher for files to leave out: ``IGNORE_PATTERNS`` plus the
+    repository's ``.gitignore`` files.
+    """
+    return IgnoreMatcher(base_path, IGNORE_PATTERNS)
 
-        for file in files:
-            if file.endswith(IGNORE_EXTENSIONS) or file in IGNORE_FILES:
-                continue
+def read_source(file_path: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+    """
+    Reads a file and keeps only what is worth documenting: notebook source
+    cells, a schema summary of large data files, and nothing of generated
+    files (see ``extractors.py``).
 
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                relative_path = os.path.relpath(file_path, base_path)
-                file_data[relative_path] = content
-            except Exception as e:
-                print(f"⚠️ Skipping {file_path}: {e}")
-    
-    return file_data
+    Returns:
+        tuple: ``(text, None)`` or ``(None, reason)`` if the file is skipped.
+    """
+    content, reason = read_text_file(file_path, max_file_size)
+    if content is None:
+        return None, reason
+    return extractors.extract(file_path, content)
 
-def generate_documentation(repo_files: dict) -> str:
+def scan_repo(base_path: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+    """
+    Streams ``(relative_path, text)`` pairs for the repository, reading and
+    extracting files on a thread pool and skipping ignored, binary,
+    oversized and generated files.
     """
-    Generates Markdown documentation using Gemini based on the provided codebase.
+    return iter_repo_files(
+        base_path, ignore_matcher(base_path), max_file_size=max_file_size,
+        on_skip=lambda file_path, reason: print(f"⚠️ Skipping {file_path}: {reason}"), reader=read_source,
+    )
+
+def generate_documentation(repo_files: dict, token_budget: int = DEFAULT_PROMPT_TOKENS, exact_count: bool = False,
+                           file_order=None) -> str:
+    """
+    Generates Markdown documentation using Gemini from ranked skeletons of the
+    codebase packed into ``token_budget`` tokens.
 
     Parameters:
         repo_files (dict): A mapping of file paths to file content.
+        token_budget (int): Token budget for the codebase section of the prompt.
+        exact_count (bool): Verify the budget with Gemini's count_tokens API.
+        file_order (list): Paths to present first, in this order (e.g. by dependency).
 
     Returns:
         str: Generated documentation in Markdown format.
@@ -63,14 +167,380 @@ def generate_documentation(repo_files: dict) -> str:
         "- 🧠 Add Python-style **docstrings** to all functions with descriptions of parameters and return types\n\n"
         "### Codebase Contents:\n")"""
 
-    for filename, content in repo_files.items():
-        trimmed_content = content[:3000]  # prevent token overflow
-        prompt += f"\n#### FILE: {filename}\n```python\n{trimmed_content}\n```\n"
+    # Never plan for more than the model's context window can take.
+    token_budget = min(token_budget, gemini().prompt_limit() - estimate_tokens(prompt))
+    prompt += build_repo_context(repo_files, token_budget, count_gemini_tokens if exact_count else None,
+                                 extractors.fence_language, file_order)
+    return call_gemini(prompt)
+
+def gemini() -> gemini_client.GeminiClient:
+    """
+    Returns the shared Gemini client, paced to the configured quota.
+    """
+    return gemini_client.get_client(MODEL_NAME, rpm=GEMINI_RPM, tpm=GEMINI_TPM)
+
+def call_gemini(prompt: str, tokens: int = None) -> str:
+    """
+    Sends a single prompt to Gemini through ``gemini_client`` and returns the
+    response text.
+    """
+    return gemini().generate(prompt, tokens)
+
+def split_into_chunks(content: str, max_chars: int = MAX_CHUNK_CHARS) -> list:
+    """
+    Splits text into chunks of at most ``max_chars`` characters on line
+    boundaries, so large files are summarized in parts instead of truncated.
+
+    Parameters:
+        content (str): Text to split.
+        max_chars (int): Maximum chunk size in characters.
+
+    Returns:
+        list: The chunks, in order; joining them gives back ``content``.
+    """
+    chunks = []
+    current = []
+    current_size = 0
+    for line in content.splitlines(keepends=True):
+        while len(line) > max_chars:  # a single overlong line (minified code, data)
+            if current:
+                chunks.append("".join(current))
+                current, current_size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current_size + len(line) > max_chars:
+            chunks.append("".join(current))
+            current, current_size = [], 0
+        current.append(line)
+        current_size += len(line)
+    if current or not chunks:
+        chunks.append("".join(current))
+    return chunks
+
+def count_gemini_tokens(text: str) -> int:
+    """
+    Returns the exact number of tokens Gemini counts for ``text``.
+    """
+    return gemini().count_tokens(text)
+
+@timed("doc-keeper.summarize")
+def summarize_chunk(filename: str, chunk: str, part: int = 1, total: int = 1) -> str:
+    """
+    Asks Gemini for a standalone Markdown summary of one file or file part,
+    or of a batch of related files (see ``group_by_imports``).
+
+    Parameters:
+        filename (str): Relative path of the file, or the label of a batch.
+        chunk (str): The file content, or one part of it.
+        part (int): 1-based index of the part.
+        total (int): Number of parts the file was split into.
+
+    Returns:
+        str: Markdown summary of the chunk.
+    """
+    label = filename if total == 1 else f"{filename} (part {part} of {total})"
+    fence = fence_for(chunk)
+    instructions = BATCH_PROMPT if BATCH_JOINER in filename else SUMMARY_PROMPT
+    prompt = instructions + f"#### FILE: {label}\n{fence}{extractors.fence_language(filename, chunk)}\n{chunk}\n{fence}\n"
+    tokens = gemini().count_tokens(prompt)
+    if not gemini().fits(tokens) and len(chunk) > 1:
+        # Too large for the context window: summarize the halves on their own instead of trimming.
+        halves = split_into_chunks(chunk, len(chunk) // 2 + 1)
+        return "\n\n".join(summarize_chunk(filename, half, part, total) for half in halves)
+    return call_gemini(prompt, tokens)
+
+def summarize_files(repo_files, executor: ThreadPoolExecutor, on_summary=None,
+                    max_pending: int = 4 * DEFAULT_WORKERS) -> dict:
+    """
+    Map step: summarizes ``(path, content)`` pairs concurrently, splitting large
+    files into parts.
+
+    Parameters:
+        repo_files (dict | iterable): File paths and contents to summarize.
+        executor (ThreadPoolExecutor): Pool bounding the number of concurrent model calls.
+        on_summary (callable): Called with ``(path, content_key, summary)`` per finished file,
+            where ``content_key`` is whatever the stream attached (or None for a dict).
+        max_pending (int): Maximum number of files submitted but not yet collected.
+
+    Returns:
+        dict: A mapping of file paths to their Markdown summaries.
+    """
+    if isinstance(repo_files, dict):
+        repo_files = ((filename, content, None) for filename, content in repo_files.items())
+
+    in_flight = deque()
+    summaries = {}
+
+    def drain(limit):
+        while len(in_flight) > limit:
+            filename, key, parts = in_flight.popleft()
+            summaries[filename] = "\n\n".join(part.result() for part in parts)
+            print(f"🧠 Summarized {filename}")
+            if on_summary is not None:
+                on_summary(filename, key, summaries[filename])
+
+    for filename, content, key in repo_files:
+        chunks = split_into_chunks(content)
+        parts = [
+            executor.submit(summarize_chunk, filename, chunk, index, len(chunks))
+            for index, chunk in enumerate(chunks, start=1)
+        ]
+        in_flight.append((filename, key, parts))
+        drain(max_pending)
+    drain(0)
+    return summaries
+
+def batch_label(paths) -> str:
+    """
+    Returns the label a batch of files is summarized and cached under.
+    """
+    return BATCH_JOINER.join(paths)
+
+def batch_content(paths, contents: dict) -> str:
+    """
+    Joins the files of a batch, in the given (dependency) order, each under a
+    ``# ---- <path> ----`` header.
+    """
+    return "".join(f"# ---- {path} ----\n{contents[path]}\n" for path in paths if contents.get(path) is not None)
+
+def group_by_imports(repo_files, graph: ImportGraph, max_chars: int = MAX_CHUNK_CHARS):
+    """
+    Passes other files through and yields the Python files last, in dependency
+    order, as batches of related modules of up to ``max_chars`` characters.
+
+    Parameters:
+        repo_files (iterable): ``(path, content)`` pairs.
+        graph (ImportGraph): The repository's import graph; saved after the update.
+        max_chars (int): Size budget of a batch.
+
+    Yields:
+        tuple: ``(path or batch label, content)`` pairs.
+    """
+    sources = {}
+    for filename, content in repo_files:
+        if filename.endswith(".py"):
+            sources[filename] = content
+        else:
+            yield filename, content
+
+    changes = graph.update(sources, sources.get)
+    graph.save()
+    batches = graph.batches(max_chars)
+    print(f"🕸️ Import graph: {len(sources)} modules ({changes['parsed']} parsed) in {len(batches)} batches")
+    for batch in batches:
+        if len(batch) == 1:
+            yield batch[0], sources[batch[0]]
+        else:
+            yield batch_label(batch), batch_content(batch, sources)
 
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    response = model.generate_content(prompt)
-    return response.text
+@timed("doc-keeper.reduce")
+def reduce_summaries(summaries: dict, executor: ThreadPoolExecutor, max_chars: int = MAX_REDUCE_CHARS) -> dict:
+    """
+    Condenses summaries in concurrent rounds until they fit in a single
+    compose prompt of ``max_chars`` characters.
 
+    Parameters:
+        summaries (dict): A mapping of labels (file paths) to summaries.
+        executor (ThreadPoolExecutor): Pool bounding the number of concurrent model calls.
+        max_chars (int): Size budget of the final compose prompt.
+
+    Returns:
+        dict: A mapping of labels to summaries whose combined size fits the budget.
+    """
+    while sum(len(summary) for summary in summaries.values()) > max_chars and len(summaries) > 1:
+        groups = []
+        current = []
+        current_size = 0
+        for filename, summary in sorted(summaries.items()):
+            if current and current_size + len(summary) > max_chars // 2:
+                groups.append(current)
+                current, current_size = [], 0
+            current.append((filename, summary))
+            current_size += len(summary)
+        groups.append(current)
+        if len(groups) == len(summaries):  # every summary is already too big to pair up
+            break
+
+        def condense(group):
+            parts = [f"\n#### FILE: {filename}\n{summary}\n" for filename, summary in group]
+            return call_gemini(CONDENSE_PROMPT + "".join(parts))
+
+        labels = [
+            f"{group[0][0].split(' … ')[0]} … {group[-1][0].split(' … ')[-1]}" if len(group) > 1 else group[0][0]
+            for group in groups
+        ]
+        summaries = dict(zip(labels, executor.map(condense, groups)))
+        print(f"🔁 Condensed summaries into {len(summaries)} groups")
+    return summaries
+
+@timed("doc-keeper.compose")
+def compose_documentation(summaries: dict, cache: SummaryCache = None) -> str:
+    """
+    Reduce step: builds the final documentation from per-file summaries, reusing
+    the cached document when no summary changed.
+
+    Parameters:
+        summaries (dict): A mapping of file paths to their Markdown summaries.
+        cache (SummaryCache): Optional cache for the composed document.
+
+    Returns:
+        str: Generated documentation in Markdown format.
+    """
+    parts = [f"\n#### FILE: {filename}\n{summary}\n" for filename, summary in sorted(summaries.items())]
+    prompt = COMPOSE_PROMPT + "".join(parts)
+
+    if cache is None:
+        return call_gemini(prompt)
+
+    documentation = cache.get(COMPOSED_DOC_KEY, prompt)
+    if documentation is None:
+        documentation = call_gemini(prompt)
+        cache.put(COMPOSED_DOC_KEY, prompt, documentation)
+    return documentation
+
+def generate_documentation_map_reduce(repo_files, cache: SummaryCache = None,
+                                      workers: int = DEFAULT_WORKERS, summaries: dict = None,
+                                      refresh=()) -> str:
+    """
+    Generates documentation by summarizing files concurrently (map) and writing
+    the document from the summaries (reduce).
+
+    Parameters:
+        repo_files (dict | iterable): A mapping, or a stream of ``(path, content)`` pairs.
+        cache (SummaryCache): Optional persistent summary cache.
+        workers (int): Maximum number of concurrent model calls.
+        summaries (dict): Already known summaries of files that are not in ``repo_files``.
+        refresh (iterable): Paths that are re-summarized even when their content is cached.
+
+    Returns:
+        str: Generated documentation in Markdown format.
+    """
+    if isinstance(repo_files, dict):
+        repo_files = repo_files.items()
+
+    summaries = dict(summaries or {})
+    seen_paths = list(summaries)
+    refresh = set(refresh)
+
+    def pending():
+        for filename, content in repo_files:
+            seen_paths.append(filename)
+            if cache is None:
+                yield filename, content, None
+                continue
+            summary = cache.get(filename, content) if filename not in refresh else None
+            if summary is None:
+                yield filename, content, cache.key_for(content)
+            else:
+                summaries[filename] = summary
+
+    def store(filename, key, summary):
+        if cache is not None:
+            cache.store(filename, key, summary)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        summaries.update(summarize_files(pending(), executor, on_summary=store, max_pending=4 * workers))
+        if cache is not None:
+            print(f"📦 Summary cache: {cache.hits} hits, {cache.misses} misses")
+            cache.forget_paths(seen_paths + [COMPOSED_DOC_KEY])
+        summaries = reduce_summaries(summaries, executor)
+
+    return compose_documentation(summaries, cache)
+
+def generate_documentation_since_docs(repo_path: str, cache: SummaryCache, output_file: str,
+                                      workers: int = DEFAULT_WORKERS,
+                                      max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+                                      graph: ImportGraph = None, batched: bool = True) -> str:
+    """
+    Generates documentation by re-summarizing only the files changed since the
+    commit that last touched ``output_file``, plus their importers.
+
+    Parameters:
+        repo_path (str): Root of the local git repository.
+        cache (SummaryCache): The persistent summary cache.
+        output_file (str): Documentation file, relative to ``repo_path``, whose last commit is the baseline.
+        workers (int): Maximum number of concurrent model calls.
+        max_file_size (int): Files larger than this many bytes are skipped.
+        graph (ImportGraph): The repository's import graph (built in memory if None).
+        batched (bool): Summarize related Python files together (see ``group_by_imports``).
+
+    Returns:
+        str: Generated documentation in Markdown format.
+    """
+    all_paths = [
+        os.path.relpath(file_path, repo_path)
+        for file_path in walk_repo(repo_path, ignore_matcher(repo_path))
+    ]
+    all_paths = [path for path in all_paths if path != output_file]
+    graph = graph if graph is not None else ImportGraph(repo_path)
+
+    def read_file(file_path):
+        return read_text_file(file_path, max_file_size)[0]
+
+    try:
+        commit = last_commit_touching(repo_path, output_file)
+        changed = changed_files_since(repo_path, commit) if commit else None
+    except RuntimeError as e:
+        print(f"⚠️ Git history unavailable ({e}); rescanning everything")
+        changed = None
+    else:
+        if commit is None:
+            print(f"⚠️ No commit touches {output_file} yet; rescanning everything")
+    if changed is None:
+        repo_files = ((path, content) for path, content in scan_repo(repo_path, max_file_size) if path != output_file)
+        if batched:
+            repo_files = group_by_imports(repo_files, graph)
+        return generate_documentation_map_reduce(repo_files, cache, workers)
+
+    # Modules that were deleted are only in the graph as it was before this update.
+    importers = graph.importers_of(changed)
+    graph.update([path for path in all_paths if path.endswith(".py")],
+                 lambda path: read_file(os.path.join(repo_path, path)), git_stamps(repo_path), force=changed)
+    graph.save()
+    importers = (importers | graph.importers_of(changed)) - changed
+    print(f"🔀 {len(changed)} files changed since {commit[:10]}, {len(importers)} importing files affected")
+
+    affected = changed | importers
+    batches = [batch for batch in graph.batches(MAX_CHUNK_CHARS) if len(batch) > 1] if batched else []
+    batched_paths = {path for batch in batches for path in batch}
+    summaries = {}
+    targets = []
+    refresh = set(importers)
+    for path in all_paths:
+        if path in batched_paths:
+            continue
+        summary = None if path in affected else cache.get_by_path(path)
+        if summary is None:
+            targets.append([path])
+        else:
+            summaries[path] = summary
+    for batch in batches:
+        label = batch_label(batch)
+        summary = None if affected.intersection(batch) else cache.get_by_path(label)
+        if summary is None:
+            targets.append(batch)
+            if importers.intersection(batch):
+                refresh.add(label)
+        else:
+            summaries[label] = summary
+
+    def stream():
+        for paths in targets:
+            contents = {}
+            for path in paths:
+                content, reason = read_source(os.path.join(repo_path, path), max_file_size)
+                if content is None:
+                    print(f"⚠️ Skipping {path}: {reason}")
+                    continue
+                contents[path] = content
+            if len(paths) == 1 and contents:
+                yield paths[0], contents[paths[0]]
+            elif contents:
+                yield batch_label(paths), batch_content(paths, contents)
+
+    return generate_documentation_map_reduce(stream(), cache, workers, summaries=summaries, refresh=refresh)
+
+@timed("doc-keeper.write")
 def write_documentation(doc_text: str, output_file: str = "DOCUMENTATION.md") -> None:
     """
     Writes the generated documentation to a file.
@@ -83,10 +553,89 @@ def write_documentation(doc_text: str, output_file: str = "DOCUMENTATION.md") ->
         f.write(doc_text)
     print(f"✅ Documentation written to {output_file}")
 
-if __name__ == "__main__":
-    repo_path = os.path.abspath(os.path.dirname(__file__))  # Root of the repo where doc-keeper.py lives
+def main():
+    global GEMINI_RPM, GEMINI_TPM
+    parser = argparse.ArgumentParser(description="Generate repository documentation with Gemini.")
+    parser.add_argument('--map-reduce', '-m', action='store_true',
+                        help='Summarize files concurrently, then write the document from the summaries')
+    parser.add_argument('--incremental', '-i', action='store_true',
+                        help='Map-reduce mode that only summarizes new or changed files, reusing cached summaries')
+    parser.add_argument('--since-docs', '-s', action='store_true',
+                        help='Incremental mode that only rescans files changed (per local git history) since the '
+                             'last commit touching the output file, plus the files importing them')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help='Maximum number of concurrent Gemini requests')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Directory of the summary cache')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='Maximum number of cached summaries')
+    parser.add_argument('--cache-max-mb', type=float, default=64, help='Maximum size of cached summaries in MB')
+    parser.add_argument('--max-file-size', type=int, default=DEFAULT_MAX_FILE_SIZE,
+                        help='Skip files larger than this many bytes')
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_PROMPT_TOKENS,
+                        help='Token budget for the codebase skeleton in single-prompt mode')
+    parser.add_argument('--exact-tokens', action='store_true',
+                        help="Verify the token budget with Gemini's count_tokens API")
+    parser.add_argument('--rpm', type=int, default=GEMINI_RPM,
+                        help='Gemini requests per minute to stay within (GEMINI_RPM; 0: no pacing)')
+    parser.add_argument('--tpm', type=int, default=GEMINI_TPM,
+                        help='Gemini tokens per minute to stay within (GEMINI_TPM; 0: no pacing)')
+    parser.add_argument('--no-import-graph', action='store_true',
+                        help='Summarize and present files one by one instead of grouping related Python modules '
+                             'by their imports')
+    parser.add_argument('--output', '-o', type=str, default="DOCUMENTATION.md",
+                        help='Output file, relative to --repo')
+    parser.add_argument('--repo', type=str, default=os.path.dirname(os.path.abspath(__file__)),
+                        help='Repository to document (default: the repo where doc-keeper.py lives)')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args, "doc-keeper")
+    GEMINI_RPM, GEMINI_TPM = args.rpm, args.tpm
+
+    repo_path = os.path.abspath(args.repo)
+    # The output is written inside the repository; its repo-relative name is what the scan and git history see.
+    output_path = os.path.join(repo_path, args.output)
+    output_name = os.path.relpath(output_path, repo_path)
     print(f"📂 Scanning project directory: {repo_path}")
-    repo_files = read_repo_files(repo_path)
+    # Stream files straight into the map step in map-reduce modes; the single-prompt mode needs them all at once.
+    repo_files = (
+        (filename, content) for filename, content in scan_repo(repo_path, args.max_file_size)
+        if filename != output_name  # never document the previous output
+    )
+
     print("🤖 Using Gemini 2.0 to generate extensive documentation...")
-    documentation = generate_documentation(repo_files)
-    write_documentation(documentation)
+    if args.incremental or args.since_docs:
+        cache_dir = os.path.join(repo_path, args.cache_dir)
+        cache = SummaryCache(cache_dir, model=MODEL_NAME, prompt_version=PROMPT_VERSION,
+                             max_entries=args.cache_max_entries, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+        graph = ImportGraph(repo_path, os.path.join(cache_dir, GRAPH_FILE))
+        if args.since_docs:
+            documentation = generate_documentation_since_docs(repo_path, cache, output_name, args.workers,
+                                                              args.max_file_size, graph, not args.no_import_graph)
+        else:
+            if not args.no_import_graph:
+                repo_files = group_by_imports(repo_files, graph)
+            documentation = generate_documentation_map_reduce(repo_files, cache, args.workers)
+        evicted = cache.prune()
+        cache.save()
+        if evicted:
+            print(f"🧹 Evicted {evicted} stale cache entries")
+    elif args.map_reduce:
+        if not args.no_import_graph:
+            repo_files = group_by_imports(repo_files, ImportGraph(repo_path))
+        documentation = generate_documentation_map_reduce(repo_files, workers=args.workers)
+    else:
+        repo_files = dict(repo_files)
+        file_order = None
+        if not args.no_import_graph:
+            # Present modules after the modules they import, so related code sits together in the prompt.
+            graph = ImportGraph(repo_path)
+            graph.update(repo_files, repo_files.get)
+            file_order = graph.order()
+        documentation = generate_documentation(repo_files, args.token_budget, args.exact_tokens, file_order)
+    write_documentation(documentation, output_path)
+    stats = gemini().stats
+    print(f"📊 Gemini: {stats['requests']} requests, {stats['retries']} retries "
+          f"({stats['quota_errors']} quota errors), {stats['paced_seconds']:.1f}s paced, {stats['trimmed']} trimmed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import io
+import os
+import csv
+import json
+
+from code_fence import language_for
+
+# Files with one of these markers near the top were written by a tool and are not documented.
+GENERATED_MARKERS = ("@generated", "do not edit", "code generated by", "autogenerated", "auto-generated",
+                     "this file was generated", "this file is generated", "generated by the protocol buffer")
+GENERATED_FILES = {"package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "pipfile.lock", "cargo.lock",
+                   "composer.lock", "gemfile.lock", "go.sum", "uv.lock", "requirements.lock"}
+GENERATED_SUFFIXES = (".min.js", ".min.css", ".map", "_pb2.py", "_pb2_grpc.py", ".pb.go", ".g.dart")
+# Only comment lines among the first lines of a file are searched for the markers.
+HEADER_LINES = 5
+COMMENT_STARTS = ("#", "//", "/*", "*", "<!--", "--", ";", '"""', "'''")
+# Average line length above which a file is treated as minified.
+MINIFIED_LINE_CHARS = 500
+# Data files up to this size are included as they are; larger ones are replaced by a schema summary.
+DATA_INLINE_CHARS = 4000
+SAMPLE_ROWS = 200
+SAMPLE_LINES = 3
+# Nesting levels and keys per object shown in a JSON schema summary.
+SCHEMA_DEPTH = 4
+SCHEMA_KEYS = 40
+SUMMARY_HEADER = "# Schema summary"
+# Comment prefix for notebook markdown cells, by kernel language.
+COMMENT_PREFIXES = {"javascript": "//", "typescript": "//", "java": "//", "scala": "//", "c++": "//", "go": "//",
+                    "rust": "//", "csharp": "//", "kotlin": "//"}
+
+_extractors = {}
+
+
+def register(*suffixes):
+    """
+    Registers the decorated ``function(path, content)`` as the extractor for
+    files ending in ``suffixes``; it returns ``(text, None)`` or ``(None,
+    reason)``.
+    """
+    def decorator(func):
+        for suffix in suffixes:
+            _extractors[suffix] = func
+        return func
+    return decorator
+
+
+def extractor_for(path: str):
+    """
+    Returns the extractor registered for a path, or None for plain text.
+    """
+    name = os.path.basename(path).lower()
+    for suffix, func in _extractors.items():
+        if name.endswith(suffix):
+            return func
+    return None
+
+
+def generated_reason(path: str, content: str):
+    """
+    Tells why a file looks generated (lock file, minified bundle, generated
+    code marker), or returns None.
+    """
+    name = os.path.basename(path).lower()
+    if name in GENERATED_FILES:
+        return "lock file"
+    if name.endswith(GENERATED_SUFFIXES):
+        return "generated file"
+    for line in content[:4096].splitlines()[:HEADER_LINES]:
+        line = line.strip().lower()
+        if line.startswith(COMMENT_STARTS):
+            for marker in GENERATED_MARKERS:
+                if marker in line:
+                    return f"generated file (marked '{marker}')"
+    lines = content.count("\n") + 1
+    # Data files and notebooks are often written on one line; their extractors handle them.
+    if len(content) > DATA_INLINE_CHARS and len(content) / lines > MINIFIED_LINE_CHARS and extractor_for(path) is None:
+        return "minified file"
+    return None
+
+
+def extract(path: str, content: str):
+    """
+    Turns a file's content into the text worth documenting, skipping generated
+    files.
+
+    Parameters:
+        path (str): Path of the file; its name selects the extractor.
+        content (str): The decoded file content.
+
+    Returns:
+        tuple: ``(text, None)`` or ``(None, reason)`` if the file is skipped.
+    """
+    reason = generated_reason(path, content)
+    if reason:
+        return None, reason
+    func = extractor_for(path)
+    return func(path, content) if func is not None else (content, None)
+
+
+def fence_language(path: str, text: str) -> str:
+    """
+    Returns the language tag for fencing extracted ``text`` of ``path``.
+    """
+    return "yaml" if text.startswith(SUMMARY_HEADER) else language_for(path)
+
+
+@register(".ipynb")
+def extract_notebook(path: str, content: str):
+    """
+    Keeps the source of code and markdown cells, in the percent format
+    (``# %%`` cell markers) that editors read as a script; outputs,
+    execution counts and metadata are dropped.
+    """
+    try:
+        notebook = json.loads(content)
+        cells = notebook.get("cells")
+        if cells is None:
+            # nbformat 3 keeps cells in worksheets and code in "input".
+            cells = [cell for sheet in notebook.get("worksheets", []) for cell in sheet.get("cells", [])]
+    except (ValueError, AttributeError):
+        return None, "not a valid notebook"
+    metadata = notebook.get("metadata") or {}
+    language = ((metadata.get("kernelspec") or {}).get("language")
+                or (metadata.get("language_info") or {}).get("name") or "python").lower()
+    comment = COMMENT_PREFIXES.get(language, "#")
+
+    parts = []
+    for cell in cells:
+        source = cell.get("source", cell.get("input", ""))
+        source = "".join(source) if isinstance(source, list) else str(source)
+        if not source.strip():
+            continue
+        if cell.get("cell_type") == "code":
+            parts.append(f"{comment} %%\n{source.rstrip()}\n")
+        elif cell.get("cell_type") == "markdown":
+            lines = "".join(f"{comment} {line}".rstrip() + "\n" for line in source.strip().splitlines())
+            parts.append(f"{comment} %% [markdown]\n{lines}")
+    if not parts:
+        return None, "notebook has no source cells"
+    return "\n".join(parts), None
+
+
+def _value_type(value: str) -> str:
+    if value == "":
+        return "empty"
+    for kind, convert in (("integer", int), ("number", float)):
+        try:
+            convert(value)
+            return kind
+        except ValueError:
+            pass
+    return "boolean" if value.lower() in ("true", "false") else "string"
+
+
+@register(".csv", ".tsv")
+def extract_table(path: str, content: str):
+    """
+    Summarizes a large CSV/TSV file by its columns, their inferred types and
+    its first lines.
+    """
+    if len(content) <= DATA_INLINE_CHARS:
+        return content, None
+    delimiter = "\t" if path.lower().endswith(".tsv") else ","
+    rows = csv.reader(io.StringIO(content), delimiter=delimiter)
+    header = next(rows, [])
+    types = [set() for _ in header]
+    count = 0
+    for row in rows:
+        count += 1
+        if count <= SAMPLE_ROWS:
+            for index, value in enumerate(row[:len(header)]):
+                types[index].add(_value_type(value.strip()))
+    lines = [f"{SUMMARY_HEADER} of {os.path.basename(path)} (rows omitted): {count} rows, {len(header)} columns",
+             "columns:"]
+    for name, kinds in zip(header, types):
+        kinds.discard("empty")
+        if not kinds:
+            kind = "empty"
+        elif kinds <= {"integer", "number"}:
+            kind = "number" if "number" in kinds else "integer"
+        else:
+            kind = kinds.pop() if len(kinds) == 1 else "string"
+        lines.append(f"  {json.dumps(name)}: {kind}")
+    lines.append("first lines: |")
+    lines.extend("  " + line for line in content.splitlines()[:SAMPLE_LINES + 1])
+    return "\n".join(lines) + "\n", None
+
+
+def _schema(value, depth: int = 0):
+    """
+    Reduces a JSON value to its structure: type names for scalars, keys for
+    objects and the first element for arrays. Objects and arrays become
+    dicts of display label to schema.
+    """
+    if isinstance(value, dict):
+        if depth >= SCHEMA_DEPTH:
+            return f"object ({len(value)} keys)"
+        schema = {json.dumps(key): _schema(item, depth + 1) for key, item in list(value.items())[:SCHEMA_KEYS]}
+        if len(value) > SCHEMA_KEYS:
+            schema["..."] = f"{len(value) - SCHEMA_KEYS} more keys"
+        return schema
+    if isinstance(value, list):
+        if not value:
+            return "empty array"
+        if depth >= SCHEMA_DEPTH:
+            return f"array ({len(value)} items)"
+        return {f"array of {len(value)}, first item": _schema(value[0], depth + 1)}
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    return "null" if value is None else "string"
+
+
+def _render_schema(schema, indent: str = "  ") -> list:
+    if not isinstance(schema, dict):
+        return [f"{indent}{schema}"]
+    lines = []
+    for label, item in schema.items():
+        if isinstance(item, dict):
+            lines.append(f"{indent}{label}:")
+            lines.extend(_render_schema(item, indent + "  "))
+        else:
+            lines.append(f"{indent}{label}: {item}")
+    return lines
+
+
+@register(".json")
+def extract_json(path: str, content: str):
+    """
+    Summarizes a large JSON document by its structure.
+    """
+    if len(content) <= DATA_INLINE_CHARS:
+        return content, None
+    try:
+        schema = _schema(json.loads(content))
+    except ValueError:
+        return content, None
+    lines = [f"{SUMMARY_HEADER} of {os.path.basename(path)} (values omitted):"]
+    lines.extend(_render_schema(schema))
+    return "\n".join(lines) + "\n", None
+
+
+@register(".jsonl", ".ndjson")
+def extract_json_lines(path: str, content: str):
+    """
+    Summarizes a large JSON Lines file by the structure of its first record
+    and the keys seen in its first records.
+    """
+    if len(content) <= DATA_INLINE_CHARS:
+        return content, None
+    records = [line for line in content.splitlines() if line.strip()]
+    keys = {}
+    first = None
+    for line in records[:SAMPLE_ROWS]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if first is None:
+            first = record
+        if isinstance(record, dict):
+            for key in record:
+                keys[key] = keys.get(key, 0) + 1
+    if first is None:
+        return content, None
+    sampled = min(len(records), SAMPLE_ROWS)
+    lines = [f"{SUMMARY_HEADER} of {os.path.basename(path)} (records omitted): {len(records)} records",
+             "first record:"]
+    lines.extend(_render_schema(_schema(first)))
+    optional = [key for key, seen in keys.items() if seen < sampled]
+    if optional:
+        lines.append(f"keys missing from some of the first {sampled} records: {', '.join(optional)}")
+    return "\n".join(lines) + "\n", None
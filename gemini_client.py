@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import threading
+
+import google.generativeai as genai
+
+from agent_log import get_logger
+from context_builder import estimate_tokens
+from instrumentation import span, record_model_metrics
+from llm_backend import backoff_delay
+
+# Quota of the Gemini API key; requests are paced to stay within it. 0 disables pacing.
+DEFAULT_RPM = int(os.getenv("GEMINI_RPM", "60"))
+DEFAULT_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+# Context window of the model, and the part of it kept free for the answer.
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("GEMINI_CONTEXT_TOKENS", "1048576"))
+DEFAULT_OUTPUT_TOKENS = int(os.getenv("GEMINI_OUTPUT_TOKENS", "8192"))
+DEFAULT_RETRIES = int(os.getenv("GEMINI_RETRIES", "5"))
+DEFAULT_BACKOFF = 2.0
+# Burst allowed by the pacing, as a fraction of the per-minute quota (one second's worth), so even a
+# sliding-window quota is never overrun by more than that.
+BURST_FRACTION = 1 / 60
+TRIM_MARKER = "\n\n[... input trimmed to fit the model's context window ...]\n"
+
+LOG = get_logger("gemini")
+
+
+class TokenBucket:
+    """
+    Paces a quantity (requests or tokens) to ``per_minute`` units a minute with
+    bursts of up to ``capacity``; 0 disables pacing.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None, period: float = 60.0):
+        self.rate = per_minute / period
+        self.capacity = max(1.0, per_minute * BURST_FRACTION) if capacity is None else capacity
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes ``amount`` units and returns how many seconds the caller must
+        wait before using them.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return -self.level / self.rate if self.level < 0 else 0.0
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Blocks until ``amount`` units are available; returns the seconds waited.
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def adjust(self, amount: float) -> None:
+        """
+        Charges ``amount`` more units (or refunds them when negative), e.g.
+        once the real token count of a request is known.
+        """
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - amount)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Tells whether a Gemini call failed because the quota was used up (429).
+    """
+    from google.api_core import exceptions
+
+    return isinstance(error, (exceptions.TooManyRequests, exceptions.ResourceExhausted))
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Tells whether a failed Gemini call is worth retrying: quota errors
+    (429), server errors, timeouts and connection problems.
+    """
+    from google.api_core import exceptions
+
+    if is_quota_error(error) or isinstance(error, (exceptions.ServerError, exceptions.DeadlineExceeded)):
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_after(error: Exception) -> float:
+    """
+    Returns the delay a quota error asks for ("Please retry in 37.2s"), or 0.
+    """
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error))
+    return float(match.group(1)) if match else 0.0
+
+
+class GeminiClient:
+    """
+    Gemini request layer shared by all threads: counts, trims, paces and retries
+    prompts.
+    """
+
+    def __init__(self, model_name: str, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM,
+                 context_tokens: int = DEFAULT_CONTEXT_TOKENS, output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, period: float = 60.0):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.requests = TokenBucket(rpm, period=period)
+        self.tokens = TokenBucket(tpm, period=period)
+        self.context_tokens = context_tokens
+        self.output_tokens = output_tokens
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "quota_errors": 0, "trimmed": 0, "paced_seconds": 0.0}
+
+    def _count(self, name: str, value=1) -> None:
+        with self.lock:
+            self.stats[name] += value
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Returns the number of tokens Gemini counts for ``text``, or an
+        estimate if the count_tokens call fails.
+        """
+        try:
+            return self.model.count_tokens(text).total_tokens
+        except Exception as e:
+            LOG.warning(f"count_tokens failed ({e}); estimating instead")
+            return estimate_tokens(text)
+
+    def prompt_limit(self) -> int:
+        """
+        Returns the largest prompt, in tokens, that leaves room for the answer.
+        """
+        return self.context_tokens - self.output_tokens
+
+    def fits(self, tokens: int) -> bool:
+        return tokens <= self.prompt_limit()
+
+    def trim(self, prompt: str, tokens: int):
+        """
+        Cuts the end of a prompt until it fits the context window.
+
+        Returns:
+            tuple: ``(prompt, tokens)`` of the trimmed prompt.
+        """
+        body = prompt
+        while not self.fits(tokens) and body:
+            keep = min(len(body) - 1, int(len(body) * self.prompt_limit() / tokens * 0.95))
+            body = body[:max(keep, 0)]
+            prompt = body + TRIM_MARKER
+            tokens = self.count_tokens(prompt)
+        self._count("trimmed")
+        return prompt, tokens
+
+    def generate(self, prompt: str, tokens: int = None, agent: str = "doc-keeper") -> str:
+        """
+        Sends a prompt and returns the response text.
+
+        Parameters:
+            prompt (str): The prompt.
+            tokens (int): The prompt's token count, if the caller already has it.
+            agent (str): Agent name the metrics are recorded under.
+
+        Returns:
+            str: The response text.
+        """
+        tokens = self.count_tokens(prompt) if tokens is None else tokens
+        if not self.fits(tokens):
+            LOG.warning(f"Prompt of {tokens} tokens exceeds the {self.prompt_limit()}-token limit; trimming it")
+            prompt, tokens = self.trim(prompt, tokens)
+
+        attempt = 0
+        while True:
+            waited = self.requests.acquire(1) + self.tokens.acquire(tokens)
+            if waited:
+                self._count("paced_seconds", waited)
+            self._count("requests")
+            try:
+                with span("gemini.generate", model=self.model_name):
+                    started = time.perf_counter()
+                    response = self.model.generate_content(prompt)
+                    usage = response.usage_metadata
+                    record_model_metrics({"prompt_eval_count": usage.prompt_token_count,
+                                          "eval_count": usage.candidates_token_count},
+                                         agent, self.model_name, time.perf_counter() - started)
+                # The reservation covered the prompt; charge what the call really used.
+                self.tokens.adjust((usage.total_token_count or tokens) - tokens)
+                return response.text
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                delay = max(backoff_delay(attempt, self.backoff, cap=60.0), retry_after(e))
+                attempt += 1
+                self._count("retries")
+                if is_quota_error(e):
+                    self._count("quota_errors")
+                LOG.warning(f"Gemini request failed ({str(e).splitlines()[0]}); "
+                            f"retry {attempt}/{self.retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(model_name: str, **settings) -> GeminiClient:
+    """
+    Returns the shared client for a model and ``settings`` (see
+    ``GeminiClient``), creating it on first use.
+    """
+    key = (model_name,) + tuple(sorted(settings.items()))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = GeminiClient(model_name, **settings)
+        return client
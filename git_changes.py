@@ -0,0 +1,55 @@
+import os
+import subprocess
+
+
+def run_git(repo_path: str, *args) -> str:
+    """
+    Runs a git command against the local repository and returns its stdout.
+
+    Raises:
+        RuntimeError: If git is missing or the command fails.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_path, *args],
+            capture_output=True, text=True, check=True,
+        )
+    except FileNotFoundError as e:
+        raise RuntimeError("git executable not found") from e
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"git {' '.join(args)} failed: {e.stderr.strip()}") from e
+    return result.stdout
+
+
+def last_commit_touching(repo_path: str, path: str):
+    """
+    Returns the hash of the newest commit that modified ``path``, or None if
+    the path has no history (or the history is a shallow clone without it).
+    """
+    commit = run_git(repo_path, "log", "-1", "--format=%H", "--", path).strip()
+    return commit or None
+
+
+def changed_files_since(repo_path: str, commit: str) -> set:
+    """
+    Lists files changed between ``commit`` and the working tree, including
+    uncommitted edits and untracked (non-ignored) files. When ``repo_path``
+    is a subdirectory of the work tree, only files below it are listed.
+
+    Returns:
+        set: Paths relative to ``repo_path`` using the platform's path separator.
+    """
+    changed = run_git(repo_path, "diff", "--relative", "--name-only", "-z", commit).split("\0")
+    untracked = run_git(repo_path, "ls-files", "--others", "--exclude-standard", "-z").split("\0")
+    return {os.path.normpath(path) for path in changed + untracked if path}
+
+
+def module_names(relative_path: str) -> set:
+    """
+    Returns the import names a Python file can be reached by, e.g.
+    ``pkg/sub/mod.py`` -> ``{"pkg.sub.mod", "sub.mod", "mod"}``.
+    """
+    parts = os.path.splitext(relative_path.replace(os.sep, "/"))[0].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return {".".join(parts[i:]) for i in range(len(parts)) if parts[i:]}
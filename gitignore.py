@@ -0,0 +1,179 @@
+import os
+import re
+
+
+def translate(pattern: str) -> str:
+    """
+    Translates a gitignore glob (without its leading ``!``, leading or
+    trailing slash) into a regular expression for paths relative to the
+    directory of the ``.gitignore``.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/") and (i + 2 == n or pattern[i + 2] == "/"):
+                if i + 2 == n:
+                    out.append(".*")  # "dir/**": everything inside
+                else:
+                    out.append("(?:.*/)?")  # "**/" or "/**/": any number of directories
+                    i += 1
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            j = i + 1
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                elif body.startswith("^"):
+                    body = "\\" + body
+                out.append(f"(?!/)[{body}]")
+                i = j
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+
+def parse_line(line: str):
+    """
+    Parses one gitignore line.
+
+    Returns:
+        tuple: ``(regex, negate, dir_only)``, or None for blank lines and
+        comments.
+    """
+    line = line.rstrip("\n").rstrip("\r")
+    if line.endswith(" ") and not line.endswith("\\ "):
+        line = line.rstrip(" ")
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash at the start or in the middle anchors the pattern to the .gitignore's directory.
+    anchored = "/" in line
+    line = line.lstrip("/")
+    regex = translate(line)
+    return (regex if anchored else "(?:.*/)?" + regex), negate, dir_only
+
+
+class IgnoreRules:
+    """
+    The compiled rules of one ``.gitignore`` file (or default pattern list),
+    relative to its directory.
+    """
+
+    def __init__(self, patterns):
+        rules = [rule for rule in map(parse_line, patterns) if rule is not None]
+        self.negated = {f"r{index}" for index, (_, negate, _) in enumerate(rules) if negate}
+        self.count = len(rules)
+        self._dirs = self._compile([(index, regex) for index, (regex, _, _) in enumerate(rules)])
+        self._files = self._compile([(index, regex) for index, (regex, _, dir_only) in enumerate(rules)
+                                     if not dir_only])
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return None
+        return re.compile("|".join(f"(?P<r{index}>{regex})" for index, regex in reversed(rules)), re.DOTALL)
+
+    @classmethod
+    def from_file(cls, path: str):
+        """
+        Reads a ``.gitignore`` file; returns None if it is missing or empty.
+        """
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                rules = cls(f.readlines())
+        except OSError:
+            return None
+        return rules if rules.count else None
+
+    def match(self, relative_path: str, is_dir: bool = False):
+        """
+        Returns True if the path is ignored, False if a negated pattern
+        re-includes it and None if no pattern matches.
+        """
+        regex = self._dirs if is_dir else self._files
+        match = regex.fullmatch(relative_path) if regex is not None else None
+        if match is None:
+            return None
+        return match.lastgroup not in self.negated
+
+
+class IgnoreMatcher:
+    """
+    Decides which paths of a repository are ignored, like git does, on top of a
+    list of default patterns.
+    """
+
+    def __init__(self, root: str, defaults=(), use_gitignore: bool = True):
+        self.root = os.path.abspath(root)
+        self.use_gitignore = use_gitignore
+        self.defaults = IgnoreRules(list(defaults) + [".git/"])
+        self._rules = {}
+        if use_gitignore:
+            # Later entries take precedence: .gitignore over .git/info/exclude.
+            self._rules[""] = [rules for rules in (IgnoreRules.from_file(os.path.join(self.root, ".git", "info", "exclude")),
+                                                   IgnoreRules.from_file(os.path.join(self.root, ".gitignore")))
+                               if rules is not None]
+
+    def _rules_for(self, directory: str) -> list:
+        rules = self._rules.get(directory)
+        if rules is None:
+            found = IgnoreRules.from_file(os.path.join(self.root, directory, ".gitignore")) if self.use_gitignore else None
+            rules = self._rules[directory] = [found] if found is not None else []
+        return rules
+
+    def ignored(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Tells whether a path (relative to the root, ``/``-separated) is
+        ignored. Its parent directories are not checked; ``walk`` does not
+        descend into ignored directories.
+        """
+        relative_path = relative_path.replace(os.sep, "/").strip("/")
+        parts = relative_path.split("/")
+        for depth in range(len(parts) - 1, -1, -1):
+            directory = "/".join(parts[:depth])
+            rest = "/".join(parts[depth:])
+            for rules in reversed(self._rules_for(directory)):
+                decision = rules.match(rest, is_dir)
+                if decision is not None:
+                    return decision
+        return bool(self.defaults.match(relative_path, is_dir))
+
+    def walk(self):
+        """
+        Yields the absolute paths of all files below the root that are not
+        ignored, pruning ignored directories.
+        """
+        for current, dirs, files in os.walk(self.root):
+            prefix = os.path.relpath(current, self.root).replace(os.sep, "/")
+            prefix = "" if prefix == "." else prefix + "/"
+            dirs[:] = [d for d in dirs if not self.ignored(prefix + d, is_dir=True)]
+            for file in files:
+                if not self.ignored(prefix + file):
+                    yield os.path.join(current, file)
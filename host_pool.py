@@ -0,0 +1,236 @@
+import os
+import time
+import threading
+
+from agent_log import get_logger
+
+# Comma-separated Ollama hosts, each optionally followed by "=<max concurrent requests>".
+HOSTS_VAR = "SUPERGIT_OLLAMA_HOSTS"
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SUPERGIT_HOST_CONCURRENCY", "4"))
+# Seconds between health checks (/api/tags and /api/ps) of every host.
+DEFAULT_HEALTH_INTERVAL = float(os.getenv("SUPERGIT_HEALTH_INTERVAL", "15"))
+# Consecutive failures that open a host's circuit, and how long it stays open.
+DEFAULT_FAILURE_THRESHOLD = int(os.getenv("SUPERGIT_HOST_FAILURES", "3"))
+DEFAULT_OPEN_SECONDS = float(os.getenv("SUPERGIT_HOST_COOLDOWN", "30"))
+
+LOG = get_logger("host_pool", "llm_backend.jsonl")
+
+
+class NoHostAvailable(ConnectionError):
+    """
+    Raised when every host of the pool has an open circuit.
+    """
+
+
+def parse_hosts(spec: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> list:
+    """
+    Parses a host list such as ``"http://gpu1:11434=2,http://gpu2:11434"``.
+
+    Returns:
+        list: ``(url, max_concurrency)`` tuples, without duplicates.
+    """
+    hosts = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, cap = entry.rpartition("=")
+        if url and cap.isdigit():
+            hosts[url.strip()] = max(1, int(cap))
+        else:
+            hosts[entry] = max_concurrency
+    return list(hosts.items())
+
+
+def model_name(model: str) -> str:
+    """
+    Returns a model name with its tag, as Ollama lists it (``:latest`` when
+    none is given).
+    """
+    return model if ":" in model.rsplit("/", 1)[-1] else model + ":latest"
+
+
+class Host:
+    """
+    One Ollama server of a pool: its concurrency cap, the requests in
+    flight, its circuit breaker and the models it has and has loaded.
+    """
+
+    def __init__(self, url: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.failures = 0
+        # Monotonic time until which the circuit is open; once it has passed the
+        # circuit is half-open and a single trial request is let through.
+        self.open_until = 0.0
+        self.probing = False
+        self.unreachable = False  # the circuit was opened by a failed health check
+        self.available = None  # models from /api/tags; None until the first health check
+        self.loaded = set()  # models from /api/ps
+        self.last_used = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def state(self, now: float = None) -> str:
+        now = time.monotonic() if now is None else now
+        if not self.open_until:
+            return "closed"
+        return "open" if now < self.open_until else "half-open"
+
+    def usable(self, now: float) -> bool:
+        state = self.state(now)
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    def has(self, model: str) -> bool:
+        return self.available is None or model_name(model) in self.available
+
+
+class HostPool:
+    """
+    Spreads model requests over several Ollama hosts, with a concurrency cap per
+    host and a circuit breaker for failing hosts.
+    """
+
+    def __init__(self, hosts, probe=None, health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, open_seconds: float = DEFAULT_OPEN_SECONDS):
+        self.hosts = [Host(url, cap) for url, cap in hosts]
+        if not self.hosts:
+            raise ValueError("a host pool needs at least one host")
+        self.probe = probe
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.condition = threading.Condition()
+        self._stop = threading.Event()
+        self._checker = None
+
+    def start(self) -> None:
+        """
+        Starts the background health checks (if the pool has a probe).
+        """
+        if self.probe is None or self._checker is not None:
+            return
+        self._checker = threading.Thread(target=self._check_loop, name="host-health", daemon=True)
+        self._checker.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _pick(self, model: str, avoid, now: float):
+        usable = [host for host in self.hosts if host.usable(now)]
+        if model:
+            # Hosts known to lack the model are used only if no usable host has it.
+            usable = [host for host in usable if host.has(model)] or usable
+        free = [host for host in usable if host.outstanding < host.max_concurrency]
+        if avoid is not None and len(free) > 1:
+            free = [host for host in free if host is not avoid]
+        if not free:
+            return usable, None
+        loaded = model_name(model) if model else None
+        return usable, min(free, key=lambda host: (host.outstanding, loaded not in host.loaded, host.last_used))
+
+    def acquire(self, model: str = None, avoid: Host = None, timeout: float = None) -> Host:
+        """
+        Reserves a request slot on the best host for ``model``, waiting while
+        every usable host is at its cap.
+
+        Parameters:
+            model (str): Model the request is for.
+            avoid (Host): Host to skip if another one is free, e.g. the one
+                a retried request just failed on.
+            timeout (float): Seconds to wait for a free slot; None waits as
+                long as it takes.
+
+        Returns:
+            Host: The reserved host; hand it back with ``release``.
+
+        Raises:
+            NoHostAvailable: Every circuit is open, or no slot was freed in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                usable, host = self._pick(model, avoid, now)
+                if host is not None:
+                    host.outstanding += 1
+                    host.last_used = now
+                    if host.state(now) == "half-open":
+                        host.probing = True
+                    return host
+                if not usable:
+                    retry_at = min(host.open_until for host in self.hosts) - now
+                    raise NoHostAvailable(f"all {len(self.hosts)} Ollama hosts are failing; "
+                                          f"next trial in {max(retry_at, 0):.0f}s")
+                wait = None if deadline is None else deadline - now
+                if wait is not None and wait <= 0:
+                    raise NoHostAvailable(f"no free Ollama host within {timeout:.0f}s")
+                # Wake up now and then: a circuit may turn half-open while nobody releases a slot.
+                self.condition.wait(1.0 if wait is None else min(wait, 1.0))
+
+    def release(self, host: Host, failed: bool = False) -> None:
+        """
+        Frees a slot reserved by ``acquire``. ``failed`` tells whether the
+        request failed because of the host (connection error, 5xx).
+        """
+        with self.condition:
+            host.outstanding -= 1
+            host.requests += 1
+            if failed:
+                host.errors += 1
+                host.failures += 1
+                if host.probing or host.failures >= self.failure_threshold:
+                    self._open(host, f"{host.failures} failed requests in a row")
+            else:
+                host.failures = 0
+                if host.open_until:
+                    LOG.info(f"Ollama host {host.url} is back in rotation")
+                host.open_until = 0.0
+                host.unreachable = False
+            host.probing = False
+            self.condition.notify_all()
+
+    def _open(self, host: Host, reason: str) -> None:
+        if host.state() != "open":
+            LOG.warning(f"Taking Ollama host {host.url} out of rotation for {self.open_seconds:.0f}s: {reason}")
+        host.open_until = time.monotonic() + self.open_seconds
+
+    def check(self, host: Host) -> bool:
+        """
+        Runs one health check of a host with the pool's probe, which returns
+        the models the host has and the models it has loaded.
+        """
+        try:
+            available, loaded = self.probe(host.url)
+        except Exception as e:
+            with self.condition:
+                host.loaded = set()
+                host.unreachable = True
+                self._open(host, f"health check failed ({e})")
+            return False
+        with self.condition:
+            host.available = set(map(model_name, available))
+            host.loaded = set(map(model_name, loaded))
+            if host.unreachable and not host.probing:
+                # A host that answers again may take a trial request right away.
+                host.unreachable = False
+                host.open_until = min(host.open_until, time.monotonic())
+            self.condition.notify_all()
+        return True
+
+    def _check_loop(self) -> None:
+        while not self._stop.is_set():
+            for host in self.hosts:
+                self.check(host)
+            self._stop.wait(self.health_interval)
+
+    def stats(self) -> list:
+        """
+        Returns one dict per host with its state and counters.
+        """
+        now = time.monotonic()
+        with self.condition:
+            return [{"host": host.url, "state": host.state(now), "outstanding": host.outstanding,
+                     "max_concurrency": host.max_concurrency, "requests": host.requests, "errors": host.errors,
+                     "loaded": sorted(host.loaded)} for host in self.hosts]
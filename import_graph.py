@@ -0,0 +1,295 @@
+import os
+import ast
+import json
+import hashlib
+
+from git_changes import run_git, module_names
+
+# Bump when the cached entries change shape or meaning.
+GRAPH_VERSION = 1
+GRAPH_FILE = "import_graph.json"
+
+
+def blob_id(data: bytes) -> str:
+    """
+    Returns git's object id for a file with this content, so stamps taken
+    from file contents agree with the ones ``git ls-files -s`` reports.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def git_stamps(repo_path: str) -> dict:
+    """
+    Returns the blob ids of the files in the git index, by relative path,
+    or an empty dict if the repository has no usable git.
+    """
+    try:
+        output = run_git(repo_path, "ls-files", "-s", "-z")
+    except RuntimeError:
+        return {}
+    stamps = {}
+    for entry in output.split("\0"):
+        meta, _, path = entry.partition("\t")
+        if path:
+            stamps[os.path.normpath(path)] = meta.split()[1]
+    return stamps
+
+
+def parse_module(source: str, relative_path: str):
+    """
+    Reads the imports and the top-level symbols of a Python module.
+
+    Returns:
+        tuple: ``(imports, symbols, api)``: sorted imported module names,
+        the names defined at the top level and a hash of the public
+        signatures, which changes only when the module's interface does.
+
+    Raises:
+        SyntaxError: If the source does not parse.
+    """
+    tree = ast.parse(source)
+    package = os.path.dirname(relative_path.replace(os.sep, "/")).split("/") if os.path.dirname(relative_path) else []
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - (node.level - 1)] if node.level - 1 <= len(package) else []
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module
+            if module:
+                imports.add(module)
+            imports.update(f"{module}.{alias.name}" if module else alias.name
+                           for alias in node.names if alias.name != "*")
+
+    symbols = []
+    interface = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(node.name)
+            returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+            interface.append(f"def {node.name}({ast.unparse(node.args)}){returns}")
+        elif isinstance(node, ast.ClassDef):
+            symbols.append(node.name)
+            methods = [f"{item.name}({ast.unparse(item.args)})" for item in node.body
+                       if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            bases = ", ".join(ast.unparse(base) for base in node.bases)
+            interface.append(f"class {node.name}({bases}): {', '.join(methods)}")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [target.id for target in targets if isinstance(target, ast.Name)]
+            symbols.extend(names)
+            interface.extend(names)
+    interface = [item for item in interface if not item.split(" ")[-1].startswith("_")]
+    api = hashlib.sha1("\n".join(interface).encode("utf-8")).hexdigest()
+    return sorted(imports), symbols, api
+
+
+class ImportGraph:
+    """
+    Import and symbol graph of a repository's Python files, cached as JSON and
+    updated per changed file.
+    """
+
+    def __init__(self, repo_path: str, cache_file: str = None):
+        self.repo_path = repo_path
+        self.cache_file = cache_file
+        self.modules = {}
+        self.edges = {}
+        self.importers = {}
+        self._load()
+        self._resolve()
+
+    def _load(self) -> None:
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == GRAPH_VERSION:
+            self.modules = data.get("modules", {})
+
+    def save(self) -> None:
+        """
+        Writes the graph to its cache file (if it has one) atomically.
+        """
+        if not self.cache_file:
+            return
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": GRAPH_VERSION, "modules": self.modules}, f)
+        os.replace(temp_file, self.cache_file)
+
+    def update(self, paths, read_file, stamps: dict = None, force=()) -> dict:
+        """
+        Brings the graph up to date with the repository's Python files.
+
+        Parameters:
+            paths (iterable): Relative paths of the repository's files; only
+                ``.py`` files are kept, modules not listed are dropped.
+            read_file (callable): Returns a file's text (or None) given its
+                relative path.
+            stamps (dict): Known stamps (git blob ids) by relative path. A
+                file whose stamp matches its cached entry is not read; files
+                without a stamp are read and stamped by their content.
+            force (iterable): Paths to read and parse again regardless, e.g.
+                files with uncommitted changes.
+
+        Returns:
+            dict: ``parsed`` (number of files parsed), ``new`` (paths that
+            had no entry), ``api_changed`` (paths whose public interface
+            changed, or that were removed).
+        """
+        paths = {path for path in paths if path.endswith(".py")}
+        stamps = stamps or {}
+        force = set(force)
+        new, api_changed = set(), set()
+        for path in set(self.modules) - paths:
+            del self.modules[path]
+            api_changed.add(path)
+
+        parsed = 0
+        for path in sorted(paths):
+            entry = self.modules.get(path)
+            stamp = stamps.get(path)
+            if entry is not None and path not in force and stamp is not None and entry["stamp"] == stamp:
+                continue
+            source = read_file(path)
+            if source is None:
+                if self.modules.pop(path, None) is not None:
+                    api_changed.add(path)
+                continue
+            if stamp is None or path in force:
+                stamp = blob_id(source.encode("utf-8", errors="surrogatepass"))
+                if entry is not None and entry["stamp"] == stamp:
+                    continue
+            try:
+                imports, symbols, api = parse_module(source, path)
+            except (SyntaxError, ValueError):
+                imports, symbols, api = [], [], None
+            parsed += 1
+            if entry is None:
+                new.add(path)
+            elif entry["api"] != api:
+                api_changed.add(path)
+            self.modules[path] = {"stamp": stamp, "size": len(source), "imports": imports, "symbols": symbols,
+                                  "api": api}
+        self._resolve()
+        return {"parsed": parsed, "new": new, "api_changed": api_changed}
+
+    def _resolve(self) -> None:
+        index = {}
+        for path in self.modules:
+            for name in module_names(path):
+                index.setdefault(name, []).append(path)
+        self.edges = {path: set() for path in self.modules}
+        self.importers = {path: set() for path in self.modules}
+        for path, entry in self.modules.items():
+            folder = os.path.dirname(path)
+            for name in entry["imports"]:
+                candidates = index.get(name)
+                if not candidates:
+                    continue
+                # Several files answer to a short name: prefer the one closest to the importer.
+                target = max(candidates, key=lambda candidate: (
+                    candidate != path, len(os.path.commonpath([folder, os.path.dirname(candidate)]))))
+                if target != path:
+                    self.edges[path].add(target)
+                    self.importers[target].add(path)
+
+    def importers_of(self, paths) -> set:
+        """
+        Returns the modules that import any of ``paths`` directly, without
+        ``paths`` themselves.
+        """
+        paths = set(paths)
+        return {importer for path in paths for importer in self.importers.get(path, ())} - paths
+
+    def components(self) -> list:
+        """
+        Groups the modules into strongly connected components (modules that
+        import each other, directly or through a cycle) with Tarjan's
+        algorithm.
+
+        Returns:
+            list: Sorted lists of paths, every component after the
+            components it imports.
+        """
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        for root in sorted(self.modules):
+            if root in index:
+                continue
+            # Iterative depth-first search; each frame is (node, iterator over its neighbours).
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            frames = [(root, iter(sorted(self.edges[root])))]
+            while frames:
+                node, neighbours = frames[-1]
+                for neighbour in neighbours:
+                    if neighbour not in index:
+                        index[neighbour] = low[neighbour] = counter
+                        counter += 1
+                        stack.append(neighbour)
+                        on_stack.add(neighbour)
+                        frames.append((neighbour, iter(sorted(self.edges[neighbour]))))
+                        break
+                    if neighbour in on_stack:
+                        low[node] = min(low[node], index[neighbour])
+                else:
+                    frames.pop()
+                    if frames:
+                        parent = frames[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(sorted(component))
+        return components
+
+    def order(self) -> list:
+        """
+        Returns every module in dependency order, modules of a cycle together.
+        """
+        return [path for component in self.components() for path in component]
+
+    def batches(self, max_chars: int) -> list:
+        """
+        Packs the modules into batches of related modules of at most
+        ``max_chars`` characters, in dependency order.
+
+        Returns:
+            list: Lists of relative paths.
+        """
+        batches = []
+        current, size = [], 0
+        for component in self.components():
+            component_size = sum(self.modules[path]["size"] for path in component)
+            related = any(self.edges[path] & set(current) or self.importers[path] & set(current) for path in component)
+            if current and (not related or size + component_size > max_chars):
+                batches.append(current)
+                current, size = [], 0
+            if component_size > max_chars:
+                batches.extend([path] for path in component)
+                continue
+            current.extend(component)
+            size += component_size
+        if current:
+            batches.append(current)
+        return batches
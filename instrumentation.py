@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the span duration histogram buckets.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Spans kept for the JSON trace; older ones are dropped, the histograms keep counting.
+MAX_SPANS = int(os.getenv("SUPERGIT_TRACE_MAX_SPANS", "50000"))
+DEFAULT_METRICS_DIR = os.getenv("SUPERGIT_METRICS_DIR", "")
+# Ollama response fields recorded per request: token counts and durations in nanoseconds.
+MODEL_FIELDS = ("prompt_eval_count", "eval_count", "load_duration", "prompt_eval_duration", "eval_duration",
+                "total_duration")
+
+
+class Recorder:
+    """
+    Collects finished spans and model metrics in memory.
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.lock = threading.Lock()
+        self.spans = deque(maxlen=max_spans)
+        self.histograms = {}  # span name -> [bucket counts..., +Inf count, sum]
+        self.models = {}  # (agent, model) -> totals
+        self.started = time.perf_counter()
+        self.started_wall = time.time()
+
+    def add_span(self, name: str, start: float, duration: float, attrs: dict) -> None:
+        thread = threading.current_thread()
+        with self.lock:
+            self.spans.append((name, start, duration, thread.ident, thread.name, attrs))
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [0] * (len(BUCKETS) + 2)
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += duration
+
+    def add_model_request(self, agent: str, model: str, metrics: dict, wall: float, cached: bool) -> None:
+        with self.lock:
+            totals = self.models.get((agent, model))
+            if totals is None:
+                totals = self.models[(agent, model)] = dict.fromkeys(
+                    ("requests", "cached", "wall_seconds", "queue_seconds") + MODEL_FIELDS, 0)
+            totals["requests"] += 1
+            totals["wall_seconds"] += wall
+            if cached:
+                totals["cached"] += 1
+                return
+            for field in MODEL_FIELDS:
+                totals[field] += metrics.get(field) or 0
+            if metrics.get("total_duration"):
+                # Whatever the server did not account for was spent queueing or on the network.
+                totals["queue_seconds"] += max(0.0, wall - metrics["total_duration"] / 1e9)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.spans.clear()
+            self.histograms.clear()
+            self.models.clear()
+            self.started = time.perf_counter()
+            self.started_wall = time.time()
+
+
+RECORDER = Recorder()
+_local = threading.local()
+_settings = {"dir": None, "name": None, "profiler": None}
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the enclosed block as a span called ``name`` and yields its attribute
+    dict.
+    """
+    stack = _stack()
+    stack.append(attrs)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        RECORDER.add_span(name, start, time.perf_counter() - start, attrs)
+
+
+def timed(name: str):
+    """
+    Decorator that records every call of the function as a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, start: float, end: float, **attrs) -> None:
+    """
+    Records a span whose start and end (``time.perf_counter()`` values) were
+    measured elsewhere, e.g. a stream consumed after the request returned.
+    """
+    RECORDER.add_span(name, start, end - start, attrs)
+
+
+def record_model_metrics(response, agent: str = "", model: str = "", wall: float = 0.0,
+                         cached: bool = False) -> dict:
+    """
+    Records the token counts and durations of a model response (or final stream
+    chunk) and attaches them to the innermost open span.
+
+    Returns:
+        dict: The metrics that were found.
+    """
+    read = response.get if isinstance(response, dict) else lambda field: getattr(response, field, None)
+    metrics = {field: read(field) for field in MODEL_FIELDS if read(field) is not None}
+    RECORDER.add_model_request(agent or "unknown", model or "unknown", metrics, wall, cached)
+    stack = _stack()
+    if stack:
+        stack[-1].update(metrics, cached=cached)
+    return metrics
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(recorder: Recorder = RECORDER) -> str:
+    """
+    Renders the histograms and model totals in the Prometheus text format.
+    """
+    with recorder.lock:
+        histograms = {name: list(values) for name, values in recorder.histograms.items()}
+        models = {key: dict(totals) for key, totals in recorder.models.items()}
+
+    lines = [
+        "# HELP supergit_span_duration_seconds Time spent in each instrumented stage.",
+        "# TYPE supergit_span_duration_seconds histogram",
+    ]
+    for name, values in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, values):
+            lines.append(f'supergit_span_duration_seconds_bucket{{span="{_label(name)}",le="{bound}"}} {count}')
+        lines.append(f'supergit_span_duration_seconds_bucket{{span="{_label(name)}",le="+Inf"}} {values[-2]}')
+        lines.append(f'supergit_span_duration_seconds_sum{{span="{_label(name)}"}} {values[-1]:.6f}')
+        lines.append(f'supergit_span_duration_seconds_count{{span="{_label(name)}"}} {values[-2]}')
+
+    lines += [
+        "# HELP supergit_model_requests_total Model requests by agent and model.",
+        "# TYPE supergit_model_requests_total counter",
+    ]
+    for (agent, model), totals in sorted(models.items()):
+        labels = f'agent="{_label(agent)}",model="{_label(model)}"'
+        lines.append(f'supergit_model_requests_total{{{labels},source="model"}} {totals["requests"] - totals["cached"]}')
+        lines.append(f'supergit_model_requests_total{{{labels},source="cache"}} {totals["cached"]}')
+    lines += [
+        "# HELP supergit_model_tokens_total Prompt tokens evaluated and tokens generated.",
+        "# TYPE supergit_model_tokens_total counter",
+    ]
+    for (agent, model), totals in sorted(models.items()):
+        labels = f'agent="{_label(agent)}",model="{_label(model)}"'
+        lines.append(f'supergit_model_tokens_total{{{labels},kind="prompt"}} {totals["prompt_eval_count"]}')
+        lines.append(f'supergit_model_tokens_total{{{labels},kind="generated"}} {totals["eval_count"]}')
+    lines += [
+        "# HELP supergit_model_seconds_total Model time by phase: load, prompt evaluation, generation, queueing.",
+        "# TYPE supergit_model_seconds_total counter",
+    ]
+    for (agent, model), totals in sorted(models.items()):
+        labels = f'agent="{_label(agent)}",model="{_label(model)}"'
+        for phase, field in (("load", "load_duration"), ("prompt_eval", "prompt_eval_duration"),
+                             ("eval", "eval_duration")):
+            lines.append(f'supergit_model_seconds_total{{{labels},phase="{phase}"}} {totals[field] / 1e9:.6f}')
+        lines.append(f'supergit_model_seconds_total{{{labels},phase="queue"}} {totals["queue_seconds"]:.6f}')
+        lines.append(f'supergit_model_seconds_total{{{labels},phase="wall"}} {totals["wall_seconds"]:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def trace_events(recorder: Recorder = RECORDER) -> dict:
+    """
+    Returns the recorded spans in the Chrome trace event format, which
+    chrome://tracing and https://ui.perfetto.dev can display.
+    """
+    pid = os.getpid()
+    events = []
+    threads = {}
+    with recorder.lock:
+        spans = list(recorder.spans)
+    for name, start, duration, tid, thread_name, attrs in spans:
+        threads[tid] = thread_name
+        events.append({
+            "name": name, "cat": "supergit", "ph": "X", "pid": pid, "tid": tid,
+            "ts": round((recorder.started_wall + start - recorder.started) * 1e6),
+            "dur": round(duration * 1e6), "args": attrs,
+        })
+    for tid, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _write_atomic(path: str, text: str) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def export(metrics_dir: str, name: str) -> list:
+    """
+    Writes ``<name>.prom`` and ``<name>.trace.json`` to ``metrics_dir``.
+
+    Returns:
+        list: The paths written.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    prom_path = os.path.join(metrics_dir, f"{name}.prom")
+    trace_path = os.path.join(metrics_dir, f"{name}.trace.json")
+    _write_atomic(prom_path, prometheus_text())
+    _write_atomic(trace_path, json.dumps(trace_events(), default=str))
+    return [prom_path, trace_path]
+
+
+def enable(metrics_dir: str, name: str, profile: bool = False) -> None:
+    """
+    Exports metrics and the trace to ``metrics_dir`` when the process exits,
+    optionally profiling the main thread with cProfile into ``<name>.prof``
+    (open it with ``python -m pstats`` or snakeviz).
+    """
+    _settings["dir"], _settings["name"] = metrics_dir, name
+    if profile and _settings["profiler"] is None:
+        import cProfile
+
+        _settings["profiler"] = cProfile.Profile()
+        _settings["profiler"].enable()
+
+
+def add_arguments(parser) -> None:
+    """
+    Adds the ``--metrics-dir`` and ``--profile`` options to a script's parser.
+    """
+    parser.add_argument('--metrics-dir', type=str, default=DEFAULT_METRICS_DIR,
+                        help='Write timing spans and model metrics (Prometheus text and JSON trace) to this '
+                             'directory (default: SUPERGIT_METRICS_DIR)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Also profile the run with cProfile (written next to the metrics)')
+
+
+def configure(args, name: str) -> None:
+    """
+    Enables export for a script from its parsed ``add_arguments`` options.
+    """
+    if args.metrics_dir or args.profile:
+        enable(args.metrics_dir or "metrics", name, args.profile)
+
+
+@atexit.register
+def shutdown() -> None:
+    """
+    Stops the profiler and writes the enabled exports; runs at interpreter exit.
+    """
+    metrics_dir, name, profiler = _settings["dir"], _settings["name"], _settings["profiler"]
+    if metrics_dir is None:
+        return
+    paths = export(metrics_dir, name)
+    if profiler is not None:
+        profiler.disable()
+        paths.append(os.path.join(metrics_dir, f"{name}.prof"))
+        profiler.dump_stats(paths[-1])
+    print(f"Metrics written to {', '.join(paths)}")
+
+
+def reset() -> None:
+    """
+    Clears everything recorded and disables export, so the next run in the
+    same process (e.g. a ``supergitd`` request) starts from scratch.
+    """
+    RECORDER.reset()
+    _settings.update(dir=None, name=None, profiler=None)
@@ -0,0 +1,561 @@
+import os
+import time
+import random
+import socket
+import threading
+
+from host_pool import HOSTS_VAR, HostPool, parse_hosts
+from instrumentation import span, record_model_metrics, record_span
+from request_scheduler import SLOTS_VAR, RequestScheduler
+
+# Models and hosts can be overridden per environment; agent-specific variables win over the global ones.
+DEFAULT_MODEL = os.getenv("SUPERGIT_MODEL", "qwen2.5-coder:0.5b")
+AGENT_MODEL_VARS = {
+    "coder": "SUPERGIT_CODER_MODEL",
+    "reviewer": "SUPERGIT_REVIEWER_MODEL",
+    "optimizer": "SUPERGIT_OPTIMIZER_MODEL",
+}
+DEFAULT_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+# Several hosts to spread requests over (see host_pool.py); when set, requests without an explicit host use them.
+DEFAULT_HOSTS = os.getenv(HOSTS_VAR, "")
+HEALTH_TIMEOUT = 2.0
+DEFAULT_TIMEOUT = float(os.getenv("SUPERGIT_TIMEOUT", "300"))
+DEFAULT_RETRIES = int(os.getenv("SUPERGIT_RETRIES", "3"))
+DEFAULT_BACKOFF = float(os.getenv("SUPERGIT_BACKOFF", "0.5"))
+# How long Ollama keeps the model loaded after a request (Ollama duration string or seconds).
+DEFAULT_KEEP_ALIVE = os.getenv("SUPERGIT_KEEP_ALIVE", "30m")
+# Non-streaming responses are served from the shared response cache unless disabled.
+CACHE_ENABLED = os.getenv("SUPERGIT_NO_CACHE", "") in ("", "0")
+# Requests sent at once (see request_scheduler.py); unset means one per slot of the host pool, or no
+# limit for a single host, so the agents' --workers settings are not capped.
+SCHEDULER_SLOTS = os.getenv(SLOTS_VAR, "")
+
+_clients = {}
+_clients_lock = threading.Lock()
+_pools = {}
+_schedulers = {}
+
+
+def model_for(agent: str = "") -> str:
+    """
+    Returns the model configured for an agent ("coder", "reviewer", "optimizer").
+    """
+    variable = AGENT_MODEL_VARS.get(agent)
+    return os.getenv(variable, DEFAULT_MODEL) if variable else DEFAULT_MODEL
+
+
+def get_client(host: str = None, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Returns the shared Ollama client for a host, creating it on first use.
+    """
+    host = host or DEFAULT_HOST
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            import httpx
+            import ollama
+
+            client = ollama.Client(
+                host=host,
+                timeout=httpx.Timeout(timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=120.0),
+            )
+            _clients[host] = client
+        return client
+
+
+def close_clients() -> None:
+    """
+    Closes all pooled clients and their connections.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client._client.close()
+        _clients.clear()
+
+
+def probe_host(host: str):
+    """
+    Health check for the host pool: lists the models a host has
+    (``/api/tags``) and the ones it has loaded (``/api/ps``).
+    """
+    http = get_client(host)._client
+    models = []
+    for path in ("/api/tags", "/api/ps"):
+        response = http.get(path, timeout=HEALTH_TIMEOUT)
+        response.raise_for_status()
+        models.append([model["name"] for model in response.json().get("models") or []])
+    return models
+
+
+def get_pool():
+    """
+    Returns the shared host pool for ``SUPERGIT_OLLAMA_HOSTS``, creating it
+    and starting its health checks on first use, or None if no pool is
+    configured.
+    """
+    if not DEFAULT_HOSTS:
+        return None
+    with _clients_lock:
+        pool = _pools.get(DEFAULT_HOSTS)
+        if pool is None:
+            pool = _pools[DEFAULT_HOSTS] = HostPool(parse_hosts(DEFAULT_HOSTS), probe=probe_host)
+            pool.start()
+        return pool
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Returns the process-wide request scheduler, creating it on first use.
+    """
+    pool = get_pool()
+    with _clients_lock:
+        key = (SCHEDULER_SLOTS, DEFAULT_HOSTS)
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            if SCHEDULER_SLOTS:
+                slots = int(SCHEDULER_SLOTS)
+            elif pool is not None:
+                slots = sum(host.max_concurrency for host in pool.hosts)
+            else:
+                slots = 0
+            scheduler = _schedulers[key] = RequestScheduler(slots, preload=lambda model: preload(model=model))
+        return scheduler
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Tells whether a failed request is worth retrying: connection problems,
+    timeouts, overload (429) and server errors.
+    """
+    import httpx
+    import ollama
+
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+def is_host_failure(error: Exception) -> bool:
+    """
+    Tells whether a failed request counts against its host's circuit
+    breaker: transient errors other than overload (429), which a healthy
+    host also answers with.
+    """
+    import ollama
+
+    if isinstance(error, ollama.ResponseError) and error.status_code == 429:
+        return False
+    return is_transient(error)
+
+
+class CachedResponse:
+    """
+    A response served from the response cache; mirrors the fields the agents
+    read from an Ollama response.
+    """
+
+    cached = True
+    done = True
+
+    def __init__(self, model: str, response: str):
+        self.model = model
+        self.response = response
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF, cap: float = 30.0) -> float:
+    """
+    Exponential backoff with full jitter for the given 0-based retry attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def generate(prompt: str, system: str = "", agent: str = "", model: str = None, host: str = None,
+             options: dict = None, stream: bool = False, keep_alive=None, retries: int = None,
+             cache: bool = None, abort=None, **kwargs):
+    """
+    Sends a generate request through the shared client, retrying transient
+    failures with exponential backoff.
+
+    Parameters:
+        prompt (str): The user prompt.
+        system (str): The system prompt.
+        agent (str): Agent name used to pick the configured model.
+        model (str): Explicit model name, overriding the agent's model.
+        host (str): Ollama host, defaulting to the ``SUPERGIT_OLLAMA_HOSTS``
+            pool if configured, else ``OLLAMA_HOST``.
+        options (dict): Ollama generation options (temperature, seed, num_ctx, ...).
+        stream (bool): Return an iterator of partial responses instead of one response.
+        keep_alive: How long the model stays loaded after the request.
+        retries (int): Number of retries for transient errors.
+        cache (bool): Use the response cache; defaults to ``CACHE_ENABLED``.
+        abort (StreamAbort): Lets another thread cut a stream off; ignored
+            without ``stream``.
+
+    Returns:
+        The Ollama response, or an iterator of response chunks when streaming.
+        With streaming, only establishing the stream is retried.
+    """
+    retries = DEFAULT_RETRIES if retries is None else retries
+    model = model or model_for(agent)
+    with span("model.generate", agent=agent, model=model, stream=stream):
+        return _generate(prompt, system, agent, model, host, options, stream, keep_alive, retries, cache,
+                         abort if stream else None, kwargs)
+
+
+def _generate(prompt, system, agent, model, host, options, stream, keep_alive, retries, cache, abort, kwargs):
+    use_cache = (CACHE_ENABLED if cache is None else cache) and not stream and not kwargs
+    if use_cache:
+        from response_cache import get_cache, request_key
+
+        key = request_key(model, system, prompt, options)
+        started = time.perf_counter()
+        cached = get_cache().get(key)
+        if cached is not None:
+            record_model_metrics({}, agent, model, time.perf_counter() - started, cached=True)
+            return CachedResponse(model, cached)
+
+    pool = get_pool() if host is None else None
+    request = dict(
+        model=model,
+        prompt=prompt,
+        system=system,
+        options=options,
+        stream=stream,
+        keep_alive=DEFAULT_KEEP_ALIVE if keep_alive is None else keep_alive,
+        **kwargs,
+    )
+
+    ticket = get_scheduler().acquire(model)
+    try:
+        if abort is not None and abort.aborted:
+            raise ConnectionAbortedError("stream closed before it was sent")
+        response, target, started = _send(request, pool, host, model, retries, abort)
+    except BaseException:
+        ticket.release()
+        if abort is not None:
+            abort.close()
+        raise
+    if stream:
+        return PooledStream(response, pool, target, ticket, abort)
+    if target is not None:
+        pool.release(target)
+    ticket.release(response)
+    record_model_metrics(response, agent, model, time.perf_counter() - started)
+    if use_cache:
+        get_cache().put(key, model, response.response)
+    return response
+
+
+def _send(request, pool, host, model, retries, abort=None):
+    """
+    Sends a request, retrying transient failures, on a pool host (when
+    ``pool`` is given) or on ``host``.
+
+    Returns:
+        tuple: ``(response, host from the pool or None, start time)``. The
+        pool host is still reserved; a stream's first chunk has been read.
+    """
+    stream = request["stream"]
+    attempt = 0
+    avoid = None
+    while True:
+        target = None
+        try:
+            if pool is not None:
+                # A retry goes to another host if one is free.
+                target = pool.acquire(model, avoid)
+            started = time.perf_counter()
+            url = target.url if target is not None else host
+            response = (abort.client(url) if abort is not None else get_client(url)).generate(**request)
+            if stream:
+                # Pull the first chunk now so connection errors surface inside the retry loop.
+                first = next(response, None)
+                response = _prepend(first, response)
+        except Exception as e:
+            aborted = abort is not None and abort.aborted
+            if target is not None:
+                pool.release(target, failed=is_host_failure(e) and not aborted)
+                avoid = target
+            if aborted or attempt >= retries or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"Model request failed ({e}); retry {attempt}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        return response, target, started
+
+
+def _prepend(first, rest):
+    if first is not None:
+        yield first
+    yield from rest
+
+
+class PooledStream:
+    """
+    The chunks of a streamed response, holding its scheduler and pool slots
+    until the stream ends.
+    """
+
+    def __init__(self, chunks, pool: HostPool, host, ticket=None, abort=None):
+        self._chunks = chunks
+        self._pool = pool
+        self._host = host
+        self._ticket = ticket
+        self._abort = abort
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        failed = False
+        last = None
+        try:
+            for chunk in self._chunks:
+                last = chunk
+                yield chunk
+        except Exception as e:
+            # An aborted stream fails on purpose; that says nothing about the host.
+            failed = is_host_failure(e) and not (self._abort is not None and self._abort.aborted)
+            raise
+        finally:
+            self._release(failed, last)
+
+    def close(self) -> None:
+        self._chunks.close()
+        self._release(False)
+
+    def _release(self, failed: bool, last=None) -> None:
+        with self._lock:
+            host, self._host = self._host, None
+            ticket, self._ticket = self._ticket, None
+            abort, self._abort = self._abort, None
+        if host is not None:
+            self._pool.release(host, failed)
+        if ticket is not None:
+            ticket.release(last)
+        if abort is not None:
+            abort.close()
+
+
+class StreamAbort:
+    """
+    Cuts a streamed request off from another thread by shutting down the socket
+    of its own connection.
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self._socket = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self, host: str):
+        """
+        Returns a new Ollama client for the request (a retry gets another one).
+        """
+        import httpx
+        import ollama
+
+        def trace(event, info):
+            if event == "connection.connect_tcp.complete":
+                self._attach(info["return_value"].get_extra_info("socket"))
+
+        def on_request(request):
+            request.extensions["trace"] = trace
+
+        client = ollama.Client(host=host or DEFAULT_HOST, timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
+                               event_hooks={"request": [on_request]})
+        with self._lock:
+            previous, self._client = self._client, client
+        if previous is not None:
+            previous.close()
+        return client
+
+    def _attach(self, sock) -> None:
+        with self._lock:
+            self._socket = sock
+            aborted = self.aborted
+        if aborted:
+            _shutdown(sock)
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            sock = self._socket
+        _shutdown(sock)
+
+    def close(self) -> None:
+        """
+        Closes the request's client once the stream is over.
+        """
+        with self._lock:
+            client, self._client, self._socket = self._client, None, None
+        if client is not None:
+            client.close()
+
+
+def _shutdown(sock) -> None:
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class TokenStream:
+    """
+    Iterates over the text pieces of a streamed generation and records
+    time-to-first-token and generation speed.
+    """
+
+    def __init__(self, chunks, started: float, on_complete=None, cached: bool = False, agent: str = "",
+                 model: str = "", abort: StreamAbort = None):
+        self._chunks = chunks
+        self._abort = abort
+        # Held while waiting for the next chunk, so close() from another thread leaves the iterator alone.
+        self._reading = threading.Lock()
+        self.cached = cached
+        self.agent = agent
+        self.model = model
+        self._on_complete = on_complete
+        self.started = started
+        self.first_token_at = None
+        self.finished_at = None
+        self.eval_count = None
+        self.eval_duration = None
+        self.pieces = 0
+        self.parts = []
+        self.final = None
+
+    def __iter__(self):
+        chunks = iter(self._chunks)
+        while True:
+            try:
+                with self._reading:
+                    chunk = next(chunks, None)
+            except Exception:
+                if self._abort is not None and self._abort.aborted:
+                    return
+                raise
+            if chunk is None:
+                break
+            piece = chunk.response
+            if chunk.done:
+                self.final = chunk
+                self.eval_count = getattr(chunk, "eval_count", None)
+                self.eval_duration = getattr(chunk, "eval_duration", None)
+            if piece:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.pieces += 1
+                self.parts.append(piece)
+                yield piece
+        if self._abort is not None and self._abort.aborted:
+            return
+        self.finished_at = time.perf_counter()
+        attrs = record_model_metrics(self.final or {}, self.agent, self.model, self.finished_at - self.started,
+                                     cached=self.cached)
+        record_span("model.stream", self.started, self.finished_at, agent=self.agent, model=self.model,
+                    ttft=self.stats()["ttft"], **attrs)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    def close(self) -> None:
+        """
+        Ends the stream. Other threads may call it too, also while the
+        request still waits for its first chunk; the reading thread's
+        iteration then just ends.
+        """
+        if self._abort is not None and self.finished_at is None:
+            self._abort.abort()
+        close = getattr(self._chunks, "close", None)
+        if close is not None and self._reading.acquire(blocking=False):
+            try:
+                close()
+            finally:
+                self._reading.release()
+
+    def stop(self) -> None:
+        """
+        Ends the stream once the caller has what it needs; unlike ``close()`` it
+        is recorded as finished. The cut-short text is not cached.
+        """
+        self.close()
+        if self.finished_at is not None:
+            return
+        self.finished_at = time.perf_counter()
+        record_model_metrics({"eval_count": self.pieces}, self.agent, self.model, self.finished_at - self.started,
+                             cached=self.cached)
+        record_span("model.stream", self.started, self.finished_at, agent=self.agent, model=self.model,
+                    ttft=self.stats()["ttft"], stopped_early=True)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def stats(self) -> dict:
+        """
+        Returns time to first token and tokens per second (from Ollama's
+        eval metrics when available, otherwise from wall-clock time).
+        """
+        end = self.finished_at or time.perf_counter()
+        ttft = (self.first_token_at - self.started) if self.first_token_at else None
+        tokens = self.eval_count or self.pieces
+        if self.cached:
+            rate = None
+        elif self.eval_duration:
+            rate = tokens / (self.eval_duration / 1e9)
+        elif self.first_token_at and end > self.first_token_at:
+            rate = tokens / (end - self.first_token_at)
+        else:
+            rate = None
+        return {"ttft": ttft, "total": end - self.started, "tokens": tokens, "tokens_per_sec": rate,
+                "cached": self.cached}
+
+
+def stream_generate(prompt: str, system: str = "", agent: str = "", model: str = None, host: str = None,
+                    options: dict = None, keep_alive=None, cache: bool = None, **kwargs) -> TokenStream:
+    """
+    Streams a generation as a ``TokenStream``; the request is sent when
+    iteration starts.
+    """
+    started = time.perf_counter()
+    model = model or model_for(agent)
+    on_complete = None
+    if (CACHE_ENABLED if cache is None else cache) and not kwargs:
+        from response_cache import get_cache, request_key
+
+        key = request_key(model, system, prompt, options)
+        cached = get_cache().get(key)
+        if cached is not None:
+            return TokenStream(iter([CachedResponse(model, cached)]), started, cached=True, agent=agent, model=model)
+
+        def store(text):
+            get_cache().put(key, model, text)
+
+        on_complete = store
+
+    abort = StreamAbort()
+
+    def chunks():
+        yield from generate(prompt, system, agent=agent, model=model, host=host, options=options, stream=True,
+                            keep_alive=keep_alive, cache=False, abort=abort, **kwargs)
+
+    return TokenStream(chunks(), started, on_complete, agent=agent, model=model, abort=abort)
+
+
+def preload(agent: str = "", model: str = None, host: str = None, keep_alive=None) -> None:
+    """
+    Loads a model into memory without generating anything, so the first real
+    request does not pay the model load time. Without an explicit host the
+    model is loaded on every host of the pool.
+    """
+    pool = get_pool() if host is None else None
+    for url in [h.url for h in pool.hosts] if pool is not None else [host]:
+        get_client(url).generate(
+            model=model or model_for(agent),
+            prompt="",
+            keep_alive=DEFAULT_KEEP_ALIVE if keep_alive is None else keep_alive,
+        )
@@ -1,22 +1,50 @@
-import ollama
+if __name__ == "__main__":
+    # Fast path: let a running supergitd (see supergitd.py) do the work, before paying for the imports below.
+    import daemon_client
+    daemon_client.forward("optimizer")
+
 import argparse
+import json
 import os
-import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def log_message(message):
-    """
-    Logs a message with a timestamp to the optimization log file.
-    """
-    log_folder = os.path.join(os.getcwd(), "logs")
-    os.makedirs(log_folder, exist_ok=True)
+import llm_backend
+import artifact_index
+import instrumentation
+import perf_check
+from agent_log import get_logger
+from code_chunks import split_chunks, parse_replacement, splice
+from instrumentation import timed
+from context_builder import estimate_tokens, DEFAULT_TOKEN_BUDGET
+from stream_output import stream_to_file, format_stream_stats
+
+SYSTEM_PROMPT = (
+    "You are a code optimization agent. Your task is to improve the given code by adding missing checks, "
+    "exception handling, try-catch blocks, validating inputs, handling edge cases,value errors, and make it more robust against runtime errors. "
+    "You must not remove essential logic. Return only the updated and optimized code."
+)
+# Bump when SYSTEM_PROMPT or the optimize prompt changes so indexed optimizations are not reused.
+OPTIMIZE_PROMPT_VERSION = "1"
+
+CHUNK_SYSTEM_PROMPT = SYSTEM_PROMPT + (
+    " You are given one top-level function or class of a larger module. Return only that function or class, "
+    "keeping its name and signature, in one ```python block, with any new imports it needs at the top of the block."
+)
+# Bump when CHUNK_SYSTEM_PROMPT changes so cached chunk results are not reused.
+CHUNK_PROMPT_VERSION = "1"
+DEFAULT_WORKERS = 4
 
-    log_file = os.path.join(log_folder, "optimizer_log.txt")
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+PERF_SYSTEM_PROMPT = (
+    "You are a performance optimization agent. Rewrite the given Python code so it runs faster while behaving "
+    "exactly the same: keep every public function name and signature, the return values, the printed output and "
+    "the exceptions raised. Prefer better algorithms and data structures, avoid repeated work and use the standard "
+    "library's fast paths. Do not add third-party dependencies. Return only the complete code in one ```python block."
+)
 
-    with open(log_file, "a", encoding="utf-8") as log:
-        log.write(f"[{timestamp}] {message}\n")
-    print(f"[{timestamp}] {message}")
+LOG = get_logger("optimizer", "optimizer_log.jsonl")
+log_message = LOG.info
 
+@timed("optimizer.read_file")
 def read_code_from_file(file_path):
     """
     Reads the content of the given file.
@@ -26,53 +54,288 @@ def read_code_from_file(file_path):
             code = file.read()
         log_message(f"Successfully read code from: {file_path}")
         if not code.strip():
-            log_message("Warning: The file is empty.")
+            LOG.warning("The file is empty.")
             return None
         else:
-            log_message("Code successfully read.")
+            log_message(f"Code successfully read ({len(code.splitlines())} lines).")
         return code
     except Exception as e:
-        log_message(f"Failed to read file: {e}")
+        LOG.error(f"Failed to read file: {e}")
         return None
 
-def optimize_code(code_content):
+@timed("optimizer.build_prompt")
+def build_optimize_prompt(code_content, token_budget=DEFAULT_TOKEN_BUDGET):
     """
-    Sends the code to Ollama for optimization.
+    Builds the optimization prompt for the code, or returns None if the code is
+    over ``token_budget`` tokens.
     """
-    client = ollama.Client()
-    model = 'qwen2.5-coder:0.5b'
-    system_prompt = (
-        "You are a code optimization agent. Your task is to improve the given code by adding missing checks, "
-        "exception handling, try-catch blocks, validating inputs, handling edge cases,value errors, and make it more robust against runtime errors. "
-        "You must not remove essential logic. Return only the updated and optimized code."
-    )
+    tokens = estimate_tokens(code_content)
+    if tokens > token_budget:
+        log_message(f"Code is about {tokens} tokens, over the {token_budget}-token budget; skipping optimization.")
+        return None
+
+    return f"Please optimize the following code with all the necessary safety and error handling improvements:\n\n```{code_content}```"
 
-    prompt = f"Please optimize the following code with all the necessary safety and error handling improvements:\n\n```{code_content}```"
+@timed("optimizer.optimize")
+def optimize_code(code_content, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None):
+    """
+    Sends the code to Ollama for optimization.
+    """
+    prompt = build_optimize_prompt(code_content, token_budget)
+    if prompt is None:
+        return None
 
     log_message("Sending code for optimization to supergit optimizer...")
 
     try:
-        response = client.generate(
-            model=model,
-            prompt=prompt,
-            system=system_prompt,
-            stream=False
-        )
+        response = llm_backend.generate(prompt, SYSTEM_PROMPT, agent="optimizer", model=model, host=host)
         log_message("Optimization received successfully.")
         return response.response.strip()
     except Exception as e:
-        log_message(f"Failed to get optimized code from supergit optimizer: {e}")
+        LOG.error(f"Failed to get optimized code from supergit optimizer: {e}")
         return None
 
+@timed("optimizer.chunk")
+def optimize_chunk(chunk, model=None, host=None):
+    """
+    Sends one function or class to Ollama for optimization and returns the
+    code from the response.
+    """
+    prompt = (f"Please optimize the following {chunk.kind} with all the necessary safety and error handling "
+              f"improvements:\n\n```python\n{chunk.source}```")
+    response = llm_backend.generate(prompt, CHUNK_SYSTEM_PROMPT, agent="optimizer", model=model, host=host)
+    return perf_check.extract_code(response.response)
+
+def indexed_chunk(chunk, model):
+    """
+    Looks up the rewrite of a function or class with the same source by the
+    same model and chunk prompt in the artifact index, or returns None.
+    """
+    if not llm_backend.CACHE_ENABLED:
+        return None
+    try:
+        return artifact_index.get_index().lookup("chunk", artifact_index.source_hash(chunk.source), model,
+                                                 CHUNK_PROMPT_VERSION)
+    except Exception as e:
+        LOG.warning(f"Artifact index lookup failed: {e}")
+        return None
+
+def index_chunk(chunk, file_path, text, model):
+    """
+    Records the rewrite of a function or class in the artifact index.
+    """
+    try:
+        artifact_index.get_index().record("chunk", file_path, artifact_index.source_hash(chunk.source), model,
+                                          CHUNK_PROMPT_VERSION, text)
+    except Exception as e:
+        LOG.warning(f"Failed to index the rewrite of {chunk.kind} {chunk.name}: {e}")
+
+@timed("optimizer.chunked")
+def optimize_chunked(code_content, file_path, workers=DEFAULT_WORKERS, token_budget=DEFAULT_TOKEN_BUDGET,
+                     model=None, host=None):
+    """
+    Optimizes a Python module function by function and splices the rewrites back
+    in place; code without functions or classes is optimized as a whole.
+
+    Returns:
+        str: The optimized module, or None on failure.
+    """
+    try:
+        chunks = split_chunks(code_content)
+    except SyntaxError as e:
+        LOG.warning(f"Code does not parse ({e.msg}, line {e.lineno}); optimizing the whole file instead.")
+        return optimize_code(code_content, token_budget, model, host)
+    if not chunks:
+        return optimize_code(code_content, token_budget, model, host)
+
+    model_name = model or llm_backend.model_for("optimizer")
+    replacements, imports, pending = {}, [], []
+    for chunk in chunks:
+        stored = indexed_chunk(chunk, model_name)
+        body, added = parse_replacement(chunk, stored.text) if stored is not None else (None, None)
+        if body is not None:
+            replacements[chunk] = body
+            imports.extend(added)
+        elif estimate_tokens(chunk.source) > token_budget:
+            LOG.warning(f"{chunk.kind} {chunk.name} is over the {token_budget}-token budget; keeping it as it is.")
+        else:
+            pending.append(chunk)
+    log_message(f"{len(chunks)} functions and classes: {len(replacements)} unchanged since the last run, "
+                f"{len(pending)} to optimize with {workers} workers.")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(optimize_chunk, chunk, model, host): chunk for chunk in pending}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                LOG.error(f"Failed to optimize {chunk.kind} {chunk.name}: {e}")
+                continue
+            body, added = parse_replacement(chunk, text)
+            if body is None:
+                LOG.warning(f"Discarding the rewrite of {chunk.kind} {chunk.name}: it {added}.")
+                continue
+            replacements[chunk] = body
+            imports.extend(added)
+            index_chunk(chunk, file_path, text, model_name)
+
+    if not replacements:
+        return None
+    optimized = splice(code_content, chunks, replacements, imports)
+    error = perf_check.syntax_error(optimized, file_path)
+    if error:
+        LOG.error(f"Reassembled module does not parse ({error}); discarding it.")
+        return None
+    log_message(f"Optimization received successfully ({len(replacements)} of {len(chunks)} chunks rewritten).")
+    return optimized
+
+@timed("optimizer.perf")
+def optimize_for_performance(code_content, cases=None, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None,
+                             repeats=perf_check.DEFAULT_REPEATS, min_speedup=perf_check.DEFAULT_MIN_SPEEDUP,
+                             alpha=perf_check.DEFAULT_ALPHA):
+    """
+    Asks for a performance-focused rewrite and keeps it only if ``perf_check``
+    verifies the speedup.
+
+    Returns:
+        tuple: ``(candidate, report)``; ``candidate`` is None unless accepted.
+    """
+    if estimate_tokens(code_content) > token_budget:
+        log_message(f"Code is over the {token_budget}-token budget; skipping performance optimization.")
+        return None, {"accepted": False, "reason": "over the token budget"}
+    error = perf_check.syntax_error(code_content, "<original>")
+    if error:
+        return None, {"accepted": False, "reason": f"original does not parse ({error})"}
+
+    prompt = f"Please make the following code faster without changing its behaviour:\n\n```python\n{code_content}```"
+    log_message("Sending code for performance optimization to supergit optimizer...")
+    try:
+        response = llm_backend.generate(prompt, PERF_SYSTEM_PROMPT, agent="optimizer", model=model, host=host)
+    except Exception as e:
+        LOG.error(f"Failed to get optimized code from supergit optimizer: {e}")
+        return None, {"accepted": False, "reason": f"model request failed: {e}"}
+
+    candidate = perf_check.extract_code(response.response)
+    log_message("Verifying the candidate against the original...")
+    report = perf_check.compare(code_content, candidate, cases, repeats, min_speedup, alpha)
+    if report["accepted"]:
+        log_message(f"Candidate kept: {report['reason']}")
+        return candidate, report
+    LOG.warning(f"Candidate rejected: {report['reason']}")
+    return None, report
+
+def save_perf_report(report, original_file):
+    """
+    Saves the verification report next to the optimized file as JSON.
+    """
+    report_path = optimized_path(original_file) + ".perf.json"
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    try:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(dict(report, file=original_file), f, indent=2)
+        log_message(f"Performance report saved at: {report_path}")
+        return report_path
+    except Exception as e:
+        LOG.error(f"Failed to save performance report: {e}")
+        return None
+
+def optimized_path(original_file):
+    """
+    Returns the path the optimized version of a file is saved to, mirroring its
+    path under 'optim'.
+    """
+    cwd = os.getcwd()
+    path = os.path.abspath(original_file)
+    relative = os.path.relpath(path, cwd) if os.path.splitdrive(path)[0] == os.path.splitdrive(cwd)[0] else os.pardir
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        drive, rest = os.path.splitdrive(path)
+        relative = os.path.join("_external", drive.rstrip(":"), rest.lstrip(os.sep))
+    return os.path.join(cwd, "optim", relative)
+
+def optimization_version(whole_file, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Identifies the prompt that produced an optimization, for the artifact
+    index.
+    """
+    if whole_file:
+        return f"whole:{OPTIMIZE_PROMPT_VERSION}:budget={token_budget}"
+    return f"chunks:{CHUNK_PROMPT_VERSION}"
+
+def indexed_optimization(code_content, version, model=None):
+    """
+    Looks up an optimization of the same code by the same model and prompt
+    in the artifact index.
+
+    Returns:
+        artifact_index.Artifact: The stored optimization, or None if there
+        is none or caching is disabled.
+    """
+    if not llm_backend.CACHE_ENABLED:
+        return None
+    try:
+        stored = artifact_index.get_index().lookup("optimization", artifact_index.source_hash(code_content),
+                                                   model or llm_backend.model_for("optimizer"), version)
+    except Exception as e:
+        LOG.warning(f"Artifact index lookup failed: {e}")
+        return None
+    if stored is not None:
+        log_message("Already optimized (same content, model and prompt); reusing the indexed result.")
+    return stored
+
+def index_artifact(kind, code_content, file_path, text, path, version, model=None):
+    """
+    Records a saved optimization or performance report in the artifact
+    index.
+    """
+    if not text or path is None:
+        return
+    try:
+        artifact_index.get_index().record(kind, file_path, artifact_index.source_hash(code_content),
+                                          model or llm_backend.model_for("optimizer"), version, text, path)
+    except Exception as e:
+        LOG.warning(f"Failed to index {kind}: {e}")
+
+@timed("optimizer.stream")
+def stream_optimization(code_content, original_file, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None):
+    """
+    Streams the optimized code to the console and into its output file as
+    tokens arrive, then atomically replaces the previous output.
+
+    Returns:
+        str: Path of the saved file, or None on failure.
+    """
+    prompt = build_optimize_prompt(code_content, token_budget)
+    if prompt is None:
+        return None
+    optimized_file_path = optimized_path(original_file)
+    version = optimization_version(True, token_budget)
+    stored = indexed_optimization(code_content, version, model)
+    if stored is not None:
+        print(stored.text, flush=True)
+        saved = save_optimized_code(stored.text, original_file)
+        index_artifact("optimization", code_content, original_file, stored.text, saved, version, model)
+        return saved
+
+    log_message("Streaming optimization from supergit optimizer...")
+    try:
+        tokens = llm_backend.stream_generate(prompt, SYSTEM_PROMPT, agent="optimizer", model=model, host=host)
+        text = stream_to_file(tokens, optimized_file_path)
+        index_artifact("optimization", code_content, original_file, text, optimized_file_path, version, model)
+        log_message(f"Optimization streamed: {format_stream_stats(tokens.stats())}")
+        log_message(f"Optimized code saved at: {optimized_file_path}")
+        return optimized_file_path
+    except Exception as e:
+        LOG.error(f"Failed to stream optimized code from supergit optimizer: {e}")
+        return None
+
+@timed("optimizer.save")
 def save_optimized_code(code_text, original_file):
     """
     Saves the optimized code to a file in the 'optim' folder.
     """
-    optim_folder = os.path.join(os.getcwd(), "optim")
-    os.makedirs(optim_folder, exist_ok=True)
-
-    base_name = os.path.basename(original_file)
-    optimized_file_path = os.path.join(optim_folder, base_name)
+    optimized_file_path = optimized_path(original_file)
+    os.makedirs(os.path.dirname(optimized_file_path), exist_ok=True)
 
     try:
         with open(optimized_file_path, "w", encoding="utf-8") as f:
@@ -80,25 +343,68 @@ def save_optimized_code(code_text, original_file):
         log_message(f"Optimized code saved at: {optimized_file_path}")
         return optimized_file_path
     except Exception as e:
-        log_message(f"Failed to save optimized code: {e}")
+        LOG.error(f"Failed to save optimized code: {e}")
         return None
 
 def main():
     parser = argparse.ArgumentParser(description="Code Optimizer using supergit optimizer.")
     parser.add_argument('--file', '-f', type=str, required=True, help='Path to the code file to optimize')
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help='Maximum prompt tokens for the code; larger files are skipped')
+    parser.add_argument('--model', type=str, default=None, help='Ollama model (default: SUPERGIT_OPTIMIZER_MODEL or SUPERGIT_MODEL)')
+    parser.add_argument('--host', type=str, default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache and the artifact index and always call the model')
+    parser.add_argument('--stream', '-s', action='store_true',
+                        help='Stream the optimized code to the console and output file as it is generated')
+    parser.add_argument('--whole-file', action='store_true',
+                        help='Send a Python file in one prompt instead of function by function')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help='Maximum number of concurrent chunk requests for Python files'
+                             ' (also capped by SUPERGIT_SCHEDULER_SLOTS or the host pool, if set)')
+    parser.add_argument('--perf', action='store_true',
+                        help='Ask for a faster rewrite and keep it only if it behaves the same and is measurably faster')
+    parser.add_argument('--inputs', type=str, default=None,
+                        help='JSON file of {"function", "args", "kwargs"} cases for --perf (default: derived from signatures)')
+    parser.add_argument('--repeats', type=int, default=perf_check.DEFAULT_REPEATS, help='Timed rounds per version for --perf')
+    parser.add_argument('--min-speedup', type=float, default=perf_check.DEFAULT_MIN_SPEEDUP,
+                        help='Required relative speedup for --perf, e.g. 0.05 for 5%%')
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args()
+    instrumentation.configure(args, "optimizer")
+    if args.no_cache:
+        llm_backend.CACHE_ENABLED = False
     file_path = args.file 
 
     log_message("Starting code optimization job.")
     code = read_code_from_file(file_path)
 
-    if code:
-        optimized_code = optimize_code(code)
+    if code and args.perf:
+        cases = perf_check.load_cases(args.inputs) if args.inputs else None
+        candidate, report = optimize_for_performance(code, cases, args.token_budget, args.model, args.host,
+                                                     args.repeats, args.min_speedup)
+        if candidate:
+            save_optimized_code(candidate, file_path)
+        report_path = save_perf_report(report, file_path)
+        index_artifact("perf", code, file_path, json.dumps(report), report_path, "perf", args.model)
+    elif code and args.stream:
+        if not stream_optimization(code, file_path, args.token_budget, args.model, args.host):
+            LOG.warning("Optimization failed or returned empty.")
+    elif code:
+        whole_file = args.whole_file or not file_path.endswith(".py")
+        version = optimization_version(whole_file, args.token_budget)
+        stored = indexed_optimization(code, version, args.model)
+        if stored is not None:
+            optimized_code = stored.text
+        elif not whole_file:
+            optimized_code = optimize_chunked(code, file_path, args.workers, args.token_budget, args.model, args.host)
+        else:
+            optimized_code = optimize_code(code, args.token_budget, args.model, args.host)
         if optimized_code:
-            save_optimized_code(optimized_code, file_path)
+            saved = save_optimized_code(optimized_code, file_path)
+            index_artifact("optimization", code, file_path, optimized_code, saved, version, args.model)
         else:
-            log_message("Optimization failed or returned empty.")
+            LOG.warning("Optimization failed or returned empty.")
     else:
         log_message("No code content to optimize.")
 
@@ -0,0 +1,326 @@
+import os
+import ast
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+DEFAULT_REPEATS = 20
+# Minimum relative speedup and significance level for a candidate to be kept.
+DEFAULT_MIN_SPEEDUP = 0.05
+DEFAULT_ALPHA = 0.01
+DEFAULT_TIMEOUT = 120
+# Target duration of one timed round; the loop count is calibrated to reach it.
+ROUND_SECONDS = 0.05
+# Shortest duration perf_counter can tell apart from zero; a round timed at or below it measured nothing.
+TIMER_RESOLUTION = time.get_clock_info("perf_counter").resolution
+MAX_AUTO_CASES = 6
+# Limits applied to the subprocess that runs the code under test.
+MEMORY_LIMIT = 1024 * 1024 * 1024
+
+# Sample arguments by annotation for auto-derived inputs.
+SAMPLES = {
+    "int": [0, 1, 7, 100, 1000, -3],
+    "float": [0.0, 1.5, -2.25, 100.0, 1e-3, 3.14159],
+    "str": ["", "a", "hello world", "Racecar", "a,b,,c", "x" * 200],
+    "bool": [True, False, True, False, True, False],
+    "list": [[], [1], [3, 1, 2], list(range(50, 0, -1)), [5, 5, 1], list(range(200))],
+    "dict": [{}, {"a": 1}, {"a": 1, "b": 2}, {str(i): i for i in range(50)}, {"x": 0}, {"k": -1}],
+}
+UNTYPED_SAMPLES = [1, 10, [3, 1, 2], "abc", 0, list(range(100))]
+
+HARNESS = r'''
+import io, sys, copy, json, math, time, importlib.util, contextlib
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+def equal(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, (list, tuple)) and type(a) is type(b):
+        return len(a) == len(b) and all(equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(equal(a[k], b[k]) for k in a)
+    try:
+        return bool(a == b)
+    except Exception:
+        return repr(a) == repr(b)
+
+def call(module, case):
+    out = io.StringIO()
+    args, kwargs = copy.deepcopy((case.get("args", []), case.get("kwargs", {})))
+    try:
+        with contextlib.redirect_stdout(out):
+            value = getattr(module, case["function"])(*args, **kwargs)
+        return ("ok", value, out.getvalue())
+    except Exception as e:
+        return ("raised", type(e).__name__, out.getvalue())
+
+def run_all(module, cases, number):
+    # Arguments are copied for every call so in-place changes do not leak into the next one;
+    # the same copying is timed on its own and subtracted.
+    sink = io.StringIO()
+    functions = [getattr(module, case["function"]) if module else None for case in cases]
+    with contextlib.redirect_stdout(sink):
+        start = time.perf_counter()
+        for _ in range(number):
+            for function, case in zip(functions, cases):
+                args, kwargs = copy.deepcopy((case.get("args", []), case.get("kwargs", {})))
+                if function is None:
+                    continue
+                try:
+                    function(*args, **kwargs)
+                except Exception:
+                    pass
+                sink.seek(0)
+                sink.truncate()
+        return time.perf_counter() - start
+
+def write_result(result):
+    # A file rather than stdout, which the code under test can write to or close.
+    with open(config["result"], "w") as f:
+        json.dump(result, f)
+
+config = json.load(open(sys.argv[1]))
+original = load("original_under_test", config["original"])
+candidate = load("candidate_under_test", config["candidate"])
+cases = config["cases"]
+
+mismatches = []
+for case in cases:
+    if not hasattr(candidate, case["function"]):
+        mismatches.append({"case": case, "reason": "function missing from candidate"})
+        continue
+    expected, actual = call(original, case), call(candidate, case)
+    if expected[0] != actual[0] or not equal(expected[1], actual[1]) or expected[2] != actual[2]:
+        mismatches.append({"case": case, "expected": repr(expected)[:300], "actual": repr(actual)[:300]})
+if mismatches:
+    write_result({"mismatches": mismatches})
+    sys.exit(0)
+
+number = 1
+while run_all(original, cases, number) < config["round_seconds"] and number < 1000000:
+    number *= 2
+timings = {"original": [], "candidate": []}
+for round_index in range(config["repeats"]):
+    order = ("original", "candidate") if round_index % 2 == 0 else ("candidate", "original")
+    overhead = run_all(None, cases, number)
+    for name in order:
+        module = original if name == "original" else candidate
+        timings[name].append(max(0.0, run_all(module, cases, number) - overhead) / number)
+write_result({"mismatches": [], "number": number, "timings": timings})
+'''
+
+
+def extract_code(text: str) -> str:
+    """
+    Returns the code inside the first fenced block of a model response, or
+    the whole response when it has no fence.
+    """
+    if "```" not in text:
+        return text.strip()
+    block = text.split("```")[1]
+    first_line, _, rest = block.partition("\n")
+    # Drop the language tag of the fence ("```python").
+    return (rest if first_line.strip().isidentifier() or not first_line.strip() else block).strip() + "\n"
+
+
+def syntax_error(code: str, file_name: str = "<candidate>"):
+    """
+    Returns a description of the first syntax error in ``code``, or None if
+    it parses.
+    """
+    try:
+        ast.parse(code, file_name)
+        return None
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+
+
+def _sample_values(arg: ast.arg, default):
+    annotation = ast.unparse(arg.annotation) if arg.annotation is not None else ""
+    base = annotation.split("[")[0].lower()
+    samples = list(SAMPLES.get(base, UNTYPED_SAMPLES))
+    if default is not None:
+        try:
+            samples.insert(0, ast.literal_eval(default))
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return samples
+
+
+def derive_cases(code: str, max_cases: int = MAX_AUTO_CASES) -> list:
+    """
+    Derives call cases for the public top-level functions of ``code`` from their
+    annotations and default values.
+    """
+    cases = []
+    for node in ast.parse(code).body:
+        if not isinstance(node, ast.FunctionDef) or node.name.startswith("_"):
+            continue
+        arguments = node.args
+        if arguments.vararg or arguments.kwarg or any(d is None for d in arguments.kw_defaults):
+            continue
+        positional = arguments.posonlyargs + arguments.args
+        defaults = [None] * (len(positional) - len(arguments.defaults)) + list(arguments.defaults)
+        samples = [_sample_values(arg, default) for arg, default in zip(positional, defaults)]
+        count = min(max_cases, min((len(values) for values in samples), default=1))
+        for index in range(count):
+            cases.append({"function": node.name, "args": [values[index] for values in samples]})
+    return cases
+
+
+def load_cases(path: str) -> list:
+    """
+    Reads user-supplied inputs: a JSON list of ``{"function", "args",
+    "kwargs"}`` cases, or an object with such a list under ``"cases"``.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    cases = data["cases"] if isinstance(data, dict) else data
+    for case in cases:
+        if "function" not in case:
+            raise ValueError(f"case without 'function': {case}")
+    return cases
+
+
+def mann_whitney_p(slower: list, faster: list) -> float:
+    """
+    One-sided Mann-Whitney U test (normal approximation): the probability of
+    seeing timings this separated if ``faster`` were not actually faster.
+    """
+    n1, n2 = len(slower), len(faster)
+    u = sum(1.0 if a > b else 0.5 if a == b else 0.0 for a in slower for b in faster)
+    mean = n1 * n2 / 2
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sd == 0:
+        return 1.0
+    z = (u - mean - 0.5) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _limit_resources():
+    import resource
+
+    resource.setrlimit(resource.RLIMIT_AS, (MEMORY_LIMIT, MEMORY_LIMIT))
+
+
+def run_harness(original: str, candidate: str, cases: list, repeats: int = DEFAULT_REPEATS,
+                timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Runs the original and candidate code in an isolated interpreter (``-I``,
+    a scratch working directory, a memory limit and a timeout), compares
+    their results on ``cases`` and times both in alternating rounds.
+
+    Returns:
+        dict: ``mismatches`` and, when there are none, ``timings`` (seconds
+        per pass over all cases, one entry per round) and the loop ``number``.
+    """
+    work_dir = tempfile.mkdtemp(prefix="supergit-perf-")
+    try:
+        paths = {}
+        for name, code in (("original", original), ("candidate", candidate), ("harness", HARNESS)):
+            paths[name] = os.path.join(work_dir, f"{name}.py")
+            with open(paths[name], "w", encoding="utf-8") as f:
+                f.write(code)
+        config_path = os.path.join(work_dir, "config.json")
+        result_path = os.path.join(work_dir, "result.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"original": paths["original"], "candidate": paths["candidate"], "cases": cases,
+                       "repeats": repeats, "round_seconds": ROUND_SECONDS, "result": result_path}, f)
+
+        result = subprocess.run(
+            [sys.executable, "-I", paths["harness"], config_path], cwd=work_dir, capture_output=True,
+            text=True, timeout=timeout, stdin=subprocess.DEVNULL,
+            preexec_fn=_limit_resources if os.name == "posix" else None,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"harness failed: {result.stderr.strip().splitlines()[-1:] or result.returncode}")
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # The code under test exited early, e.g. with sys.exit(0) at import.
+            raise RuntimeError("harness produced no result")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(original: str, candidate: str, cases: list = None, repeats: int = DEFAULT_REPEATS,
+            min_speedup: float = DEFAULT_MIN_SPEEDUP, alpha: float = DEFAULT_ALPHA,
+            timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Decides whether ``candidate`` behaves like ``original`` and is a
+    statistically significant speedup.
+
+    Parameters:
+        original (str): The original source code.
+        candidate (str): The rewritten source code.
+        cases (list): Call cases; derived from the original when None.
+        repeats (int): Timed rounds per version.
+        min_speedup (float): Required relative speedup, e.g. 0.05 for 5 %.
+        alpha (float): Significance level.
+        timeout (float): Seconds before the harness is killed.
+
+    Returns:
+        dict: A report with ``accepted``, ``reason`` and, when timed, the
+        medians, ``speedup`` and ``p_value``. ``speedup`` is left out when
+        a median round is too short for the timer to measure.
+    """
+    report = {"accepted": False, "cases": None}
+    error = syntax_error(candidate)
+    if error:
+        report["reason"] = f"candidate does not parse ({error})"
+        return report
+    cases = derive_cases(original) if cases is None else cases
+    report["cases"] = len(cases)
+    if not cases:
+        report["reason"] = "no inputs: the code has no callable public functions and no --inputs were given"
+        return report
+
+    try:
+        result = run_harness(original, candidate, cases, repeats, timeout)
+    except subprocess.TimeoutExpired:
+        report["reason"] = f"timed out after {timeout} s"
+        return report
+    except (RuntimeError, ValueError) as e:
+        report["reason"] = str(e)
+        return report
+    if result["mismatches"]:
+        report["reason"] = f"behaviour differs on {len(result['mismatches'])} of {len(cases)} cases"
+        report["mismatches"] = result["mismatches"][:5]
+        return report
+
+    before, after = result["timings"]["original"], result["timings"]["candidate"]
+    report.update({
+        "loops_per_round": result["number"],
+        "rounds": len(before),
+        "original_median_s": statistics.median(before),
+        "candidate_median_s": statistics.median(after),
+        "original_stdev_s": statistics.stdev(before) if len(before) > 1 else 0.0,
+        "candidate_stdev_s": statistics.stdev(after) if len(after) > 1 else 0.0,
+        "p_value": mann_whitney_p(before, after),
+    })
+    # The medians are per call; the timer only saw whole rounds of ``loops_per_round`` calls.
+    shortest_round = min(report["original_median_s"], report["candidate_median_s"]) * result["number"]
+    if shortest_round <= TIMER_RESOLUTION:
+        report["reason"] = "benchmark too short to measure"
+        return report
+    report["speedup"] = report["original_median_s"] / report["candidate_median_s"]
+    if report["speedup"] < 1 + min_speedup:
+        report["reason"] = f"speedup {report['speedup']:.2f}x is below the required {1 + min_speedup:.2f}x"
+    elif report["p_value"] >= alpha:
+        report["reason"] = f"speedup is not significant (p = {report['p_value']:.3g}, need < {alpha})"
+    else:
+        report["accepted"] = True
+        report["reason"] = f"{report['speedup']:.2f}x faster (p = {report['p_value']:.3g})"
+    return report
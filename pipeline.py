@@ -0,0 +1,238 @@
+if __name__ == "__main__":
+    # Fast path: let a running supergitd (see supergitd.py) do the work, before paying for the imports below.
+    import daemon_client
+    daemon_client.forward("pipeline")
+
+import json
+import queue
+import argparse
+import threading
+
+import llm_backend
+import instrumentation
+import coder
+import reviewer
+import optimizer
+from agent_log import get_logger
+from request_scheduler import priority, BATCH
+
+LOG = get_logger("pipeline", "pipeline_log.jsonl")
+log_message = LOG.info
+
+DEFAULT_STAGE_WORKERS = 2
+# Items waiting between two stages; a full queue makes the faster stage wait.
+QUEUE_SIZE = 16
+_STOP = object()
+
+
+class Artifact:
+    """
+    One prompt travelling through the pipeline, with everything the stages
+    produced for it.
+    """
+
+    def __init__(self, index, prompt, name=""):
+        self.index = index
+        self.prompt = prompt
+        self.name = name or f"generated_code_{index + 1}"
+        self.content = None
+        self.file_type = None
+        self.review = None
+        self.optimized = None
+        self.error = None
+
+
+class Stage:
+    """
+    A pool of worker threads that applies ``work`` to every artifact taken
+    from ``inbox`` and puts it into ``outbox``.
+    """
+
+    def __init__(self, name, work, inbox, outbox, workers):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            artifact = self.inbox.get()
+            if artifact is _STOP:
+                self.inbox.put(_STOP)  # let the sibling workers see it too
+                return
+            if artifact.error is None:
+                try:
+                    # Pipelines are bulk work: interactive requests in the same process go first.
+                    with instrumentation.span(f"pipeline.{self.name}", prompt=artifact.index + 1), priority(BATCH):
+                        self.work(artifact)
+                except Exception as e:
+                    artifact.error = f"{self.name} failed: {e}"
+                    LOG.error(f"[{artifact.index + 1}] {artifact.error}")
+            self.outbox.put(artifact)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+
+def generate(artifact, model=None, host=None):
+    content, file_type = coder.generate_artifact(artifact.prompt, model, host)
+    if content is None:
+        artifact.error = "not a code generation request"
+        return
+    artifact.content, artifact.file_type = content, file_type
+    log_message(f"[{artifact.index + 1}] generated {artifact.file_type} code")
+
+
+def review(artifact, model=None, host=None):
+    # Python code gets the static pre-pass, which needs a file name to recognise the language.
+    file_path = f"{artifact.name}.py" if artifact.file_type.lower() in ("python", "py") else None
+    artifact.review = reviewer.review_code(artifact.content, model=model, host=host, file_path=file_path)
+    log_message(f"[{artifact.index + 1}] reviewed")
+
+
+def optimize(artifact, model=None, host=None):
+    artifact.optimized = optimizer.optimize_code(artifact.content, model=model, host=host)
+    log_message(f"[{artifact.index + 1}] optimized")
+
+
+def run_pipeline(prompts, generate_workers=DEFAULT_STAGE_WORKERS, review_workers=DEFAULT_STAGE_WORKERS,
+                 optimize_workers=DEFAULT_STAGE_WORKERS, skip_review=False, skip_optimize=False,
+                 model=None, host=None):
+    """
+    Runs prompts through generate -> review -> optimize as overlapped stages
+    connected by bounded queues.
+
+    Parameters:
+        prompts (list): ``(prompt, name)`` pairs.
+        generate_workers (int): Concurrent requests in the generate stage.
+        review_workers (int): Concurrent requests in the review stage.
+        optimize_workers (int): Concurrent requests in the optimize stage.
+        skip_review (bool): Leave out the review stage.
+        skip_optimize (bool): Leave out the optimize stage.
+        model (str): Model for every stage (default: each agent's configured model).
+        host (str): Ollama host.
+
+    Returns:
+        list: The ``Artifact`` objects in prompt order.
+    """
+    steps = [("generate", generate, generate_workers)]
+    if not skip_review:
+        steps.append(("review", review, review_workers))
+    if not skip_optimize:
+        steps.append(("optimize", optimize, optimize_workers))
+
+    queues = [queue.Queue(maxsize=QUEUE_SIZE) for _ in steps] + [queue.Queue()]
+    stages = [
+        Stage(name, lambda artifact, work=work: work(artifact, model, host), queues[i], queues[i + 1], workers)
+        for i, (name, work, workers) in enumerate(steps)
+    ]
+    for stage in stages:
+        stage.start()
+
+    def feed():
+        for index, (prompt, name) in enumerate(prompts):
+            queues[0].put(Artifact(index, prompt, name))
+        queues[0].put(_STOP)
+
+    feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+    feeder.start()
+
+    # Each stage is stopped once the one before it has drained.
+    for i, stage in enumerate(stages):
+        stage.join()
+        queues[i + 1].put(_STOP)
+    feeder.join()
+
+    results = []
+    while True:
+        artifact = queues[-1].get()
+        if artifact is _STOP:
+            break
+        results.append(artifact)
+    return sorted(results, key=lambda artifact: artifact.index)
+
+
+def write_artifacts(artifacts):
+    """
+    Writes all outputs once the pipeline has finished: generated code to
+    'coder_folder', reviews to 'reviews' and optimized code to 'optim'.
+    """
+    for artifact in artifacts:
+        if artifact.error is not None:
+            LOG.warning(f"[{artifact.index + 1}] not saved: {artifact.error}")
+            continue
+        code_path = coder.save_file(artifact.content, artifact.file_type, artifact.name)
+        if code_path is None:
+            continue
+        if artifact.review is not None:
+            reviewer.save_review(artifact.review, code_path + '.txt')
+        if artifact.optimized:
+            optimizer.save_optimized_code(artifact.optimized, code_path)
+
+
+def read_prompts(file_path):
+    """
+    Reads prompts from a file: one prompt per line, or JSON lines with
+    ``prompt`` and optional ``name`` keys. Blank lines and ``#`` comments are
+    ignored.
+    """
+    prompts = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                prompts.append((entry["prompt"], entry.get("name", "")))
+            else:
+                prompts.append((line, ""))
+    return prompts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate, review and optimize code in one overlapped pipeline.")
+    parser.add_argument('--prompt', '-p', type=str, action='append', default=[], help='Prompt (repeatable)')
+    parser.add_argument('--prompts-file', type=str, help='File with one prompt per line or JSON lines')
+    # Requests in flight across all stages are also capped by SUPERGIT_SCHEDULER_SLOTS or the host pool, if set.
+    parser.add_argument('--generate-workers', type=int, default=DEFAULT_STAGE_WORKERS, help='Generate stage workers')
+    parser.add_argument('--review-workers', type=int, default=DEFAULT_STAGE_WORKERS, help='Review stage workers')
+    parser.add_argument('--optimize-workers', type=int, default=DEFAULT_STAGE_WORKERS, help='Optimize stage workers')
+    parser.add_argument('--skip-review', action='store_true', help='Do not review generated code')
+    parser.add_argument('--skip-optimize', action='store_true', help='Do not optimize generated code')
+    parser.add_argument('--model', type=str, default=None, help='Ollama model for every stage')
+    parser.add_argument('--host', type=str, default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache and always call the model')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args, "pipeline")
+    if args.no_cache:
+        llm_backend.CACHE_ENABLED = False
+
+    prompts = [(prompt, "") for prompt in args.prompt]
+    if args.prompts_file:
+        prompts += read_prompts(args.prompts_file)
+    if not prompts:
+        parser.error("give at least one --prompt or a --prompts-file")
+
+    log_message(f"Starting pipeline for {len(prompts)} prompts.")
+    artifacts = run_pipeline(prompts, args.generate_workers, args.review_workers, args.optimize_workers,
+                             args.skip_review, args.skip_optimize, args.model, args.host)
+    write_artifacts(artifacts)
+    failed = sum(1 for artifact in artifacts if artifact.error is not None)
+    log_message(f"Pipeline completed: {len(artifacts) - failed} succeeded, {failed} failed.")
+    log_message(f"Model request latency: {llm_backend.get_scheduler().summary()}")
+
+
+if __name__ == "__main__":
+    main()
+
+#python pipeline.py --prompts-file prompts.txt --generate-workers 4 --review-workers 2
@@ -0,0 +1,107 @@
+import os
+import mmap
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from gitignore import IgnoreMatcher
+
+# Bytes inspected to decide whether a file is binary.
+SNIFF_BYTES = 8192
+# Files above this size are skipped (configurable per scan).
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# Text files above this size are decoded from a memory map instead of read().
+MMAP_THRESHOLD = 256 * 1024
+DEFAULT_SCAN_WORKERS = 8
+
+
+def is_binary(head: bytes) -> bool:
+    """
+    Guesses whether a file is binary from its first bytes (a NUL byte or invalid
+    UTF-8).
+    """
+    if b"\0" in head:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def read_text_file(file_path: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+    """
+    Reads a UTF-8 text file, skipping binary, oversized and undecodable files.
+
+    Parameters:
+        file_path (str): Path of the file to read.
+        max_file_size (int): Files larger than this many bytes are skipped.
+
+    Returns:
+        tuple: ``(content, None)`` on success or ``(None, reason)`` if skipped.
+    """
+    try:
+        size = os.path.getsize(file_path)
+        if size > max_file_size:
+            return None, f"larger than {max_file_size} bytes"
+        if size == 0:
+            return "", None
+        with open(file_path, "rb") as f:
+            if is_binary(f.read(SNIFF_BYTES)):
+                return None, "binary file"
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # Decode straight from the mapping instead of copying the file into a bytes object first.
+                    return codecs.utf_8_decode(mapped, "strict", True)[0], None
+            f.seek(0)
+            return f.read().decode("utf-8"), None
+    except UnicodeDecodeError:
+        return None, "not valid UTF-8"
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def walk_repo(base_path: str, ignore: IgnoreMatcher = None):
+    """
+    Yields the paths of all files below ``base_path`` that ``ignore`` (by
+    default the ``.gitignore`` files) does not skip.
+    """
+    return (ignore if ignore is not None else IgnoreMatcher(base_path)).walk()
+
+
+def iter_repo_files(base_path: str, ignore: IgnoreMatcher = None, max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+                    workers: int = DEFAULT_SCAN_WORKERS, on_skip=None, reader=read_text_file):
+    """
+    Streams ``(relative_path, content)`` pairs for every readable text file,
+    reading on a thread pool in walk order.
+
+    Parameters:
+        base_path (str): The root directory of the repository.
+        ignore (IgnoreMatcher): Decides which files and directories are skipped.
+        max_file_size (int): Files larger than this many bytes are skipped.
+        workers (int): Number of reader threads.
+        on_skip (callable): Called with ``(file_path, reason)`` for skipped files.
+        reader (callable): Reads one file as ``reader(file_path, max_file_size)``
+            and returns ``(content, None)`` or ``(None, reason)``.
+
+    Yields:
+        tuple: ``(relative_path, content)`` for each text file.
+    """
+    window = max(1, 4 * workers)
+    in_flight = deque()
+
+    def drain(limit):
+        while len(in_flight) > limit:
+            file_path, future = in_flight.popleft()
+            content, reason = future.result()
+            if content is None:
+                if on_skip is not None:
+                    on_skip(file_path, reason)
+                continue
+            yield os.path.relpath(file_path, base_path), content
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for file_path in walk_repo(base_path, ignore):
+            in_flight.append((file_path, executor.submit(reader, file_path, max_file_size)))
+            yield from drain(window)
+        yield from drain(0)
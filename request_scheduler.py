@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from agent_log import get_logger
+from instrumentation import record_span
+
+# Priority classes, most urgent first: single-file requests a user waits for, and bulk work
+# (directory reviews, pipelines).
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+# Model requests sent to Ollama at once; the others wait in the scheduler's queue. 0 means no limit.
+SLOTS_VAR = "SUPERGIT_SCHEDULER_SLOTS"
+# Seconds a batch request may be held back while batch requests for an already loaded model go first.
+DEFAULT_GROUP_WAIT = float(os.getenv("SUPERGIT_GROUP_WAIT", "10"))
+# Preloaded models are kept loaded while a request came in within the last SUPERGIT_ACTIVE_WINDOW
+# seconds, by loading them again every SUPERGIT_KEEP_ALIVE_REFRESH seconds.
+DEFAULT_ACTIVE_WINDOW = float(os.getenv("SUPERGIT_ACTIVE_WINDOW", "1800"))
+DEFAULT_REFRESH_INTERVAL = float(os.getenv("SUPERGIT_KEEP_ALIVE_REFRESH", "300"))
+# A request whose model took longer than this to load (Ollama's load_duration) counts as a cold start.
+COLD_LOAD_SECONDS = 0.5
+# Latencies kept per priority class for the percentiles.
+LATENCY_SAMPLES = 1000
+
+LOG = get_logger("request_scheduler", "llm_backend.jsonl")
+
+_local = threading.local()
+
+
+def current_priority() -> str:
+    """
+    Returns the priority class of the current thread's model requests.
+    """
+    return getattr(_local, "priority", None) or INTERACTIVE
+
+
+@contextmanager
+def priority(name: str):
+    """
+    Runs the enclosed block's model requests (in the current thread) with
+    the priority class ``name``, e.g. ``with priority(BATCH): ...``.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r}; expected one of {', '.join(PRIORITIES)}")
+    previous = getattr(_local, "priority", None)
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of ``values`` (``q`` between 0 and 100), or None
+    if there are none.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class Ticket:
+    """
+    A request's place in the scheduler, from its arrival until it is
+    released.
+    """
+
+    def __init__(self, scheduler, model: str, priority: str, sequence: int):
+        self.scheduler = scheduler
+        self.model = model
+        self.priority = priority
+        self.sequence = sequence
+        self.arrived = time.perf_counter()
+        self.granted = None
+        self.released = False
+
+    def release(self, response=None) -> None:
+        """
+        Frees the request's slot; ``response`` (the Ollama response or final
+        stream chunk) tells whether the model had to be loaded.
+        """
+        self.scheduler.release(self, response)
+
+
+class RequestScheduler:
+    """
+    Admits model requests to Ollama in priority order, at most ``slots`` at a
+    time, and keeps preloaded models warm.
+    """
+
+    def __init__(self, slots: int, preload=None, group_wait: float = DEFAULT_GROUP_WAIT,
+                 active_window: float = DEFAULT_ACTIVE_WINDOW, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.slots = slots
+        self.preload = preload
+        self.group_wait = group_wait
+        self.active_window = active_window
+        self.refresh_interval = refresh_interval
+        self.condition = threading.Condition()
+        self.waiting = {name: {} for name in PRIORITIES}  # priority -> model -> deque of tickets, oldest first
+        self.running = 0
+        self.running_models = {}  # model -> requests in flight
+        self.last_model = None
+        self.sequence = 0
+        self.switches = 0
+        self.last_activity = 0.0
+        self.models = []
+        self.preloaded = []
+        self.latency = {name: {"requests": 0, "cold_loads": 0, "wait": deque(maxlen=LATENCY_SAMPLES),
+                               "total": deque(maxlen=LATENCY_SAMPLES)} for name in PRIORITIES}
+        self._stop = threading.Event()
+        self._keeper = None
+
+    def _next(self, now: float):
+        for name in PRIORITIES:
+            queues = self.waiting[name]
+            if not queues:
+                continue
+            oldest = min((queue[0] for queue in queues.values()), key=lambda ticket: ticket.sequence)
+            if name != BATCH or now - oldest.arrived >= self.group_wait:
+                return oldest
+            for model in (self.last_model, *self.running_models):
+                if model in queues:
+                    return queues[model][0]
+            return oldest
+        return None
+
+    def acquire(self, model: str, priority: str = None) -> Ticket:
+        """
+        Waits until the request may be sent.
+
+        Parameters:
+            model (str): Model the request is for.
+            priority (str): INTERACTIVE or BATCH; defaults to the thread's
+                (see ``priority``).
+
+        Returns:
+            Ticket: Release it once the response has been received.
+        """
+        name = priority or current_priority()
+        with self.condition:
+            self.sequence += 1
+            ticket = Ticket(self, model, name, self.sequence)
+            self.last_activity = time.monotonic()
+            queue = self.waiting[name].setdefault(model, deque())
+            queue.append(ticket)
+            try:
+                while not ((not self.slots or self.running < self.slots)
+                           and self._next(time.perf_counter()) is ticket):
+                    # Wake up now and then: a held-back batch request may have waited long enough.
+                    self.condition.wait(1.0)
+            finally:
+                queue.remove(ticket)
+                if not queue:
+                    del self.waiting[name][model]
+            ticket.granted = time.perf_counter()
+            self.running += 1
+            self.running_models[model] = self.running_models.get(model, 0) + 1
+            if self.last_model is not None and model != self.last_model:
+                self.switches += 1
+            self.last_model = model
+            # Another slot may still be free for the next request in line.
+            self.condition.notify_all()
+            return ticket
+
+    def release(self, ticket: Ticket, response=None) -> None:
+        """
+        Frees a slot taken by ``acquire`` and records the request's latency.
+        """
+        finished = time.perf_counter()
+        load = getattr(response, "load_duration", None) or 0
+        cold = load / 1e9 >= COLD_LOAD_SECONDS
+        with self.condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            self.running -= 1
+            self.running_models[ticket.model] -= 1
+            if not self.running_models[ticket.model]:
+                del self.running_models[ticket.model]
+            latency = self.latency[ticket.priority]
+            latency["requests"] += 1
+            latency["cold_loads"] += cold
+            latency["wait"].append(ticket.granted - ticket.arrived)
+            latency["total"].append(finished - ticket.arrived)
+            self.condition.notify_all()
+        record_span(f"scheduler.{ticket.priority}", ticket.arrived, finished, model=ticket.model,
+                    wait=round(ticket.granted - ticket.arrived, 6), cold=cold)
+
+    def start(self, models) -> None:
+        """
+        Loads ``models`` in the background, then keeps them loaded while
+        requests keep coming (see ``active_window``). Once the scheduler has
+        been idle for that long they are left to Ollama's keep_alive.
+        """
+        self.models = list(dict.fromkeys(models))
+        if self.preload is None or self._keeper is not None:
+            return
+        self.last_activity = time.monotonic()
+        self._keeper = threading.Thread(target=self._keep_alive_loop, name="keep-alive", daemon=True)
+        self._keeper.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _load(self, model: str) -> bool:
+        try:
+            self.preload(model)
+            return True
+        except Exception as e:
+            LOG.warning(f"Could not preload {model}: {e}")
+            return False
+
+    def _keep_alive_loop(self) -> None:
+        for model in self.models:
+            if self._load(model):
+                self.preloaded.append(model)
+                LOG.info(f"Preloaded {model}")
+        while not self._stop.wait(self.refresh_interval):
+            if time.monotonic() - self.last_activity < self.active_window:
+                for model in self.models:
+                    self._load(model)
+
+    def stats(self) -> dict:
+        """
+        Returns the queue state and, per priority class, the number of
+        requests and cold starts and the p50/p95 queue wait and total
+        latency in seconds.
+        """
+        with self.condition:
+            classes = {}
+            for name, latency in self.latency.items():
+                classes[name] = {
+                    "requests": latency["requests"], "cold_loads": latency["cold_loads"],
+                    "waiting": sum(len(queue) for queue in self.waiting[name].values()),
+                    "wait_p50": percentile(latency["wait"], 50), "wait_p95": percentile(latency["wait"], 95),
+                    "p50": percentile(latency["total"], 50), "p95": percentile(latency["total"], 95),
+                }
+            return {"slots": self.slots, "running": self.running, "model_switches": self.switches,
+                    "preloaded": list(self.preloaded), "classes": classes}
+
+    def summary(self) -> str:
+        """
+        Returns the latency per priority class as one line for the logs.
+        """
+        parts = []
+        for name, entry in self.stats()["classes"].items():
+            if entry["requests"]:
+                parts.append(f"{name}: {entry['requests']} requests, p50 {entry['p50']:.2f}s, p95 {entry['p95']:.2f}s "
+                             f"(queued p95 {entry['wait_p95']:.2f}s), {entry['cold_loads']} cold starts")
+        return "; ".join(parts) or "no model requests"
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.getenv("SUPERGIT_CACHE_PATH", os.path.join(".supergit_cache", "responses.sqlite3"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("SUPERGIT_CACHE_MAX_ENTRIES", "10000"))
+DEFAULT_MAX_BYTES = int(os.getenv("SUPERGIT_CACHE_MAX_MB", "256")) * 1024 * 1024
+# Seconds a cached response stays valid; 0 disables expiry.
+DEFAULT_TTL = float(os.getenv("SUPERGIT_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def request_key(model: str, system: str, prompt: str, options: dict = None) -> str:
+    """
+    Hashes everything that determines a model response into a cache key.
+    """
+    payload = json.dumps(
+        {"model": model, "system": system or "", "prompt": prompt, "options": options or {}},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite cache of model responses with LRU eviction, a size limit, a TTL and
+    hit/miss counters.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        self.db.commit()
+
+    def _count(self, name: str) -> None:
+        self.db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str):
+        """
+        Returns the cached response for ``key``, or None on a miss or when the
+        entry has expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count("misses")
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            self.db.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """
+        Stores a response and evicts least recently used entries over the limits.
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self.db.commit()
+
+    def _evict(self) -> None:
+        if self.ttl:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        count, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        self.db.execute(
+            "INSERT INTO stats (name, value) VALUES ('evictions', ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (evicted,),
+        )
+
+    def stats(self) -> dict:
+        """
+        Returns hit, miss and eviction counters plus the current size.
+        """
+        with self.lock:
+            stats = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+            count, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        return {
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "evictions": stats.get("evictions", 0),
+            "hit_rate": stats.get("hits", 0) / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.execute("DELETE FROM stats")
+            self.db.commit()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """
+    Returns the process-wide response cache of the current project, opening it
+    on first use.
+    """
+    path = os.path.abspath(DEFAULT_CACHE_PATH)
+    with _shared_lock:
+        cache = _shared.get(path)
+        if cache is None:
+            cache = _shared[path] = ResponseCache(path)
+        return cache
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the supergit response cache.")
+    parser.add_argument('command', choices=['stats', 'clear'], help='What to do')
+    parser.add_argument('--path', type=str, default=DEFAULT_CACHE_PATH, help='Cache database file')
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.path)
+    if args.command == 'clear':
+        cache.clear()
+        print(f"Cleared {args.path}")
+    else:
+        for name, value in cache.stats().items():
+            print(f"{name:<10} {value:.2%}" if name == "hit_rate" else f"{name:<10} {value}")
+
+
+if __name__ == "__main__":
+    main()
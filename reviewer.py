@@ -1,22 +1,49 @@
-import ollama
+if __name__ == "__main__":
+    # Fast path: let a running supergitd (see supergitd.py) do the work, before paying for the imports below.
+    import daemon_client
+    daemon_client.forward("reviewer")
+
 import argparse
 import os
+import glob
+import fnmatch
 import datetime
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def log_message(message):
-    """
-    Logs a message with a timestamp to the review log file.
-    """
-    log_folder = os.path.join(os.getcwd(), "logs")
-    os.makedirs(log_folder, exist_ok=True)
+import llm_backend
+import artifact_index
+import instrumentation
+import static_review
+from agent_log import get_logger
+from gitignore import IgnoreMatcher
+from instrumentation import timed
+from request_scheduler import priority, BATCH
+from context_builder import fit_code_to_budget, DEFAULT_TOKEN_BUDGET
+from stream_output import stream_to_file, format_stream_stats
 
-    log_file = os.path.join(log_folder, "review_log.txt")
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+REVIEW_ERROR = "Error in code review process."
+SYSTEM_PROMPT = (
+    "You are an expert code reviewer who reviews the code and checks for any linting errors, "
+    "boundary conditions that may cause runtime errors,also state the need to establish necessary try-catch-except blocks "
+    "to handle errors. You need to output a code report with review of code and feedback verbose on quality and robustness against boundary cases or wrong inputs of the code with explanation."
+    "if you find promblems then mention that part of the code and give the reason why it is a problem. "
+    "start the review with 'Code Review Report by supergit_reviewer:' and end with 'End of Review Report'."
+)
+# Bump when SYSTEM_PROMPT or the review prompts change so indexed reports are not reused.
+REVIEW_PROMPT_VERSION = "1"
+# Skipped by --dir in addition to the directory's .gitignore files (gitignore syntax).
+IGNORE_PATTERNS = ('__pycache__/', 'venv/', '.venv/', 'node_modules/', '.supergit_cache/',
+                   '/reviews/', '/optim/', '/logs/')
+DEFAULT_WORKERS = 4
+# Run the static pre-pass on Python files before (and possibly instead of) the model review.
+STATIC_ENABLED = True
 
-    with open(log_file, "a", encoding="utf-8") as log:
-        log.write(f"[{timestamp}] {message}\n")
-    print(f"[{timestamp}] {message}")
+LOG = get_logger("reviewer", "review_log.jsonl")
+log_message = LOG.info
 
+@timed("reviewer.read_file")
 def read_code_from_file(file_path):
     """
     Reads the content of the given file.
@@ -26,58 +53,208 @@ def read_code_from_file(file_path):
             code = file.read()
         log_message(f"Successfully read code from: {file_path}")
         if not code.strip():
-            log_message("Warning: The file is empty.")
+            LOG.warning("The file is empty.")
             return None
         else:
-            log_message("Code successfully read.")
-            log_message(f"Code content:\n{code}")
+            log_message(f"Code successfully read ({len(code.splitlines())} lines).")
         return code
     except Exception as e:
-        log_message(f"Failed to read file: {e}")
+        LOG.error(f"Failed to read file: {e}")
         return None
 
-def review_code(code_content):
+@timed("reviewer.static")
+def static_pre_pass(code_content, file_path=None):
     """
-    Sends the code to Ollama for review.
+    Runs the static checks on a Python file.
+
+    Returns:
+        StaticReport: The findings and review decision, or None for other
+        languages or when the pre-pass is disabled.
     """
-    client = ollama.Client()
-    model = 'qwen2.5-coder:0.5b'
-    system_prompt = (
-        "You are an expert code reviewer who reviews the code and checks for any linting errors, "
-        "boundary conditions that may cause runtime errors,also state the need to establish necessary try-catch-except blocks "
-        "to handle errors. You need to output a code report with review of code and feedback verbose on quality and robustness against boundary cases or wrong inputs of the code with explanation."
-        "if you find promblems then mention that part of the code and give the reason why it is a problem. "
-        "start the review with 'Code Review Report by supergit_reviewer:' and end with 'End of Review Report'."
-    )
+    if not STATIC_ENABLED or not file_path or not file_path.endswith(".py"):
+        return None
+    report = static_review.analyze(code_content, file_path)
+    log_message(f"Static pre-pass: {len(report.findings)} findings, "
+                + ("model review skipped" if not report.needs_model else
+                   "whole file to review" if report.whole_file else f"{len(report.regions)} regions to review"))
+    return report
 
-    prompt = f"Please review the following code and give review report:\n\n```{code_content}```"
+def merge_reports(static, review_text):
+    """
+    Puts the static findings ahead of the model's review.
+    """
+    if static is None:
+        return review_text
+    return static_review.format_report(static) + "\n" + review_text
+
+@timed("reviewer.build_prompt")
+def build_review_prompt(code_content, token_budget=DEFAULT_TOKEN_BUDGET, static=None):
+    """
+    Builds the review prompt for the code: the regions a static report selected,
+    and a ranked skeleton of code over ``token_budget``.
+    """
+    if static is not None and not static.whole_file:
+        findings = "\n".join(f"- {finding}" for finding in static.findings) or "- none"
+        regions = static_review.regions_text(code_content, static)
+        return (
+            "Static analysis selected the following parts of a larger file for review; line numbers refer to the "
+            "full file. These problems were already reported, do not repeat them:\n"
+            f"{findings}\n\nPlease review the code and give review report:\n\n```{regions}```"
+        )
+    code_content, reduced = fit_code_to_budget(code_content, token_budget)
+    if reduced:
+        log_message(f"Code exceeds the {token_budget}-token budget; sending its skeleton for review.")
+        prompt = (
+            "The following code was too large to send in full; function bodies were elided. "
+            "Please review its structure and interfaces and give review report:\n\n"
+            f"```{code_content}```"
+        )
+    else:
+        prompt = f"Please review the following code and give review report:\n\n```{code_content}```"
+    return prompt
+
+@timed("reviewer.review")
+def review_code(code_content, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None, file_path=None):
+    """
+    Sends the code to Ollama for review, after the static pre-pass for Python
+    files.
+    """
+    static = static_pre_pass(code_content, file_path)
+    if static is not None and not static.needs_model:
+        return merge_reports(static, "")
+    prompt = build_review_prompt(code_content, token_budget, static)
 
     log_message("Sending code for review to supergit reviewer...")
 
     try:
-        response = client.generate(
-            model=model,
-            prompt=prompt,
-            system=system_prompt,
-            stream=False
-        )
+        response = llm_backend.generate(prompt, SYSTEM_PROMPT, agent="reviewer", model=model, host=host)
         log_message("Review received successfully.")
-        return response.response.strip()
+        return merge_reports(static, response.response.strip())
     except Exception as e:
-        log_message(f"Failed to get review from supergit reviewer: {e}")
-        return "Error in code review process."
+        LOG.error(f"Failed to get review from supergit reviewer: {e}")
+        return REVIEW_ERROR
 
-def save_review(review_text, original_file):
+def new_review_path(original_file):
     """
-    Saves the review to a .txt file in the 'reviews' folder.
+    Returns the path of a new review report for the given file.
     """
     reviews_folder = os.path.join(os.getcwd(), "reviews")
-    os.makedirs(reviews_folder, exist_ok=True)
-
     base_name = os.path.basename(original_file)
     name_without_ext = os.path.splitext(base_name)[0]
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    review_file_path = os.path.join(reviews_folder, f"{name_without_ext}_review_{timestamp}.txt")
+    return os.path.join(reviews_folder, f"{name_without_ext}_review_{timestamp}.txt")
+
+def review_version(token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Identifies everything besides the code and the model that shapes a
+    review, for the artifact index.
+    """
+    return f"{REVIEW_PROMPT_VERSION}:budget={token_budget}:static={int(STATIC_ENABLED)}"
+
+def indexed_review(code_content, token_budget=DEFAULT_TOKEN_BUDGET, model=None):
+    """
+    Looks up a review of the same code by the same model and prompt in the
+    artifact index.
+
+    Returns:
+        artifact_index.Artifact: The stored review, or None if there is none
+        or caching is disabled.
+    """
+    if not llm_backend.CACHE_ENABLED:
+        return None
+    try:
+        return artifact_index.get_index().lookup("review", artifact_index.source_hash(code_content),
+                                                 model or llm_backend.model_for("reviewer"), review_version(token_budget))
+    except Exception as e:
+        LOG.warning(f"Artifact index lookup failed: {e}")
+        return None
+
+def index_review(code_content, file_path, review_text, report_path, token_budget=DEFAULT_TOKEN_BUDGET, model=None):
+    """
+    Records a saved review in the artifact index. Failed reviews are not
+    recorded.
+    """
+    if report_path is None or review_text == REVIEW_ERROR:
+        return
+    try:
+        artifact_index.get_index().record("review", file_path, artifact_index.source_hash(code_content),
+                                          model or llm_backend.model_for("reviewer"), review_version(token_budget),
+                                          review_text, report_path)
+    except Exception as e:
+        LOG.warning(f"Failed to index review: {e}")
+
+def reuse_review(artifact, code_content, file_path, original_file, token_budget=DEFAULT_TOKEN_BUDGET, model=None):
+    """
+    Returns the report file of an indexed review, writing the stored text
+    to a new report if the old file was deleted.
+    """
+    if artifact.path and os.path.exists(artifact.path):
+        log_message(f"Already reviewed (same content, model and prompt); report at: {artifact.path}")
+        return artifact.path
+    report_path = save_review(artifact.text, original_file)
+    index_review(code_content, file_path, artifact.text, report_path, token_budget, model)
+    return report_path
+
+def review_file(code_content, file_path, original_file, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None):
+    """
+    Reviews a file and saves the report, unless the artifact index already
+    has a review of the same content.
+
+    Returns:
+        tuple: ``(report_path, status)`` with status "reviewed", "indexed"
+        or "failed".
+    """
+    stored = indexed_review(code_content, token_budget, model)
+    if stored is not None:
+        report = reuse_review(stored, code_content, file_path, original_file, token_budget, model)
+        return report, "indexed" if report else "failed"
+    review = review_code(code_content, token_budget, model, host, file_path)
+    report = save_review(review, original_file)
+    index_review(code_content, file_path, review, report, token_budget, model)
+    return report, "failed" if review == REVIEW_ERROR or report is None else "reviewed"
+
+@timed("reviewer.stream")
+def stream_review(code_content, original_file, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None):
+    """
+    Streams the review to the console and into its report file as tokens arrive.
+
+    Returns:
+        str: Path of the saved report, or None on failure.
+    """
+    source_file = original_file[:-len(".txt")] if original_file.endswith(".txt") else original_file
+    stored = indexed_review(code_content, token_budget, model)
+    if stored is not None:
+        print(stored.text, flush=True)
+        return reuse_review(stored, code_content, source_file, original_file, token_budget, model)
+    static = static_pre_pass(code_content, source_file)
+    report_path = new_review_path(original_file)
+    if static is not None and not static.needs_model:
+        text = stream_to_file([merge_reports(static, "")], report_path)
+        index_review(code_content, source_file, text, report_path, token_budget, model)
+        log_message(f"Review saved at: {report_path}")
+        return report_path
+    prompt = build_review_prompt(code_content, token_budget, static)
+
+    log_message("Streaming code review from supergit reviewer...")
+    try:
+        tokens = llm_backend.stream_generate(prompt, SYSTEM_PROMPT, agent="reviewer", model=model, host=host)
+        header = [merge_reports(static, "")] if static is not None else []
+        text = stream_to_file(itertools.chain(header, tokens), report_path)
+        index_review(code_content, source_file, text, report_path, token_budget, model)
+        log_message(f"Review streamed: {format_stream_stats(tokens.stats())}")
+        log_message(f"Review saved at: {report_path}")
+        return report_path
+    except Exception as e:
+        LOG.error(f"Failed to stream review from supergit reviewer: {e}")
+        return None
+
+@timed("reviewer.save")
+def save_review(review_text, original_file):
+    """
+    Saves the review to a .txt file in the 'reviews' folder.
+    """
+    review_file_path = new_review_path(original_file)
+    os.makedirs(os.path.dirname(review_file_path), exist_ok=True)
 
     try:
         with open(review_file_path, "w", encoding="utf-8") as f:
@@ -85,22 +262,132 @@ def save_review(review_text, original_file):
         log_message(f"Review saved at: {review_file_path}")
         return review_file_path
     except Exception as e:
-        log_message(f"Failed to save review: {e}")
+        LOG.error(f"Failed to save review: {e}")
+        return None
+
+def collect_files(directory=None, pattern="*.py", glob_pattern=None):
+    """
+    Lists the files to review: the non-ignored files under ``directory``
+    matching ``pattern``, or the files matching ``glob_pattern``.
+    """
+    if glob_pattern:
+        return sorted(path for path in glob.glob(glob_pattern, recursive=True) if os.path.isfile(path))
+
+    matcher = IgnoreMatcher(directory, IGNORE_PATTERNS)
+    # The matcher yields absolute paths; keep them relative to ``directory`` as given.
+    return sorted(os.path.join(directory, os.path.relpath(path, matcher.root))
+                  for path in matcher.walk() if fnmatch.fnmatch(os.path.basename(path), pattern))
+
+def review_files(files, workers=DEFAULT_WORKERS, token_budget=DEFAULT_TOKEN_BUDGET, model=None, host=None, base_dir=None):
+    """
+    Reviews many files in one process with a bounded pool of concurrent
+    model requests, sent as batch work so interactive requests go first.
+
+    Returns:
+        list: One dict per file, in the order of ``files``, with the keys
+        ``file``, ``report`` (path or None) and ``status``.
+    """
+    total = len(files)
+    done = [0]
+    progress_lock = threading.Lock()
+
+    def review_one(file_path):
+        code = read_code_from_file(file_path)
+        if not code:
+            result = {"file": file_path, "report": None, "status": "skipped"}
+        else:
+            # Name reports after the path relative to the batch root so equal basenames do not collide.
+            name = os.path.relpath(file_path, base_dir) if base_dir else file_path
+            with priority(BATCH):
+                report, status = review_file(code, file_path, name.replace(os.sep, "__").lstrip("._") + ".txt",
+                                             token_budget, model, host)
+            result = {"file": file_path, "report": report, "status": status}
+        with progress_lock:
+            done[0] += 1
+            print(f"[{done[0]}/{total}] {result['status']}: {file_path}", flush=True)
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(review_one, files))
+
+def write_review_index(results):
+    """
+    Writes a Markdown index of a batch run to the 'reviews' folder.
+    """
+    reviews_folder = os.path.join(os.getcwd(), "reviews")
+    os.makedirs(reviews_folder, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    index_path = os.path.join(reviews_folder, f"index_{timestamp}.md")
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    lines = [
+        f"# Review index {timestamp}\n\n",
+        ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) + "\n\n",
+        "| File | Status | Report |\n",
+        "| --- | --- | --- |\n",
+    ]
+    for result in results:
+        report = os.path.relpath(result["report"], reviews_folder) if result["report"] else ""
+        lines.append(f"| {result['file']} | {result['status']} | {report} |\n")
+
+    try:
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        log_message(f"Review index saved at: {index_path}")
+        return index_path
+    except Exception as e:
+        LOG.error(f"Failed to save review index: {e}")
         return None
 
 def main():
+    global STATIC_ENABLED
     parser = argparse.ArgumentParser(description="Code Reviewer using supergit reiewer.")
-    parser.add_argument('--file', '-f', type=str, required=True, help='Path to the code file to review')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', '-f', type=str, help='Path to the code file to review')
+    source.add_argument('--dir', '-d', type=str, help='Review every matching file under this directory')
+    source.add_argument('--glob', '-g', type=str, help='Review every file matching this glob (supports **)')
+    parser.add_argument('--pattern', type=str, default="*.py", help='File name pattern used with --dir')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help='Maximum number of concurrent review requests in batch mode'
+                             ' (also capped by SUPERGIT_SCHEDULER_SLOTS or the host pool, if set)')
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help='Maximum prompt tokens for the code; larger files are reviewed as a skeleton')
+    parser.add_argument('--model', type=str, default=None, help='Ollama model (default: SUPERGIT_REVIEWER_MODEL or SUPERGIT_MODEL)')
+    parser.add_argument('--host', type=str, default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache and the artifact index and always call the model')
+    parser.add_argument('--no-static', action='store_true',
+                        help='Skip the static pre-pass and always send the whole file to the model')
+    parser.add_argument('--stream', '-s', action='store_true',
+                        help='Stream the review to the console and report file as it is generated (single file only)')
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args()
+    instrumentation.configure(args, "reviewer")
+    if args.no_cache:
+        llm_backend.CACHE_ENABLED = False
+    if args.no_static:
+        STATIC_ENABLED = False
+
+    if args.dir or args.glob:
+        files = collect_files(args.dir, args.pattern, args.glob)
+        log_message(f"Starting batch code review of {len(files)} files with {args.workers} workers.")
+        results = review_files(files, args.workers, args.token_budget, args.model, args.host, base_dir=args.dir)
+        write_review_index(results)
+        log_message(f"Model request latency: {llm_backend.get_scheduler().summary()}")
+        log_message("Batch code review job completed.")
+        return
+
     file_path = args.file 
 
     log_message("Starting code review job.")
     code = read_code_from_file(file_path)
 
-    if code:
-        review = review_code(code)
-        save_review(review, file_path + '.txt')
+    if code and args.stream:
+        stream_review(code, file_path + '.txt', args.token_budget, args.model, args.host)
+    elif code:
+        review_file(code, file_path, file_path + '.txt', args.token_budget, args.model, args.host)
     else:
         log_message("No code content to review.")
 
@@ -0,0 +1,286 @@
+import ast
+
+# Functions at or above this cyclomatic complexity are reported.
+COMPLEXITY_LIMIT = 10
+# A function is sent to the model when it has findings, reaches this complexity or is this long.
+REVIEW_COMPLEXITY = 3
+REVIEW_MIN_LINES = 8
+# Files without functions or classes and fewer code lines than this are not sent to the model.
+TRIVIAL_LINES = 15
+# When the selected regions cover this share of the file, the whole file is sent instead.
+WHOLE_FILE_SHARE = 0.8
+
+IO_FUNCTIONS = {"open", "urlopen"}
+IO_MODULES = {
+    "os": {"remove", "unlink", "rename", "replace", "makedirs", "mkdir", "rmdir", "removedirs", "listdir",
+           "scandir", "stat", "chmod", "chown"},
+    "shutil": {"copy", "copy2", "copyfile", "copytree", "move", "rmtree"},
+    "subprocess": {"run", "call", "check_call", "check_output", "Popen"},
+    "requests": {"get", "post", "put", "patch", "delete", "head", "request"},
+    "httpx": {"get", "post", "put", "patch", "delete", "head", "request"},
+    "json": {"load"},
+    "socket": {"create_connection", "socket"},
+}
+IO_METHODS = {"read_text", "write_text", "read_bytes", "write_bytes", "urlopen"}
+BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert,
+                ast.comprehension)
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class Finding:
+    """
+    One deterministic problem found without the model.
+    """
+
+    def __init__(self, line: int, kind: str, message: str):
+        self.line = line
+        self.kind = kind
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}: [{self.kind}] {self.message}"
+
+
+class StaticReport:
+    """
+    Result of the static pre-pass: findings, per-function metrics, whether
+    the model should review the file at all and which regions to send.
+    """
+
+    def __init__(self):
+        self.syntax_error = None
+        self.findings = []
+        self.functions = []  # dicts with name, start, end, lines, complexity
+        self.regions = []  # (start, end, label) line ranges to send to the model
+        self.whole_file = False
+        self.needs_model = True
+        self.reason = ""
+
+
+def complexity(node) -> int:
+    """
+    McCabe cyclomatic complexity of a function, not counting nested
+    functions and classes.
+    """
+    score = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, FUNCTION_NODES + (ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(child, BRANCH_NODES):
+            score += 1
+            if isinstance(child, ast.comprehension):
+                score += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            score += len(child.values) - 1
+        elif isinstance(child, ast.match_case):
+            score += 1
+        stack.extend(ast.iter_child_nodes(child))
+    return score
+
+
+def _parents(tree) -> dict:
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return parents
+
+
+def _io_call_name(call: ast.Call):
+    func = call.func
+    if isinstance(func, ast.Name) and func.id in IO_FUNCTIONS:
+        return func.id
+    if isinstance(func, ast.Attribute):
+        if isinstance(func.value, ast.Name) and func.attr in IO_MODULES.get(func.value.id, ()):
+            return f"{func.value.id}.{func.attr}"
+        if func.attr in IO_METHODS:
+            return func.attr
+    return None
+
+
+def _guarded(node, parents) -> bool:
+    """
+    Tells whether ``node`` sits in the body of a try statement with except
+    handlers, within the same function.
+    """
+    child, parent = node, parents.get(node)
+    while parent is not None and not isinstance(parent, FUNCTION_NODES):
+        if isinstance(parent, ast.Try) and parent.handlers and child in parent.body:
+            return True
+        child, parent = parent, parents.get(parent)
+    return False
+
+
+def _unused_imports(tree, file_name: str) -> list:
+    if file_name.endswith("__init__.py"):
+        return []  # imports there are usually re-exports
+    imported = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    imported[(alias.asname or alias.name).split(".")[0]] = node.lineno
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    for node in tree.body:
+        # Names listed in __all__ count as used.
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+            used.update(elt.value for elt in getattr(node.value, "elts", []) if isinstance(elt, ast.Constant))
+    return [Finding(line, "unused-import", f"'{name}' is imported but never used")
+            for name, line in imported.items() if name not in used]
+
+
+def _unused_locals(function) -> list:
+    assigned, loaded, declared = {}, set(), set()
+    stack = list(function.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Store):
+                assigned.setdefault(node.id, node.lineno)
+            else:
+                loaded.add(node.id)
+        if isinstance(node, FUNCTION_NODES + (ast.ClassDef,)):
+            # Nested scopes may read the variable; count their loads but not their assignments.
+            loaded.update(n.id for n in ast.walk(node) if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Store))
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return [Finding(line, "unused-variable", f"local variable '{name}' in {function.name}() is assigned but never used")
+            for name, line in assigned.items()
+            if name not in loaded and name not in declared and not name.startswith("_")]
+
+
+def analyze(code: str, file_name: str = "<code>") -> StaticReport:
+    """
+    Runs the static checks on Python source and decides what the model should
+    see.
+
+    Parameters:
+        code (str): Python source code.
+        file_name (str): Name used in messages.
+
+    Returns:
+        StaticReport: Findings, metrics and the review decision.
+    """
+    report = StaticReport()
+    try:
+        tree = ast.parse(code, file_name)
+    except SyntaxError as e:
+        report.syntax_error = Finding(e.lineno or 0, "syntax-error", e.msg)
+        report.findings.append(report.syntax_error)
+        report.needs_model = False
+        report.reason = "the file does not parse; fix the syntax error first"
+        return report
+
+    parents = _parents(tree)
+    report.findings.extend(_unused_imports(tree, file_name))
+    io_lines = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler):
+            if node.type is None:
+                report.findings.append(Finding(node.lineno, "bare-except",
+                                               "bare 'except:' also catches KeyboardInterrupt and SystemExit; "
+                                               "catch specific exceptions"))
+            if all(isinstance(statement, ast.Pass) for statement in node.body):
+                report.findings.append(Finding(node.lineno, "swallowed-exception",
+                                               "exception is silently ignored"))
+        elif isinstance(node, ast.Call):
+            name = _io_call_name(node)
+            if name and node.lineno not in io_lines and not _guarded(node, parents):
+                io_lines.add(node.lineno)
+                report.findings.append(Finding(node.lineno, "unhandled-io",
+                                               f"{name}() can fail at runtime but is not inside a try/except"))
+        elif isinstance(node, FUNCTION_NODES):
+            report.findings.extend(_unused_locals(node))
+            score = complexity(node)
+            report.functions.append({"name": node.name, "start": node.lineno, "end": node.end_lineno,
+                                     "lines": node.end_lineno - node.lineno + 1, "complexity": score})
+            if score >= COMPLEXITY_LIMIT:
+                report.findings.append(Finding(node.lineno, "complexity",
+                                               f"{node.name}() has cyclomatic complexity {score} "
+                                               f"(limit {COMPLEXITY_LIMIT}); consider splitting it"))
+    report.findings.sort(key=lambda finding: finding.line)
+    _select_regions(report, tree, code)
+    return report
+
+
+def _select_regions(report: StaticReport, tree, code: str) -> None:
+    lines = code.splitlines()
+    code_lines = sum(1 for line in lines if line.strip() and not line.strip().startswith("#"))
+    definitions = [node for node in tree.body if isinstance(node, FUNCTION_NODES + (ast.ClassDef,))]
+    if not definitions and code_lines < TRIVIAL_LINES and not report.findings:
+        report.needs_model = False
+        report.reason = f"trivial file ({code_lines} lines of code, no functions or classes)"
+        return
+
+    metrics = {(item["name"], item["start"]): item for item in report.functions}
+    finding_lines = [finding.line for finding in report.findings]
+    covered = set()
+    for node in definitions:
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        inner = [metrics[(n.name, n.lineno)] for n in ast.walk(node) if isinstance(n, FUNCTION_NODES)]
+        has_findings = any(start <= line <= node.end_lineno for line in finding_lines)
+        if has_findings or any(item["complexity"] >= REVIEW_COMPLEXITY or item["lines"] >= REVIEW_MIN_LINES
+                               for item in inner):
+            kind = "class" if isinstance(node, ast.ClassDef) else "function"
+            report.regions.append((start, node.end_lineno, f"{kind} {node.name}"))
+            covered.update(range(start, node.end_lineno + 1))
+    loose = sorted(line for line in finding_lines if line not in covered)
+    if loose:
+        # Module-level code with findings is sent as a few lines of context around each finding.
+        for line in loose:
+            report.regions.append((max(1, line - 3), min(len(lines), line + 3), "module-level code"))
+    report.regions.sort()
+
+    if not report.regions:
+        report.needs_model = False
+        report.reason = "all functions are short and simple and no problems were found"
+        return
+    selected = set()
+    for start, end, _ in report.regions:
+        selected.update(range(start, end + 1))
+    report.whole_file = len(selected) >= WHOLE_FILE_SHARE * max(1, len(lines))
+
+
+def regions_text(code: str, report: StaticReport) -> str:
+    """
+    Returns the selected regions of ``code``, each headed by its line range,
+    or the whole code when the regions cover most of it.
+    """
+    if report.whole_file:
+        return code
+    lines = code.splitlines()
+    parts = []
+    for start, end, label in report.regions:
+        parts.append(f"# lines {start}-{end}: {label}\n" + "\n".join(lines[start - 1:end]))
+    return "\n\n".join(parts)
+
+
+def format_report(report: StaticReport) -> str:
+    """
+    Formats the findings and complexity metrics as a plain-text report section.
+    """
+    lines = ["Static analysis by supergit_reviewer (deterministic checks):"]
+    if report.findings:
+        lines.extend(f"- {finding}" for finding in report.findings)
+    else:
+        lines.append("- no problems found")
+    if report.functions:
+        lines.append("")
+        lines.append("Most complex functions (cyclomatic complexity, length):")
+        for item in sorted(report.functions, key=lambda item: -item["complexity"])[:10]:
+            lines.append(f"- {item['name']}() at line {item['start']}: complexity {item['complexity']}, "
+                         f"{item['lines']} lines")
+    if not report.needs_model:
+        lines.append("")
+        lines.append(f"Model review skipped: {report.reason}.")
+    elif not report.whole_file:
+        lines.append("")
+        lines.append("Model review covers: " + ", ".join(f"{label} (lines {start}-{end})"
+                                                       for start, end, label in report.regions) + ".")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+import os
+import sys
+
+
+def stream_to_file(pieces, file_path: str, echo: bool = True) -> str:
+    """
+    Writes streamed text to ``<file_path>.partial`` as it arrives and renames it
+    over ``file_path`` once the stream ends.
+
+    Parameters:
+        pieces (iterable): Text pieces, e.g. an ``llm_backend.TokenStream``.
+        file_path (str): Final path of the output file.
+        echo (bool): Also write the pieces to stdout.
+
+    Returns:
+        str: The complete text that was written.
+    """
+    folder = os.path.dirname(file_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    partial_path = file_path + ".partial"
+    parts = []
+    try:
+        with open(partial_path, "w", encoding="utf-8") as f:
+            for piece in pieces:
+                parts.append(piece)
+                f.write(piece)
+                f.flush()
+                if echo:
+                    sys.stdout.write(piece)
+                    sys.stdout.flush()
+        os.replace(partial_path, file_path)
+    except BaseException:
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        if echo:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+    return "".join(parts)
+
+
+def format_stream_stats(stats: dict) -> str:
+    """
+    Formats ``TokenStream.stats()`` for a log line.
+    """
+    ttft = f"{stats['ttft'] * 1000:.0f} ms" if stats.get("ttft") is not None else "n/a"
+    rate = f"{stats['tokens_per_sec']:.1f} tokens/s" if stats.get("tokens_per_sec") else "n/a"
+    if stats.get("cached"):
+        return f"served from cache in {stats['total'] * 1000:.0f} ms"
+    return f"time to first token {ttft}, {stats['tokens']} tokens in {stats['total']:.2f} s ({rate})"
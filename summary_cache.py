@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+
+DEFAULT_CACHE_DIR = ".doc_cache"
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def content_key(content: str, model: str, prompt_version: str) -> str:
+    """
+    Builds the cache key for a piece of content.
+
+    Parameters:
+        content (str): File content (or any text the summary was built from).
+        model (str): Name of the model that produced the summary.
+        prompt_version (str): Version tag of the prompt used for the summary.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the (content, model, prompt) triple.
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8") + b"\0")
+    digest.update(prompt_version.encode("utf-8") + b"\0")
+    digest.update(content.encode("utf-8", errors="surrogatepass"))
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent on-disk cache of per-file summaries keyed by content hash.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, model: str = "", prompt_version: str = "1",
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.summaries_dir = os.path.join(cache_dir, "summaries")
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.entries = {}
+        self.paths = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.entries = index.get("entries", {})
+            self.paths = index.get("paths", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable summary cache index: {e}")
+
+    def key_for(self, content: str) -> str:
+        return content_key(content, self.model, self.prompt_version)
+
+    def _read(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.summaries_dir, f"{key}.md"), "r", encoding="utf-8") as f:
+                summary = f.read()
+        except OSError:
+            self.entries.pop(key, None)
+            return None
+        entry["last_used"] = time.time()
+        return summary
+
+    def get(self, path: str, content: str):
+        """
+        Returns the cached summary for the given content, or None on a miss.
+        """
+        key = self.key_for(content)
+        summary = self._read(key)
+        if summary is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.paths[path] = key
+        return summary
+
+    def get_by_path(self, path: str):
+        """
+        Returns the summary last stored for a path without reading the file.
+        """
+        key = self.paths.get(path)
+        if key is None:
+            return None
+        summary = self._read(key)
+        if summary is None:
+            self.paths.pop(path, None)
+        return summary
+
+    def put(self, path: str, content: str, summary: str) -> str:
+        """
+        Stores a summary for the given content and records it as the current
+        summary of ``path``.
+
+        Returns:
+            str: The cache key of the stored entry.
+        """
+        key = self.key_for(content)
+        self.store(path, key, summary)
+        return key
+
+    def store(self, path: str, key: str, summary: str) -> None:
+        """
+        Stores a summary under a precomputed key, so callers need not keep the
+        content around until the summary is ready.
+        """
+        self._write(key, summary)
+        self.paths[path] = key
+
+    def _write(self, key: str, summary: str) -> None:
+        os.makedirs(self.summaries_dir, exist_ok=True)
+        with open(os.path.join(self.summaries_dir, f"{key}.md"), "w", encoding="utf-8") as f:
+            f.write(summary)
+        self.entries[key] = {"size": len(summary.encode("utf-8")), "last_used": time.time()}
+
+    def forget_paths(self, live_paths) -> None:
+        """
+        Drops path mappings for files that no longer exist in the repository.
+        """
+        live_paths = set(live_paths)
+        for path in list(self.paths):
+            if path not in live_paths:
+                del self.paths[path]
+
+    def prune(self, keep_keys=()) -> int:
+        """
+        Evicts entries no repository path refers to (unless in ``keep_keys``),
+        then the least recently used ones until the limits hold.
+
+        Returns:
+            int: Number of evicted entries.
+        """
+        protected = set(self.paths.values()) | set(keep_keys)
+        evicted = [key for key in self.entries if key not in protected]
+
+        remaining = sorted(
+            (key for key in self.entries if key in protected),
+            key=lambda k: self.entries[k]["last_used"],
+        )
+        total_bytes = sum(self.entries[k]["size"] for k in remaining)
+        while remaining and (len(remaining) > self.max_entries or total_bytes > self.max_bytes):
+            key = remaining.pop(0)
+            total_bytes -= self.entries[key]["size"]
+            evicted.append(key)
+
+        for key in evicted:
+            self.entries.pop(key, None)
+            try:
+                os.remove(os.path.join(self.summaries_dir, f"{key}.md"))
+            except OSError:
+                pass
+        evicted_set = set(evicted)
+        self.paths = {p: k for p, k in self.paths.items() if k not in evicted_set}
+        return len(evicted)
+
+    def save(self) -> None:
+        """
+        Writes the index atomically so an interrupted run never corrupts it.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries, "paths": self.paths}, f)
+        os.replace(tmp_file, self.index_file)
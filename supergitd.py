@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import traceback
+import subprocess
+import socketserver
+import importlib.util
+
+import agent_log
+import daemon_client
+import instrumentation
+import llm_backend
+from agent_log import get_logger
+
+LOG = get_logger("supergitd")
+log_message = LOG.info
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# CLI name -> script; each script's main() is run in-process for its thin client.
+TOOLS = {
+    "coder": "coder.py",
+    "reviewer": "reviewer.py",
+    "optimizer": "optimizer.py",
+    "pipeline": "pipeline.py",
+    "doc-keeper": "doc-keeper.py",
+}
+# Agents whose models are loaded into Ollama when the daemon starts and kept loaded while it is in use.
+PRELOAD_AGENTS = ("coder", "reviewer", "optimizer")
+START_TIMEOUT = 30.0
+
+
+class ClientStream:
+    """
+    File-like object that sends everything written to it to a thin client as
+    ``{"out": ...}`` or ``{"err": ...}`` lines.
+    """
+
+    def __init__(self, connection, kind: str, lock: threading.Lock):
+        self.connection = connection
+        self.kind = kind
+        self.lock = lock
+        self.encoding = "utf-8"
+        self.lost = False
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.lost:
+            raise BrokenPipeError("supergitd client disconnected")
+        try:
+            with self.lock:
+                self.connection.write(json.dumps({self.kind: text}).encode("utf-8") + b"\n")
+                self.connection.flush()
+        except OSError:
+            self.lost = True
+            raise
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+    def writable(self) -> bool:
+        return True
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """
+    Serves one connection: a control command (``status``, ``stop``) or a
+    tool run for a thin client.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        message = json.loads(line)
+        command = message.get("command")
+        if command == "status":
+            self.reply(self.server.status())
+        elif command == "stop":
+            self.reply({"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self.server.run_tool(message, self)
+
+    def reply(self, message: dict) -> None:
+        try:
+            self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        except OSError:
+            pass
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server that keeps the agents loaded and runs the CLIs'
+    ``main()`` functions for their thin clients, one at a time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, modules: dict):
+        super().__init__(path, Handler)
+        self.path = path
+        self.modules = modules
+        self.environment = daemon_client.environment()
+        self.busy = threading.Lock()
+        self.current = None
+        self.started = time.time()
+        self.runs = 0
+        self.declined = 0
+
+    def status(self) -> dict:
+        return {"pid": os.getpid(), "socket": self.path, "uptime": round(time.time() - self.started, 1),
+                "runs": self.runs, "declined": self.declined, "running": self.current,
+                "tools": sorted(self.modules), "scheduler": llm_backend.get_scheduler().stats()}
+
+    def run_tool(self, message: dict, handler: Handler) -> None:
+        tool = message.get("tool")
+        module = self.modules.get(tool)
+        if module is None:
+            reason = f"{tool} is not loaded in the daemon"
+        elif message.get("env") != self.environment:
+            reason = "the client's SUPERGIT_/OLLAMA_/GEMINI_ settings differ from the daemon's"
+        elif not self.busy.acquire(blocking=False):
+            reason = f"busy running {self.current}"
+        else:
+            reason = None
+        if reason:
+            self.declined += 1
+            handler.reply({"fallback": reason})
+            return
+
+        try:
+            self.current = tool
+            started = time.perf_counter()
+            code = self._run(tool, module, message, handler.wfile)
+            self.runs += 1
+        finally:
+            self.current = None
+            self.busy.release()
+        handler.reply({"exit": code})
+        log_message(f"{tool} {' '.join(message.get('argv', []))} in {message.get('cwd')}: exit {code} "
+                    f"after {time.perf_counter() - started:.2f}s")
+
+    def _run(self, tool: str, module, message: dict, connection) -> int:
+        """
+        Runs ``module.main()`` as the client's command line would, and
+        restores the process state afterwards.
+        """
+        lock = threading.Lock()
+        abandoned = None
+        saved = {m: dict(vars(m)) for m in (llm_backend, module)}
+        state = (os.getcwd(), sys.argv, sys.stdout, sys.stderr)
+        try:
+            os.chdir(message["cwd"])
+            agent_log.rebind()
+            sys.argv = [os.path.join(ROOT, TOOLS[tool])] + list(message.get("argv", []))
+            sys.stdout = ClientStream(connection, "out", lock)
+            sys.stderr = ClientStream(connection, "err", lock)
+            code = 0
+            try:
+                module.main()
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                code = 1
+                if not sys.stderr.lost:
+                    traceback.print_exc()
+            try:
+                instrumentation.shutdown()
+            except OSError:
+                pass
+            return code
+        except OSError as e:
+            # The client is gone or its directory is unusable.
+            abandoned = e
+            return 1
+        finally:
+            instrumentation.reset()
+            cwd, sys.argv, sys.stdout, sys.stderr = state
+            for m, values in saved.items():
+                vars(m).update(values)
+            os.chdir(cwd)
+            agent_log.rebind()
+            if abandoned is not None:
+                LOG.warning(f"{tool} run abandoned: {abandoned}")
+
+
+def load_tools() -> dict:
+    """
+    Imports every CLI module. Tools whose dependencies are missing are
+    skipped; their clients run them locally.
+    """
+    modules = {}
+    for tool, script in TOOLS.items():
+        name = os.path.splitext(script)[0].replace("-", "_")
+        try:
+            if "-" not in script:
+                modules[tool] = importlib.import_module(name)
+            else:
+                spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, script))
+                module = sys.modules[name] = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                modules[tool] = module
+        except ImportError as e:
+            sys.modules.pop(name, None)
+            LOG.warning(f"{tool} is not available in the daemon: {e}")
+    return modules
+
+
+def preload_models() -> None:
+    """
+    Opens the Ollama client and loads the agents' models in the background,
+    so the first run does not pay for either; the scheduler keeps them
+    loaded while runs keep coming.
+    """
+    llm_backend.get_scheduler().start(llm_backend.model_for(agent) for agent in PRELOAD_AGENTS)
+
+
+def start(path: str, preload: bool = True) -> int:
+    """
+    Runs the daemon in the foreground until it is stopped.
+    """
+    if daemon_client.connect() is not None:
+        print(f"supergitd is already running on {path}")
+        return 1
+    if os.path.exists(path):
+        os.remove(path)  # left behind by a daemon that did not shut down cleanly
+
+    modules = load_tools()
+    old_umask = os.umask(0o077)
+    try:
+        daemon = Daemon(path, modules)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.shutdown).start())
+    if preload:
+        preload_models()
+    log_message(f"supergitd {os.getpid()} listening on {path} ({', '.join(sorted(modules))})")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+        llm_backend.get_scheduler().stop()
+        if os.path.exists(path):
+            os.remove(path)
+        log_message("supergitd stopped")
+    return 0
+
+
+def detach(preload: bool = True) -> int:
+    """
+    Starts the daemon in the background and waits until it accepts
+    connections.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "start"] + ([] if preload else ["--no-preload"])
+    with open(os.devnull, "wb") as devnull:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=devnull, stderr=devnull,
+                                   start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            print("supergitd exited during startup; see logs/supergitd.jsonl")
+            return 1
+        status = daemon_client.request({"command": "status"})
+        if status is not None:
+            print(f"supergitd started (pid {status['pid']}) on {status['socket']}")
+            return 0
+        time.sleep(0.1)
+    print(f"supergitd did not start within {START_TIMEOUT:.0f}s")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident supergit daemon serving the CLIs over a Unix socket.")
+    parser.add_argument('command', choices=['start', 'stop', 'status'], help='What to do')
+    parser.add_argument('--detach', '-d', action='store_true', help='Start in the background')
+    parser.add_argument('--no-preload', action='store_true', help='Do not load the models into Ollama on start')
+    args = parser.parse_args()
+
+    if not hasattr(socketserver, "UnixStreamServer"):
+        print("supergitd needs Unix domain sockets, which this platform does not provide.")
+        return 1
+    path = daemon_client.socket_path()
+    if args.command == "start":
+        return detach(not args.no_preload) if args.detach else start(path, not args.no_preload)
+
+    status = daemon_client.request({"command": args.command})
+    if status is None:
+        print("supergitd is not running")
+        return 1
+    if args.command == "stop":
+        print("supergitd is stopping")
+    else:
+        for key, value in status.items():
+            print(f"{key:<10} {', '.join(value) if isinstance(value, list) else value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import ast
+import textwrap
+
+from code_chunks import parse_replacement, splice, split_chunks
+
+MODULE = textwrap.dedent('''\
+    """Module docstring."""
+    import os
+
+    LIMIT = 10
+
+
+    @decorator
+    def first(x):
+        return x + 1
+
+
+    class Second:
+        def method(self):
+            return os.getcwd()
+
+
+    if __name__ == "__main__":
+        first(LIMIT)
+    ''')
+
+
+def test_split_chunks():
+    chunks = split_chunks(MODULE)
+    assert [(chunk.name, chunk.kind, chunk.start, chunk.end) for chunk in chunks] == [
+        ("first", "function", 7, 9), ("Second", "class", 12, 14)]
+    assert chunks[0].source.startswith("@decorator\ndef first")
+
+
+def test_splice_without_replacements_is_identity():
+    assert splice(MODULE, split_chunks(MODULE), {}) == MODULE
+
+
+def test_splice_round_trip():
+    chunks = split_chunks(MODULE)
+    first = chunks[0]
+    reply = "```python\nimport math\n\n@decorator\ndef first(x):\n    return math.floor(x) + 1\n```"
+    body, imports = parse_replacement(first, reply.strip("`").removeprefix("python\n"))
+    assert body == "@decorator\ndef first(x):\n    return math.floor(x) + 1\n"
+    assert imports == ["import math\n"]
+
+    result = splice(MODULE, chunks, {first: body}, imports)
+    ast.parse(result)
+    assert result.startswith('"""Module docstring."""\nimport os\nimport math\n\nLIMIT = 10\n')
+    assert "return math.floor(x) + 1" in result
+    assert result.endswith('if __name__ == "__main__":\n    first(LIMIT)\n')
+    # The spliced module splits into the same chunks again.
+    assert [chunk.name for chunk in split_chunks(result)] == ["first", "Second"]
+
+
+def test_existing_imports_are_not_repeated():
+    chunks = split_chunks(MODULE)
+    body, imports = parse_replacement(chunks[1], "import os\nclass Second:\n    pass\n")
+    assert imports == ["import os\n"]
+    result = splice(MODULE, chunks, {chunks[1]: body}, imports)
+    assert result.count("import os") == 1
+
+
+def test_indented_reply_is_dedented():
+    body, _ = parse_replacement(split_chunks(MODULE)[0], "    def first(x):\n        return x\n")
+    assert body == "def first(x):\n    return x\n"
+
+
+def test_extra_code_is_rejected():
+    first = split_chunks(MODULE)[0]
+    body, reason = parse_replacement(first, "def first(x):\n    return x + 1\n\nprint(first(2))\n")
+    assert body is None
+    assert reason == "adds code besides function first (line 4)"
+    body, reason = parse_replacement(first, "def helper():\n    pass\n\ndef first(x):\n    return x\n")
+    assert body is None
+
+
+def test_comments_around_the_definition_are_dropped():
+    body, _ = parse_replacement(split_chunks(MODULE)[0], "# faster\ndef first(x):\n    return x + 1\n# end\n")
+    assert body == "def first(x):\n    return x + 1\n"
+
+
+def test_unusable_replacements():
+    chunks = split_chunks(MODULE)
+    assert parse_replacement(chunks[0], "def first(:\n")[0] is None
+    assert parse_replacement(chunks[0], "def other(x):\n    return x\n") == (None, "does not define function first")
+    assert parse_replacement(chunks[1], "def Second():\n    pass\n") == (None, "does not define class Second")
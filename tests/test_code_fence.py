@@ -0,0 +1,81 @@
+from code_fence import FenceParser, extension_for, fence_for, language_for
+
+
+def feed_all(pieces):
+    parser = FenceParser()
+    code = "".join(parser.feed(piece) for piece in pieces)
+    return parser, code + parser.finish()
+
+
+def test_whole_response():
+    parser, code = feed_all(["Here it is:\n```python\nprint(1)\n```\nDone."])
+    assert parser.done
+    assert parser.language == "python"
+    assert code == "print(1)"
+
+
+def test_fences_split_across_chunks():
+    text = "Sure.\n```python\ndef add(a, b):\n    return a + b\n```\nThat adds."
+    for size in (1, 2, 3, 5):
+        parser, code = feed_all([text[i:i + size] for i in range(0, len(text), size)])
+        assert parser.done
+        assert parser.language == "python"
+        assert code == "def add(a, b):\n    return a + b"
+
+
+def test_language_known_once_fence_line_ends():
+    parser = FenceParser()
+    parser.feed("``")
+    parser.feed("`typescr")
+    assert parser.language is None
+    parser.feed("ipt\nlet x")
+    assert parser.language == "typescript"
+    assert parser.opened
+
+
+def test_backticks_inside_a_line_do_not_close():
+    parser, code = feed_all(["```bash\necho ```not a fence```\n", "ls\n```\n"])
+    assert code == "echo ```not a fence```\nls"
+
+
+def test_only_first_block_is_parsed():
+    parser = FenceParser()
+    code = parser.feed("```python\na = 1\n```\n\n```python\nb = 2\n```\n")
+    assert code == "a = 1"
+    assert parser.feed("more") == ""
+    assert parser.code == "a = 1"
+
+
+def test_nested_fence_ends_outer_block():
+    # A fence at the start of a line always closes the block, as in markdown
+    # with equal-length fences.
+    parser, code = feed_all(["```markdown\n# Title\n```python\nx = 1\n```\n```\n"])
+    assert parser.done
+    assert code == "# Title"
+
+
+def test_unterminated_fence_is_flushed_by_finish():
+    parser = FenceParser()
+    code = parser.feed("```python\nx = 1\n``")
+    assert not parser.done
+    assert code == "x = 1"
+    assert parser.finish() == "\n``"
+    assert parser.done
+    assert parser.code == "x = 1\n``"
+
+
+def test_no_fence():
+    parser, code = feed_all(["I am a code generator only."])
+    assert not parser.opened
+    assert code == ""
+
+
+def test_extensions_and_fence_length():
+    assert extension_for("Python title=x.py") == "py"
+    assert extension_for("{.cpp}") == "cpp"
+    assert extension_for("brainfuck") == "txt"
+    assert language_for("src/App.TSX") == "tsx"
+    assert language_for("Dockerfile") == "dockerfile"
+    assert language_for("notes") == ""
+    assert fence_for("no backticks") == "```"
+    assert fence_for("has ```` inside") == "`````"
@@ -0,0 +1,104 @@
+import os
+
+from gitignore import IgnoreMatcher, IgnoreRules
+
+
+def write(root, path, text=""):
+    full = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_unanchored_pattern_matches_at_any_depth():
+    rules = IgnoreRules(["*.log"])
+    assert rules.match("a.log")
+    assert rules.match("deep/dir/a.log")
+    assert rules.match("a.txt") is None
+
+
+def test_anchored_pattern_matches_only_at_root():
+    rules = IgnoreRules(["/build", "docs/*.md"])
+    assert rules.match("build", is_dir=True)
+    assert rules.match("src/build", is_dir=True) is None
+    assert rules.match("docs/a.md")
+    assert rules.match("docs/sub/a.md") is None
+    assert rules.match("other/docs/a.md") is None
+
+
+def test_directory_only_pattern():
+    rules = IgnoreRules(["cache/"])
+    assert rules.match("cache", is_dir=True)
+    assert rules.match("a/cache", is_dir=True)
+    assert rules.match("cache") is None
+
+
+def test_double_star():
+    rules = IgnoreRules(["**/tmp", "logs/**", "a/**/b"])
+    assert rules.match("x/y/tmp")
+    assert rules.match("logs/x/y.txt")
+    assert rules.match("a/b")
+    assert rules.match("a/x/y/b")
+    assert rules.match("ab") is None
+
+
+def test_last_matching_line_wins():
+    rules = IgnoreRules(["*.log", "!keep.log"])
+    assert rules.match("debug.log") is True
+    assert rules.match("keep.log") is False
+    rules = IgnoreRules(["!keep.log", "*.log"])
+    assert rules.match("keep.log") is True
+
+
+def test_comments_escapes_and_classes():
+    rules = IgnoreRules(["# comment", "", "\\#hash", "\\!bang", "file[0-9].txt", "x[!a].py"])
+    assert rules.count == 4
+    assert rules.match("#hash")
+    assert rules.match("!bang")
+    assert rules.match("file7.txt")
+    assert rules.match("filex.txt") is None
+    assert rules.match("xb.py")
+    assert rules.match("xa.py") is None
+
+
+def test_nested_gitignore_overrides_parent(tmp_path):
+    root = str(tmp_path)
+    write(root, ".gitignore", "*.log\nbuild/\n")
+    write(root, "sub/.gitignore", "!keep.log\n")
+    matcher = IgnoreMatcher(root)
+    assert matcher.ignored("a.log")
+    assert matcher.ignored("sub/a.log")
+    assert not matcher.ignored("sub/keep.log")
+    assert matcher.ignored("keep.log")
+    assert matcher.ignored("sub/build", is_dir=True)
+    assert not matcher.ignored("sub/build")
+
+
+def test_negation_overrides_defaults(tmp_path):
+    root = str(tmp_path)
+    write(root, ".gitignore", "!*.lock\n")
+    matcher = IgnoreMatcher(root, defaults=["*.lock", "*.png"])
+    assert not matcher.ignored("poetry.lock")
+    assert matcher.ignored("logo.png")
+    assert matcher.ignored(".git", is_dir=True)
+
+
+def test_info_exclude_and_no_gitignore(tmp_path):
+    root = str(tmp_path)
+    write(root, ".git/info/exclude", "secret.txt\n")
+    write(root, ".gitignore", "*.tmp\n")
+    assert IgnoreMatcher(root).ignored("secret.txt")
+    plain = IgnoreMatcher(root, use_gitignore=False)
+    assert not plain.ignored("secret.txt")
+    assert not plain.ignored("a.tmp")
+
+
+def test_walk_prunes_ignored_directories(tmp_path):
+    root = str(tmp_path)
+    write(root, ".gitignore", "build/\n*.log\n")
+    write(root, "src/app.py")
+    write(root, "src/app.log")
+    write(root, "build/out.py")
+    write(root, ".git/HEAD")
+    found = sorted(os.path.relpath(path, root).replace(os.sep, "/") for path in IgnoreMatcher(root).walk())
+    assert found == [".gitignore", "src/app.py"]
@@ -0,0 +1,100 @@
+from import_graph import ImportGraph, blob_id, parse_module
+
+
+def graph_of(files):
+    graph = ImportGraph(".")
+    graph.update(files, files.get)
+    return graph
+
+
+def test_parse_module_resolves_relative_imports():
+    imports, symbols, _ = parse_module("from . import b\nfrom ..c import d\nimport os\nX = 1\ndef f(): pass\n",
+                                       "pkg/sub/a.py")
+    assert "pkg.sub.b" in imports
+    assert "pkg.c" in imports and "pkg.c.d" in imports
+    assert "os" in imports
+    assert symbols == ["X", "f"]
+
+
+def test_api_hash_ignores_bodies_and_private_names():
+    _, _, api = parse_module("def f(a):\n    return a\n", "m.py")
+    assert parse_module("def f(a):\n    return a + 1\n\ndef _g(): pass\n", "m.py")[2] == api
+    assert parse_module("def f(a, b):\n    return a\n", "m.py")[2] != api
+
+
+def test_cycle_forms_one_component_after_its_dependencies():
+    graph = graph_of({
+        "base.py": "X = 1\n",
+        "a.py": "import b\nimport base\n",
+        "b.py": "import a\n",
+        "main.py": "import a\n",
+    })
+    assert graph.components() == [["base.py"], ["a.py", "b.py"], ["main.py"]]
+    assert graph.order() == ["base.py", "a.py", "b.py", "main.py"]
+
+
+def test_longer_cycle_and_self_import():
+    graph = graph_of({
+        "a.py": "import b\nimport a\n",
+        "b.py": "import c\n",
+        "c.py": "import a\n",
+        "d.py": "import c\n",
+    })
+    components = graph.components()
+    assert components[0] == ["a.py", "b.py", "c.py"]
+    assert components[1] == ["d.py"]
+
+
+def test_src_layout_and_closest_match():
+    graph = graph_of({
+        "src/pkg/util.py": "",
+        "src/pkg/app.py": "from pkg import util\n",
+        "other/util.py": "",
+        "other/run.py": "import util\n",
+    })
+    assert graph.edges["src/pkg/app.py"] == {"src/pkg/util.py"}
+    assert graph.edges["other/run.py"] == {"other/util.py"}
+    assert graph.importers_of(["src/pkg/util.py"]) == {"src/pkg/app.py"}
+
+
+def test_batches_keep_related_modules_together():
+    graph = graph_of({
+        "a.py": "import b\n" + "#" * 40 + "\n",
+        "b.py": "import a\n",
+        "c.py": "import a\n",
+        "x.py": "X = 1\n",
+        "y.py": "import x\n" + "#" * 200 + "\n",
+    })
+    assert graph.batches(max_chars=100) == [["a.py", "b.py", "c.py"], ["x.py"], ["y.py"]]
+    assert graph.batches(max_chars=60) == [["a.py", "b.py"], ["c.py"], ["x.py"], ["y.py"]]
+
+
+def test_update_reparses_only_changed_files():
+    files = {"a.py": "import b\n", "b.py": "X = 1\n", "notes.txt": "x"}
+    graph = ImportGraph(".")
+    stamps = {path: blob_id(text.encode()) for path, text in files.items()}
+    result = graph.update(files, files.get, stamps)
+    assert result["parsed"] == 2 and result["new"] == {"a.py", "b.py"}
+
+    files["b.py"] = "X = 1\nY = 2\n"
+    stamps["b.py"] = blob_id(files["b.py"].encode())
+    result = graph.update(files, files.get, stamps)
+    assert result["parsed"] == 1
+    assert result["api_changed"] == {"b.py"}
+
+    del files["a.py"]
+    result = graph.update(files, files.get, stamps)
+    assert result["parsed"] == 0 and result["api_changed"] == {"a.py"}
+    assert graph.importers_of(["b.py"]) == set()
+
+
+def test_cache_round_trip(tmp_path):
+    cache_file = str(tmp_path / "graph.json")
+    files = {"a.py": "import b\n", "b.py": ""}
+    graph = ImportGraph(".", cache_file)
+    graph.update(files, files.get)
+    graph.save()
+    loaded = ImportGraph(".", cache_file)
+    assert loaded.edges == {"a.py": {"b.py"}, "b.py": set()}
+    stamps = {path: blob_id(text.encode()) for path, text in files.items()}
+    assert loaded.update(files, files.get, stamps)["parsed"] == 0
@@ -0,0 +1,85 @@
+import textwrap
+
+from static_review import analyze, complexity, format_report, regions_text
+import ast
+
+
+def kinds(report):
+    return sorted(finding.kind for finding in report.findings)
+
+
+def test_syntax_error_is_not_sent_to_the_model():
+    report = analyze("def f(:\n    pass\n")
+    assert not report.needs_model
+    assert kinds(report) == ["syntax-error"]
+    assert "Model review skipped" in format_report(report)
+
+
+def test_trivial_file_is_not_sent():
+    report = analyze("X = 1\nY = 2\nprint(X + Y)\n")
+    assert not report.needs_model
+    assert report.reason.startswith("trivial file")
+
+
+def test_short_clean_functions_are_not_sent():
+    report = analyze("def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n")
+    assert report.findings == []
+    assert not report.needs_model
+
+
+def test_findings():
+    code = textwrap.dedent("""\
+        import os
+        import json
+
+
+        def load(path):
+            unused = 1
+            try:
+                os.remove(path)
+            except:
+                pass
+            return open(path).read()
+        """)
+    report = analyze(code)
+    assert kinds(report) == ["bare-except", "swallowed-exception", "unhandled-io", "unused-import",
+                             "unused-variable"]
+    assert [finding.line for finding in report.findings if finding.kind == "unhandled-io"] == [11]
+    assert report.needs_model
+
+
+def test_only_functions_that_need_review_are_sent():
+    simple = "".join(f"def f{i}():\n    return {i}\n\n\n" for i in range(10))
+    complex_function = textwrap.dedent("""\
+        def pick(x):
+            if x > 1:
+                return 1
+            elif x < 0:
+                return 2
+            return 3
+        """)
+    code = simple + complex_function
+    report = analyze(code)
+    assert report.needs_model and not report.whole_file
+    assert [label for _, _, label in report.regions] == ["function pick"]
+    text = regions_text(code, report)
+    assert text.startswith("# lines 41-46: function pick\ndef pick(x):")
+    assert "def f0" not in text
+
+
+def test_whole_file_when_regions_cover_most_of_it():
+    code = textwrap.dedent("""\
+        def pick(x):
+            if x > 1 and x < 5:
+                return 1
+            return 3
+        """)
+    report = analyze(code)
+    assert report.whole_file
+    assert regions_text(code, report) == code
+
+
+def test_complexity():
+    tree = ast.parse("def f(x):\n    if x and y:\n        return [a for a in x if a]\n    def g():\n"
+                     "        if x: pass\n    return 0\n")
+    assert complexity(tree.body[0]) == 5